@@ -0,0 +1,119 @@
+# dev/shipkia_stub.py
+
+"""
+Local stand-in for the Shipkia n8n webhook (no frappe imports). Development
+only: lives outside the app package, so it is never imported or shipped.
+
+    python apps/siya_clinic/dev/shipkia_stub.py --port 8765 --fail-first 2
+
+then set Shipkia Settings → Webhook URL to http://127.0.0.1:8765/ and send
+invoices. The stub answers the first N requests of every Idempotency-Key
+with --fail-status (default 503) so the outbox retries can be watched, then
+200. A repeated key after success returns the first response with
+"duplicate": true, as the real webhook is expected to.
+
+From Python (e.g. bench console):
+
+    import sys; sys.path.insert(0, "apps/siya_clinic/dev")
+    from shipkia_stub import start
+    server = start(port=0, fail_first=1)   # port 0 → free port
+    server.url, server.requests            # received requests
+    server.shutdown()
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: ShipkiaStub
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        key = self.headers.get("Idempotency-Key") or ""
+        stub = self.server
+
+        with stub.lock:
+            stub.requests.append({"key": key, "headers": dict(self.headers), "body": body.decode("utf-8", "replace")})
+            seen = stub.attempts.get(key, 0)
+            stub.attempts[key] = seen + 1
+            done = stub.accepted.get(key)
+
+        if stub.delay:
+            time.sleep(stub.delay)
+
+        if done:
+            return self._reply(200, {**done, "duplicate": True})
+
+        if seen < stub.fail_first:
+            return self._reply(stub.fail_status, {"error": "stand-in failure", "attempt": seen + 1})
+
+        result = {"order_id": f"STUB-{len(stub.accepted) + 1}", "idempotency_key": key}
+        with stub.lock:
+            stub.accepted[key] = result
+        self._reply(200, result)
+
+    def _reply(self, status: int, data: dict):
+        out = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+
+class ShipkiaStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=8765, fail_first=0, fail_status=503, delay=0.0, verbose=False):
+        super().__init__((host, port), _Handler)
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.delay = delay
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.requests = []
+        self.attempts = {}
+        self.accepted = {}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+
+def start(**kwargs) -> ShipkiaStub:
+    """Serve on a background thread; call .shutdown() when done."""
+    server = ShipkiaStub(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Shipkia n8n webhook")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fail-first", type=int, default=0)
+    parser.add_argument("--fail-status", type=int, default=503)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before every reply")
+    args = parser.parse_args()
+
+    server = ShipkiaStub(args.host, args.port, args.fail_first, args.fail_status, args.delay, verbose=True)
+    print(f"Shipkia stand-in listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# siya_clinic/api/common/biller_warehouse.py
+
+"""
+Biller role -> warehouse resolution (Sales Invoice guard + Encounter billing).
+
+Configured in "SR Biller Warehouse Settings" as exact (role, company,
+warehouse) rows. Roles without a row fall back to the old warehouse-name
+keyword match (role_context.BILLER_ROLES), so existing sites keep working
+until the settings are filled in.
+
+Results are cached in Redis per (role, company) and per (user, company);
+Warehouse, settings and User (roles) changes clear the cache.
+"""
+
+from __future__ import annotations
+
+import frappe
+
+from siya_clinic.api.common.role_context import BILLER_ROLES, get_role_context
+
+SETTINGS_DOCTYPE = "SR Biller Warehouse Settings"
+ROWS_DOCTYPE = "SR Biller Warehouse"
+
+CACHE_KEY = "siya_biller_warehouse"
+
+# Roles/users who bypass restrictions
+BYPASS_ROLES = {"System Manager"}
+BYPASS_USERS = {"Administrator"}
+
+
+def clear_biller_warehouse_cache(doc=None, method=None):
+    frappe.cache().delete_value(CACHE_KEY)
+
+
+def _cached(key, resolver):
+    # "" marks "no warehouse" so misses are cached too
+    return frappe.cache().hget(CACHE_KEY, key, generator=lambda: resolver() or "") or None
+
+
+def _configured_map() -> dict:
+    if not frappe.db.exists("DocType", ROWS_DOCTYPE):
+        return {}
+    rows = frappe.get_all(
+        ROWS_DOCTYPE,
+        filters={"parenttype": SETTINGS_DOCTYPE, "parent": SETTINGS_DOCTYPE},
+        fields=["role", "company", "warehouse"],
+        order_by="idx asc",
+    )
+    out = {}
+    for r in rows:
+        out.setdefault(f"{r.role}|{r.company}", r.warehouse)
+    return out
+
+
+def _configured() -> dict:
+    """{"role|company": warehouse} in settings row order."""
+    return frappe.cache().hget(CACHE_KEY, "__map__", generator=_configured_map) or {}
+
+
+def _resolve_role_warehouse(role: str, company: str) -> str | None:
+    configured = _configured()
+    if f"{role}|{company}" in configured:
+        return configured[f"{role}|{company}"]
+
+    keyword = BILLER_ROLES.get(role)
+    if not keyword:
+        return None
+    return frappe.db.get_value(
+        "Warehouse",
+        {"company": company, "warehouse_name": ["like", f"%{keyword}%"]},
+        "name",
+    )
+
+
+def get_role_warehouse(role: str, company: str) -> str | None:
+    """Warehouse a biller role works from in company."""
+    return _cached(f"role|{role}|{company}", lambda: _resolve_role_warehouse(role, company))
+
+
+def get_allowed_warehouse(user: str, company: str) -> str | None:
+    """
+    The only warehouse user may bill from in company, or None when
+    unrestricted (Admin / System Manager / no biller role). The first
+    settings row (role, company) the user holds wins; then BILLER_ROLES.
+    """
+    def resolve():
+        ctx = get_role_context(user)
+        if user in BYPASS_USERS or ctx.has_any(*BYPASS_ROLES):
+            return None
+
+        suffix = f"|{company}"
+        for key, warehouse in _configured().items():
+            if key.endswith(suffix) and ctx.has(key[: -len(suffix)]):
+                return warehouse
+
+        role = next((r for r in BILLER_ROLES if ctx.has(r)), None)
+        return get_role_warehouse(role, company) if role else None
+
+    return _cached(f"user|{user}|{company}", resolve)
@@ -0,0 +1,334 @@
+# siya_clinic/api/common/duplicate_audit.py
+
+"""
+Bulk duplicate audit for Contact / Patient / Customer.
+
+Streams every record in keyset-paginated chunks, normalizes mobile and
+email with the duplicate engine's own rules and clusters them in a single
+pass. Clusters (same value on 2+ records) land in "SR Duplicate Audit".
+Records linked to each other (Patient.customer, Contact links to a
+Customer / Patient) are one identity: a value they share is not reported
+unless another, unrelated record also carries it. Links are looked up only
+for the records of the partition's clusters, batch by batch.
+
+Memory holds one compact entry per distinct value of the current partition;
+pass partitions > 1 to split the key space into that many passes for very
+large bases. Each extra partition rescans all three source tables.
+
+Start:   siya_clinic.api.common.duplicate_audit.start_duplicate_audit
+Report:  siya_clinic.api.common.duplicate_audit.get_duplicate_audit
+"""
+
+import json
+import zlib
+
+import frappe
+from frappe.utils import now_datetime
+from frappe.utils.data import cint
+
+from siya_clinic.api.common.global_duplicates import normalize_email, normalize_mobile
+
+REPORT_DOCTYPE = "SR Duplicate Audit"
+
+# DocType -> match type -> source columns
+AUDIT_SOURCES = {
+    "Contact": {"Mobile": ("mobile_no", "phone"), "Email": ("email_id",)},
+    "Patient": {"Mobile": ("mobile",), "Email": ("email",)},
+    "Customer": {"Mobile": ("mobile_no",), "Email": ("email_id",)},
+}
+
+NORMALIZERS = {"Mobile": normalize_mobile, "Email": normalize_email}
+
+DEFAULT_CHUNK_SIZE = 10000
+MAX_PAGE_LENGTH = 500
+
+CACHE_KEY = "siya_duplicate_audit"
+
+
+# ---------------------------------------------------------
+# Run status (Redis)
+# ---------------------------------------------------------
+
+def _set_status(run_id, status, **extra):
+    info = frappe._dict(run=run_id, status=status, updated=str(now_datetime()), **extra)
+    frappe.cache().hset(CACHE_KEY, run_id, info)
+    frappe.cache().hset(CACHE_KEY, "latest", run_id)
+    return info
+
+
+def _get_status(run_id):
+    return frappe.cache().hget(CACHE_KEY, run_id) or {}
+
+
+# ---------------------------------------------------------
+# Streaming + clustering
+# ---------------------------------------------------------
+
+def _stream_chunks(doctype, columns, chunk_size):
+    """Yield [name, *columns] rows ordered by name, chunk by chunk."""
+    select = ", ".join(f"`{c}`" for c in columns)
+    last_name = ""
+
+    while True:
+        rows = frappe.db.sql(
+            f"""
+            SELECT name, {select}
+            FROM `tab{doctype}`
+            WHERE name > %s
+            ORDER BY name
+            LIMIT %s
+            """,
+            (last_name, chunk_size),
+        )
+        if not rows:
+            return
+        yield rows
+        last_name = rows[-1][0]
+
+
+def _batches(names, size):
+    names = list(names)
+    for i in range(0, len(names), size):
+        yield names[i:i + size]
+
+
+def _identity_resolver(clusters, batch_size):
+    """
+    record -> representative record of its identity; a Patient, its Customer
+    and the Contacts linked to either resolve to the same one (union-find).
+    Only the links of clustered records are loaded, one IN query per batch.
+    """
+    parent = {}
+
+    def find(record):
+        parent.setdefault(record, record)
+        while parent[record] != record:
+            parent[record] = parent[parent[record]]
+            record = parent[record]
+        return record
+
+    def union(a, b):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_b] = root_a
+
+    clustered = {"Contact": set(), "Patient": set(), "Customer": set()}
+    for records in clusters.values():
+        for doctype, name in records:
+            clustered[doctype].add(name)
+
+    # Contacts of clustered Customers / Patients, Customer / Patient links of clustered Contacts
+    patients = set(clustered["Patient"])
+    link_queries = [
+        ("parent IN %(names)s", clustered["Contact"]),
+        ("link_doctype = 'Customer' AND link_name IN %(names)s", clustered["Customer"]),
+        ("link_doctype = 'Patient' AND link_name IN %(names)s", clustered["Patient"]),
+    ]
+    for cond, names in link_queries:
+        for batch in _batches(names, batch_size):
+            for contact, link_doctype, link_name in frappe.db.sql(
+                f"""
+                SELECT parent, link_doctype, link_name
+                FROM `tabDynamic Link`
+                WHERE parenttype = 'Contact'
+                  AND link_doctype IN ('Customer', 'Patient')
+                  AND IFNULL(link_name, '') != ''
+                  AND {cond}
+                """,
+                {"names": tuple(batch)},
+            ):
+                union(("Contact", contact), (link_doctype, link_name))
+                if link_doctype == "Patient":
+                    patients.add(link_name)
+
+    # Patient -> Customer, for clustered Patients and those reached through a Contact
+    if frappe.db.has_column("Patient", "customer"):
+        for batch in _batches(patients, batch_size):
+            for name, customer in frappe.db.sql(
+                """
+                SELECT name, customer FROM `tabPatient`
+                WHERE name IN %s AND IFNULL(customer, '') != ''
+                """,
+                (tuple(batch),),
+            ):
+                union(("Patient", name), ("Customer", customer))
+
+    # records without any link are their own identity; don't grow the map
+    return lambda record: find(record) if record in parent else record
+
+
+def _drop_single_identity(clusters, batch_size):
+    """Only values shared by at least two unrelated identities are duplicates."""
+    identity = _identity_resolver(clusters, batch_size)
+    return {
+        key: records
+        for key, records in clusters.items()
+        if len({identity(r) for r in records}) > 1
+    }
+
+
+def _in_partition(key, partition, partitions):
+    return partitions == 1 or zlib.crc32(key.encode()) % partitions == partition
+
+
+def _collect_clusters(chunk_size, partition, partitions):
+    """
+    One pass over all sources. first_seen keeps a single record per value;
+    a value only grows into a list once a second record shows up.
+    """
+    first_seen = {}
+    clusters = {}
+    scanned = 0
+
+    for doctype, spec in AUDIT_SOURCES.items():
+        columns = [c for cols in spec.values() for c in cols]
+        if not all(frappe.db.has_column(doctype, c) for c in columns):
+            frappe.logger("siya_clinic").warning(f"Duplicate audit: skipping {doctype}, columns missing")
+            continue
+
+        for rows in _stream_chunks(doctype, columns, chunk_size):
+            scanned += len(rows)
+            for row in rows:
+                values = dict(zip(columns, row[1:], strict=True))
+                record = (doctype, row[0])
+
+                # a record counts once per key (e.g. Contact mobile_no == phone)
+                keys = set()
+                for match_type, cols in spec.items():
+                    normalize = NORMALIZERS[match_type]
+                    for c in cols:
+                        value = normalize(values[c])
+                        if value:
+                            keys.add((match_type, value))
+
+                for key in keys:
+                    if not _in_partition(key[1], partition, partitions):
+                        continue
+                    if key in clusters:
+                        clusters[key].append(record)
+                    elif key in first_seen:
+                        clusters[key] = [first_seen.pop(key), record]
+                    else:
+                        first_seen[key] = record
+
+    return clusters, scanned
+
+
+def _write_clusters(run_id, clusters):
+    if not clusters:
+        return 0
+
+    now = now_datetime()
+    user = frappe.session.user
+    values = []
+
+    for (match_type, value), records in clusters.items():
+        per_doctype = {}
+        for dt, _name in records:
+            per_doctype[dt] = per_doctype.get(dt, 0) + 1
+
+        values.append((
+            frappe.generate_hash(length=12), now, now, user, user, 0,
+            run_id, match_type, value, len(records), max(per_doctype.values()),
+            json.dumps([{"doctype": dt, "name": name} for dt, name in records]),
+        ))
+
+    frappe.db.bulk_insert(
+        REPORT_DOCTYPE,
+        fields=[
+            "name", "creation", "modified", "owner", "modified_by", "docstatus",
+            "audit_run", "match_type", "match_value", "record_count", "max_per_doctype", "records",
+        ],
+        values=values,
+    )
+    return len(values)
+
+
+# ---------------------------------------------------------
+# Background job
+# ---------------------------------------------------------
+
+def run_duplicate_audit(run_id, chunk_size=DEFAULT_CHUNK_SIZE, partitions=1):
+    chunk_size = cint(chunk_size) or DEFAULT_CHUNK_SIZE
+    partitions = max(cint(partitions), 1)
+
+    _set_status(run_id, "Running")
+
+    try:
+        total_clusters = 0
+        scanned = 0
+
+        for partition in range(partitions):
+            clusters, scanned = _collect_clusters(chunk_size, partition, partitions)
+            clusters = _drop_single_identity(clusters, chunk_size)
+            total_clusters += _write_clusters(run_id, clusters)
+            frappe.db.commit()
+            del clusters
+
+        # keep only the latest run in the report table
+        frappe.db.delete(REPORT_DOCTYPE, {"audit_run": ["!=", run_id]})
+        frappe.db.commit()
+
+        _set_status(run_id, "Completed", clusters=total_clusters, records_scanned=scanned)
+
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(frappe.get_traceback(), "Duplicate audit failed")
+        _set_status(run_id, "Failed")
+        raise
+
+
+# ---------------------------------------------------------
+# Public APIs
+# ---------------------------------------------------------
+
+@frappe.whitelist()
+def start_duplicate_audit(chunk_size=DEFAULT_CHUNK_SIZE, partitions=1):
+    frappe.only_for("System Manager")
+
+    run_id = frappe.generate_hash(length=10)
+
+    frappe.enqueue(
+        "siya_clinic.api.common.duplicate_audit.run_duplicate_audit",
+        queue="long",
+        timeout=3600,
+        run_id=run_id,
+        chunk_size=cint(chunk_size),
+        partitions=cint(partitions),
+    )
+
+    return _set_status(run_id, "Queued")
+
+
+@frappe.whitelist()
+def get_duplicate_audit(run=None, match_type=None, start=0, page_length=50):
+    """Paged clusters of a run (latest by default), largest first."""
+    frappe.only_for("System Manager")
+
+    run = run or frappe.cache().hget(CACHE_KEY, "latest")
+    if not run:
+        return {"run": None, "status": None, "total": 0, "rows": []}
+
+    filters = {"audit_run": run}
+    if match_type:
+        filters["match_type"] = match_type
+
+    page_length = min(cint(page_length) or 50, MAX_PAGE_LENGTH)
+
+    rows = frappe.get_all(
+        REPORT_DOCTYPE,
+        filters=filters,
+        fields=["match_type", "match_value", "record_count", "max_per_doctype", "records"],
+        order_by="record_count desc, name asc",
+        start=cint(start),
+        page_length=page_length,
+    )
+    for r in rows:
+        r.records = json.loads(r.records or "[]")
+
+    return {
+        "run": run,
+        "status": _get_status(run).get("status"),
+        "total": frappe.db.count(REPORT_DOCTYPE, filters),
+        "rows": rows,
+    }
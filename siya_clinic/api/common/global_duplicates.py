@@ -1,6 +1,11 @@
 import frappe
 import re
 
+# Hidden, indexed 10-digit copies of the phone fields
+# (maintained by the normalize_* hooks, see api/common/phone_index.py)
+F_NORMALIZED_MOBILE = "sr_normalized_mobile"
+F_NORMALIZED_PHONE = "sr_normalized_phone"  # Contact only
+
 # ---------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------
@@ -17,198 +22,204 @@ def normalize_email(value):
 
 
 # ---------------------------------------------------------
-# Ownership helpers
+# SET-BASED RESOLVER
 # ---------------------------------------------------------
 
-def get_contact_linked_entities(contact_name):
-    links = frappe.get_all(
-        "Dynamic Link",
-        filters={"parenttype": "Contact", "parent": contact_name},
-        fields=["link_doctype", "link_name"],
+# Per key: label used in messages, Contact match condition,
+# Patient / Customer owner columns
+DUPLICATE_KEYS = {
+    "mobile": {
+        "label": "Mobile",
+        "contact_cond": f"(`{F_NORMALIZED_MOBILE}`=%(mobile)s OR `{F_NORMALIZED_PHONE}`=%(mobile)s)",
+        "Patient": F_NORMALIZED_MOBILE,
+        "Customer": F_NORMALIZED_MOBILE,
+    },
+    "email": {
+        "label": "Email",
+        "contact_cond": "`email_id`=%(email)s",
+        "Patient": "email",
+        "Customer": "email_id",
+    },
+}
+
+
+def _fetch_contact_matches(values, current_name):
+    """
+    Query 1: first matching Contact per key, with its Dynamic Links,
+    whether each Patient/Customer link still exists, and the current
+    record's Customer.
+    """
+    keys = [k for k in DUPLICATE_KEYS if values.get(k)]
+    if not keys:
+        return {}
+
+    matches = " UNION ALL ".join(
+        f"(SELECT '{k}' AS match_key, name AS contact FROM `tabContact` "
+        f"WHERE {DUPLICATE_KEYS[k]['contact_cond']} LIMIT 1)"
+        for k in keys
     )
 
-    valid = []
-    for l in links:
-        if frappe.db.exists(l.link_doctype, l.link_name):
-            valid.append(l)
+    rows = frappe.db.sql(
+        f"""
+        SELECT
+            m.match_key, m.contact,
+            dl.link_doctype, dl.link_name,
+            COALESCE(p.name, cu.name) AS link_exists,
+            (SELECT customer FROM `tabPatient` WHERE name=%(name)s) AS patient_customer
+        FROM ({matches}) m
+        LEFT JOIN `tabDynamic Link` dl
+            ON dl.parenttype='Contact' AND dl.parent=m.contact
+        LEFT JOIN `tabPatient` p
+            ON dl.link_doctype='Patient' AND p.name=dl.link_name
+        LEFT JOIN `tabCustomer` cu
+            ON dl.link_doctype='Customer' AND cu.name=dl.link_name
+        """,
+        dict(values, name=current_name),
+        as_dict=True,
+    )
 
-    return valid
+    out = {}
+    for r in rows:
+        entry = out.setdefault(r.match_key, frappe._dict(
+            contact=r.contact,
+            links=[],
+            patient_customer=r.patient_customer,
+        ))
+        if r.link_doctype and r.link_exists:
+            entry.links.append((r.link_doctype, r.link_name))
+    return out
+
+
+def _fetch_owner_matches(values, current_name):
+    """Query 2: first other Patient / Customer owning each key."""
+    parts = []
+    for k, spec in DUPLICATE_KEYS.items():
+        if not values.get(k):
+            continue
+        for dt in ("Patient", "Customer"):
+            parts.append(
+                f"(SELECT '{k}' AS match_key, '{dt}' AS owner_doctype, name FROM `tab{dt}` "
+                f"WHERE `{spec[dt]}`=%({k})s AND name!=%(name)s LIMIT 1)"
+            )
+    if not parts:
+        return {}
 
+    rows = frappe.db.sql(" UNION ALL ".join(parts), dict(values, name=current_name), as_dict=True)
 
-def contact_belongs_to_entity(contact_name, doctype, name):
-    links = get_contact_linked_entities(contact_name)
+    out = {}
+    for r in rows:
+        out.setdefault(r.match_key, {})[r.owner_doctype] = r.name
+    return out
 
-    for link in links:
-        if link.link_doctype == doctype and link.link_name == name:
-            return True
 
-    return False
+def _check(value, status, reason=None, doctype=None, name=None, message=None):
+    return frappe._dict(
+        value=value,
+        status=status,        # "clear" | "allowed" | "conflict"
+        reason=reason,
+        doctype=doctype,
+        name=name,
+        message=message,
+    )
 
 
-# ---------------------------------------------------------
-# GLOBAL MOBILE CHECK
-# ---------------------------------------------------------
+def _resolve_key(key, value, contact, owners, current_doctype, current_name):
+    label = DUPLICATE_KEYS[key]["label"]
 
-def validate_global_mobile(mobile, current_doctype, current_name):
-    mobile = normalize_mobile(mobile)
-    if not mobile:
-        return
+    if not value:
+        return _check(None, "clear")
 
     # ---------------- CONTACT ----------------
-    contact_match = frappe.db.sql(
-        """
-        SELECT name FROM `tabContact`
-        WHERE RIGHT(REPLACE(REPLACE(mobile_no,' ',''),'+91',''),10)=%s
-           OR RIGHT(REPLACE(REPLACE(phone,' ',''),'+91',''),10)=%s
-        LIMIT 1
-        """,
-        (mobile, mobile),
-    )
-
-    if contact_match:
-        contact_name = contact_match[0][0]
+    if contact:
+        cname = contact.contact
 
         # 1️⃣ Direct link allowed
-        if contact_belongs_to_entity(contact_name, current_doctype, current_name):
-            return
+        if (current_doctype, current_name) in contact.links:
+            return _check(value, "allowed", "direct_link", "Contact", cname)
 
         # 2️⃣ Allow if share same Customer
         current_customer = None
-
         if current_doctype == "Patient":
-            current_customer = frappe.db.get_value("Patient", current_name, "customer")
-
+            current_customer = contact.patient_customer
         elif current_doctype == "Customer":
             current_customer = current_name
 
-        if current_customer:
-            contact_customer_link = frappe.db.get_value(
-                "Dynamic Link",
-                {
-                    "parenttype": "Contact",
-                    "parent": contact_name,
-                    "link_doctype": "Customer"
-                },
-                "link_name"
-            )
-
-            if contact_customer_link and contact_customer_link == current_customer:
-                return
+        if current_customer and ("Customer", current_customer) in contact.links:
+            return _check(value, "allowed", "same_customer", "Contact", cname)
 
         # 3️⃣ Shopify API reuse
         if getattr(frappe.flags, "in_shopify_api", False):
-            return
+            return _check(value, "allowed", "shopify_api", "Contact", cname)
 
         # 4️⃣ Saving Contact itself
         if current_doctype == "Contact":
-            return
+            return _check(value, "allowed", "contact_save", "Contact", cname)
 
-        frappe.throw(f"Mobile already linked with Contact: {contact_name}")
+        return _check(value, "conflict", None, "Contact", cname, f"{label} already linked with Contact: {cname}")
 
-    # ---------------- PATIENT ----------------
-    patient = frappe.db.get_value(
-        "Patient",
-        {"mobile": mobile, "name": ["!=", current_name]},
-        "name",
-    )
-
-    if patient:
+    # ---------------- PATIENT / CUSTOMER ----------------
+    for dt in ("Patient", "Customer"):
+        owner = owners.get(dt)
+        if not owner:
+            continue
         if current_doctype == "Contact":
-            return
+            return _check(value, "allowed", "contact_save", dt, owner)
+        if current_doctype != dt:
+            return _check(value, "conflict", None, dt, owner, f"{label} already linked with {dt}: {owner}")
 
-        if current_doctype != "Patient":
-            frappe.throw(f"Mobile already linked with Patient: {patient}")
+    return _check(value, "clear")
 
-    # ---------------- CUSTOMER ----------------
-    customer = frappe.db.get_value(
-        "Customer",
-        {"mobile_no": mobile, "name": ["!=", current_name]},
-        "name",
-    )
 
-    if customer:
-        if current_doctype == "Contact":
-            return
+def resolve_global_duplicates(mobile=None, email=None, current_doctype=None, current_name=None):
+    """
+    Answer every mobile / email ownership question for one record in at
+    most two set-based queries.
 
-        if current_doctype != "Customer":
-            frappe.throw(f"Mobile already linked with Customer: {customer}")
+    Returns a verdict instead of throwing:
+        {
+            "ok": bool,
+            "mobile": {value, status, reason, doctype, name, message},
+            "email":  {...},
+            "conflicts": [check, ...],   # in mobile, email order
+        }
+    """
+    values = {"mobile": normalize_mobile(mobile), "email": normalize_email(email)}
 
+    contacts = _fetch_contact_matches(values, current_name)
 
-# ---------------------------------------------------------
-# GLOBAL EMAIL CHECK
-# ---------------------------------------------------------
+    # Contact saves are never blocked by Patient/Customer owners; only look
+    # them up for keys not already decided by a matching Contact.
+    owners = {}
+    if current_doctype != "Contact":
+        pending = {k: v for k, v in values.items() if v and k not in contacts}
+        owners = _fetch_owner_matches(pending, current_name)
 
-def validate_global_email(email, current_doctype, current_name):
-    email = normalize_email(email)
-    if not email:
-        return
+    verdict = frappe._dict(conflicts=[])
+    for key, value in values.items():
+        check = _resolve_key(key, value, contacts.get(key), owners.get(key, {}), current_doctype, current_name)
+        verdict[key] = check
+        if check.status == "conflict":
+            verdict.conflicts.append(check)
 
-    # ---------------- CONTACT ----------------
-    contact = frappe.db.get_value("Contact", {"email_id": email}, "name")
+    verdict.ok = not verdict.conflicts
+    return verdict
 
-    if contact:
 
-        # 1️⃣ Direct link allowed
-        if contact_belongs_to_entity(contact, current_doctype, current_name):
-            return
+def validate_global_duplicates(mobile, email, current_doctype, current_name):
+    """Throw on the first mobile / email conflict found by the resolver."""
+    verdict = resolve_global_duplicates(mobile, email, current_doctype, current_name)
+    if verdict.conflicts:
+        frappe.throw(verdict.conflicts[0].message)
+    return verdict
 
-        # 2️⃣ Allow if share same Customer
-        current_customer = None
-
-        if current_doctype == "Patient":
-            current_customer = frappe.db.get_value("Patient", current_name, "customer")
-
-        elif current_doctype == "Customer":
-            current_customer = current_name
-
-        if current_customer:
-            contact_customer_link = frappe.db.get_value(
-                "Dynamic Link",
-                {
-                    "parenttype": "Contact",
-                    "parent": contact,
-                    "link_doctype": "Customer"
-                },
-                "link_name"
-            )
-
-            if contact_customer_link and contact_customer_link == current_customer:
-                return
-
-        # 3️⃣ Shopify reuse
-        if getattr(frappe.flags, "in_shopify_api", False):
-            return
-
-        # 4️⃣ Saving Contact itself
-        if current_doctype == "Contact":
-            return
-
-        frappe.throw(f"Email already linked with Contact: {contact}")
-
-    # ---------------- PATIENT ----------------
-    patient = frappe.db.get_value(
-        "Patient",
-        {"email": email, "name": ["!=", current_name]},
-        "name",
-    )
-
-    if patient:
-        if current_doctype == "Contact":
-            return
 
-        if current_doctype != "Patient":
-            frappe.throw(f"Email already linked with Patient: {patient}")
+# ---------------------------------------------------------
+# GLOBAL MOBILE / EMAIL CHECKS
+# ---------------------------------------------------------
 
-    # ---------------- CUSTOMER ----------------
-    customer = frappe.db.get_value(
-        "Customer",
-        {"email_id": email, "name": ["!=", current_name]},
-        "name",
-    )
+def validate_global_mobile(mobile, current_doctype, current_name):
+    validate_global_duplicates(mobile, None, current_doctype, current_name)
 
-    if customer:
-        if current_doctype == "Contact":
-            return
 
-        if current_doctype != "Customer":
-            frappe.throw(f"Email already linked with Customer: {customer}")
\ No newline at end of file
+def validate_global_email(email, current_doctype, current_name):
+    validate_global_duplicates(None, email, current_doctype, current_name)
\ No newline at end of file
@@ -0,0 +1,102 @@
+# siya_clinic/api/common/phone_index.py
+
+"""
+Normalized phone index for the global duplicate engine.
+
+Contact, Patient and Customer carry a hidden, indexed copy of their
+10-digit mobile (Contact also of its phone). The normalize_* hooks keep
+it current on every save, so duplicate checks are indexed equality
+lookups instead of function-wrapped scans.
+
+Rows saved before the index existed are backfilled once per site by a job
+queued on migrate (setup/backfills.py); to re-run by hand:
+    bench --site <site> execute siya_clinic.api.common.phone_index.backfill_normalized_mobiles
+"""
+
+import frappe
+from frappe.utils.data import cint
+
+from siya_clinic.api.common.global_duplicates import (
+    F_NORMALIZED_MOBILE,
+    F_NORMALIZED_PHONE,
+    normalize_mobile,
+)
+
+# index field -> source phone field, per DocType
+INDEXED_PHONE_FIELDS = {
+    "Contact": {F_NORMALIZED_MOBILE: "mobile_no", F_NORMALIZED_PHONE: "phone"},
+    "Patient": {F_NORMALIZED_MOBILE: "mobile"},
+    "Customer": {F_NORMALIZED_MOBILE: "mobile_no"},
+}
+
+BACKFILL_CHUNK_SIZE = 5000
+
+
+# ---------------------------------------------------------
+# Hook helper
+# ---------------------------------------------------------
+
+def set_normalized_phone_fields(doc):
+    """Refresh the indexed phone copies from the source fields (clears when empty)."""
+    for target, source in INDEXED_PHONE_FIELDS.get(doc.doctype, {}).items():
+        doc.set(target, normalize_mobile(doc.get(source)))
+
+
+# ---------------------------------------------------------
+# Backfill
+# ---------------------------------------------------------
+
+def _backfill_doctype(doctype, mapping, chunk_size):
+    columns = list(mapping) + list(mapping.values())
+    if not all(frappe.db.has_column(doctype, col) for col in columns):
+        frappe.logger("siya_clinic").warning(f"Phone index fields missing on {doctype}; run migrate first")
+        return 0
+
+    select = ", ".join(f"`{col}`" for col in columns)
+    last_name = ""
+    updated = 0
+
+    while True:
+        rows = frappe.db.sql(
+            f"""
+            SELECT name, {select}
+            FROM `tab{doctype}`
+            WHERE name > %s
+            ORDER BY name
+            LIMIT %s
+            """,
+            (last_name, chunk_size),
+            as_dict=True,
+        )
+        if not rows:
+            break
+
+        changes = {}
+        for row in rows:
+            values = {target: normalize_mobile(row.get(source)) for target, source in mapping.items()}
+            if any(row.get(target) != value for target, value in values.items()):
+                changes[row.name] = values
+
+        if changes:
+            frappe.db.bulk_update(doctype, changes, update_modified=False)
+            updated += len(changes)
+
+        frappe.db.commit()
+        last_name = rows[-1].name
+
+    return updated
+
+
+def backfill_normalized_mobiles(chunk_size=BACKFILL_CHUNK_SIZE):
+    """
+    Populate the phone index for existing Contact / Patient / Customer rows.
+    Keyset-paginated and committed per chunk; safe to re-run.
+    """
+    chunk_size = cint(chunk_size) or BACKFILL_CHUNK_SIZE
+    result = {}
+
+    for doctype, mapping in INDEXED_PHONE_FIELDS.items():
+        result[doctype] = _backfill_doctype(doctype, mapping, chunk_size)
+        frappe.logger("siya_clinic").info(f"Phone index backfill: {doctype} updated {result[doctype]} rows")
+
+    return result
@@ -0,0 +1,82 @@
+# siya_clinic/api/common/role_context.py
+
+"""
+Per-request role context shared by all siya_clinic hooks.
+
+get_role_context(user) resolves the user's roles once per request (or
+background job) and derives the flags the hooks branch on:
+
+    ctx.is_admin        user is Administrator
+    ctx.is_super        Administrator or System Manager
+    ctx.is_tl           Team Leader role
+    ctx.is_agent        Agent role
+    ctx.is_pure_agent   Agent without System Manager / Administrator /
+                        Healthcare Practitioner
+    ctx.biller_type     "OPD" / "Packaging" / None (see BILLER_ROLES)
+    ctx.has(role)       membership test on ctx.roles
+"""
+
+from __future__ import annotations
+
+import frappe
+
+SYSTEM_MANAGER = "System Manager"
+ADMINISTRATOR = "Administrator"
+TEAM_LEADER = "Team Leader"
+AGENT = "Agent"
+PRACTITIONER = "Healthcare Practitioner"
+
+# Biller role -> biller type (first match wins)
+BILLER_ROLES = {
+    "OPD Biller": "OPD",
+    "Packaging Biller": "Packaging",
+}
+
+
+class RoleContext(frappe._dict):
+    def has(self, role: str) -> bool:
+        return role in self.roles
+
+    def has_any(self, *roles: str) -> bool:
+        return bool(self.roles.intersection(roles))
+
+
+def _build(user: str) -> RoleContext:
+    roles = frozenset(frappe.get_roles(user) or [])
+    is_admin = (user or "").lower() == "administrator"
+    is_super = is_admin or SYSTEM_MANAGER in roles
+
+    return RoleContext(
+        user=user,
+        roles=roles,
+        is_admin=is_admin,
+        is_super=is_super,
+        is_tl=TEAM_LEADER in roles,
+        is_agent=AGENT in roles,
+        is_pure_agent=(
+            AGENT in roles
+            and SYSTEM_MANAGER not in roles
+            and ADMINISTRATOR not in roles
+            and PRACTITIONER not in roles
+        ),
+        biller_type=next((t for role, t in BILLER_ROLES.items() if role in roles), None),
+    )
+
+
+def get_role_context(user: str | None = None) -> RoleContext:
+    """Memoized on frappe.local, so it is dropped with the request / job."""
+    user = user or frappe.session.user or "Guest"
+
+    memo = getattr(frappe.local, "siya_role_context", None)
+    if memo is None:
+        memo = frappe.local.siya_role_context = {}
+
+    if user not in memo:
+        memo[user] = _build(user)
+    return memo[user]
+
+
+def clear_role_context(doc=None, method=None):
+    """Hook: User saved (roles may have changed within this request)."""
+    if getattr(frappe.local, "siya_role_context", None):
+        frappe.local.siya_role_context.pop(getattr(doc, "name", None), None)
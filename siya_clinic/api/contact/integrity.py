@@ -1,9 +1,7 @@
 import frappe
 import re
-from siya_clinic.api.common.global_duplicates import (
-    validate_global_mobile,
-    validate_global_email,
-)
+from siya_clinic.api.common.global_duplicates import validate_global_duplicates
+from siya_clinic.api.common.phone_index import set_normalized_phone_fields
 
 def normalize_indian_mobile(value):
     if not value:
@@ -19,7 +17,8 @@ def normalize_contact_phone_fields(doc, method=None):
     if doc.phone:
         doc.phone = normalize_indian_mobile(doc.phone)
 
+    set_normalized_phone_fields(doc)
+
 
 def validate_contact_global_duplicates(doc, method=None):
-    validate_global_mobile(doc.mobile_no or doc.phone, "Contact", doc.name)
-    validate_global_email(doc.email_id, "Contact", doc.name)
\ No newline at end of file
+    validate_global_duplicates(doc.mobile_no or doc.phone, doc.email_id, "Contact", doc.name)
\ No newline at end of file
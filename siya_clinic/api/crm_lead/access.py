@@ -2,11 +2,19 @@
 # Visibility + Permissions + Owner-restore for CRM Lead
 
 from __future__ import annotations
+
 import frappe
 
+from siya_clinic.api.common.role_context import get_role_context
+from siya_clinic.api.crm_lead.assignee_index import assigned_to_user_sql, lead_assignees
+
 AGENT_ROLE = "Agent"
 TL_ROLE = "Team Leader"
 LEAD_DOCTYPE = "CRM Lead"
+PIPELINE_DOCTYPE = "SR Lead Pipeline"
+
+# user -> allowed SR Lead Pipelines (Redis hash)
+PIPELINE_CACHE_KEY = "siya_lead_allowed_pipelines"
 
 
 # ---------------------------------------------------------------------------
@@ -14,44 +22,66 @@ LEAD_DOCTYPE = "CRM Lead"
 # ---------------------------------------------------------------------------
 
 def _has_role(user: str, role: str) -> bool:
-    return role in frappe.get_roles(user)
+    return get_role_context(user).has(role)
 
 
 def _is_super(user: str) -> bool:
-    return user == "Administrator" or _has_role(user, "System Manager")
+    return get_role_context(user).is_super
 
 
 def _current_assignees(lead_name: str) -> set[str]:
-    rows = frappe.get_all(
-        "ToDo",
-        filters={
-            "reference_type": LEAD_DOCTYPE,
-            "reference_name": lead_name,
-            "status": "Open",
-        },
-        pluck="allocated_to",
-    )
-    return set(rows or [])
+    return lead_assignees(lead_name)
 
 
-def _allowed_pipelines_sql(user: str) -> str:
-    """
-    Restrict pipelines using User Permission (Allow = 'SR Lead Pipeline')
-    Used ONLY for permission_query_conditions (SQL context)
-    """
+def _load_allowed_pipelines(user: str) -> list[str]:
     from frappe.core.doctype.user_permission.user_permission import get_user_permissions
 
-    perms = get_user_permissions(user) or {}
-    raw = perms.get("SR Lead Pipeline") or []
+    raw = (get_user_permissions(user) or {}).get(PIPELINE_DOCTYPE) or []
 
-    values: list[str] = []
+    values = set()
     for v in raw:
         if isinstance(v, str):
-            values.append(v)
+            values.add(v)
         elif isinstance(v, dict):
-            values.append(v.get("doc") or v.get("value") or v.get("name") or "")
+            values.add(v.get("doc") or v.get("value") or v.get("name"))
+
+    values.discard(None)
+    values.discard("")
+    return sorted(values)
+
 
-    values = [v for v in values if v]
+def get_allowed_pipelines(user: str) -> set[str]:
+    """
+    SR Lead Pipelines the user holds a User Permission for.
+    Cached per user; cleared on User Permission / User (roles) changes.
+    """
+    return set(
+        frappe.cache().hget(
+            PIPELINE_CACHE_KEY,
+            user,
+            generator=lambda: _load_allowed_pipelines(user),
+        ) or []
+    )
+
+
+def clear_allowed_pipelines_cache(doc=None, method=None):
+    """Hook: User Permission (doc.user) / User (doc.name) changed."""
+    user = None
+    if doc is not None:
+        user = doc.get("user") if doc.doctype == "User Permission" else doc.name
+
+    if user:
+        frappe.cache().hdel(PIPELINE_CACHE_KEY, user)
+    else:
+        frappe.cache().delete_value(PIPELINE_CACHE_KEY)
+
+
+def _allowed_pipelines_sql(user: str) -> str:
+    """
+    Restrict pipelines using User Permission (Allow = 'SR Lead Pipeline')
+    Used ONLY for permission_query_conditions (SQL context)
+    """
+    values = sorted(get_allowed_pipelines(user))
     if not values:
         return "1=0"  # deny all
 
@@ -74,17 +104,9 @@ def crm_lead_pqc(user: str) -> str:
     if _has_role(user, TL_ROLE):
         return ""
 
-    # Agent → ONLY assigned (open ToDo) + allowed pipeline
+    # Agent → ONLY assigned (open ToDo, via SR Lead Assignee index) + allowed pipeline
     if _has_role(user, AGENT_ROLE):
-        assignment_cond = (
-            "EXISTS ("
-            "SELECT 1 FROM `tabToDo` t "
-            "WHERE t.reference_type='CRM Lead' "
-            "AND t.reference_name=`tabCRM Lead`.name "
-            "AND t.status='Open' "
-            f"AND t.allocated_to={frappe.db.escape(user)}"
-            ")"
-        )
+        assignment_cond = assigned_to_user_sql(user)
 
         pipeline_cond = _allowed_pipelines_sql(user)
         return f"({assignment_cond}) AND ({pipeline_cond})"
@@ -113,17 +135,7 @@ def crm_lead_has_permission(doc, user: str | None = None, ptype: str | None = No
         if user not in _current_assignees(doc.name):
             return False
 
-        from frappe.core.doctype.user_permission.user_permission import get_user_permissions
-        raw = (get_user_permissions(user) or {}).get("SR Lead Pipeline") or []
-
-        allowed = {
-            v if isinstance(v, str)
-            else (v.get("doc") or v.get("value") or v.get("name") or "")
-            for v in raw
-        }
-        allowed.discard("")
-        allowed.discard(None)
-
+        allowed = get_allowed_pipelines(user)
         if not allowed:
             return False
 
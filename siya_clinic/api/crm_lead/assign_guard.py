@@ -5,6 +5,8 @@ from __future__ import annotations
 import frappe
 from frappe.utils import cstr
 
+from siya_clinic.api.common.role_context import get_role_context
+
 LEAD_DT = "CRM Lead"
 
 
@@ -13,10 +15,8 @@ LEAD_DT = "CRM Lead"
 # ---------------------------------------------------------------------------
 
 def _is_team_leader(user: str) -> bool:
-    if (user or "").lower() == "administrator":
-        return True
-    roles = set(frappe.get_roles(user))
-    return "Team Leader" in roles or "System Manager" in roles
+    ctx = get_role_context(user)
+    return ctx.is_super or ctx.is_tl
 
 
 # ---------------------------------------------------------------------------
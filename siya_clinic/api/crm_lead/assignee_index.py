@@ -0,0 +1,149 @@
+# siya_clinic/api/crm_lead/assignee_index.py
+# Lead -> open assignee index ("SR Lead Assignee") for the CRM Lead PQC
+#
+# The index starts empty: rebuild_lead_assignee_index is queued once by
+# setup_all (setup/backfills.py). Until it has completed the lookups below
+# read the open ToDos directly.
+
+from __future__ import annotations
+
+import frappe
+
+from siya_clinic.setup import backfills
+
+LEAD_DT = "CRM Lead"
+INDEX_DT = "SR Lead Assignee"
+
+BACKFILL_KEY = "lead_assignee_index"
+
+REBUILD_CHUNK_SIZE = 5000
+
+
+# ---------------------------------------------------------------------------
+# Refresh (set-wise, from open ToDos)
+# ---------------------------------------------------------------------------
+
+def refresh_lead_assignees(leads) -> None:
+    """
+    Re-derive the index rows of the given leads from their open ToDos.
+    Two statements regardless of how many leads are passed.
+    """
+    if isinstance(leads, str):
+        leads = [leads]
+    leads = list({l for l in (leads or []) if l})
+    if not leads:
+        return
+
+    frappe.db.delete(INDEX_DT, {"lead": ["in", leads]})
+
+    # deterministic name -> duplicate open ToDos collapse to one row
+    frappe.db.sql(
+        """
+        INSERT IGNORE INTO `tabSR Lead Assignee`
+            (name, creation, modified, owner, modified_by, docstatus, lead, user)
+        SELECT MD5(CONCAT(t.reference_name, '|', t.allocated_to)),
+               NOW(6), NOW(6), %(user)s, %(user)s, 0,
+               t.reference_name, t.allocated_to
+        FROM `tabToDo` t
+        WHERE t.reference_type = %(lead_dt)s
+          AND t.reference_name IN %(leads)s
+          AND t.status = 'Open'
+          AND IFNULL(t.allocated_to, '') != ''
+        """,
+        {"user": frappe.session.user, "lead_dt": LEAD_DT, "leads": tuple(leads)},
+    )
+
+
+# ---------------------------------------------------------------------------
+# ToDo hooks (covers assign_to add / remove / clear)
+# ---------------------------------------------------------------------------
+
+def sync_from_todo(doc, method=None):
+    if doc.reference_type != LEAD_DT or not doc.reference_name:
+        return
+    refresh_lead_assignees(doc.reference_name)
+
+
+# ---------------------------------------------------------------------------
+# PQC helper
+# ---------------------------------------------------------------------------
+
+def index_ready() -> bool:
+    return backfills.is_done(BACKFILL_KEY)
+
+
+def assigned_to_user_sql(user: str) -> str:
+    """Condition on `tabCRM Lead`: lead has an open assignment for user."""
+    if not index_ready():
+        return (
+            "EXISTS ("
+            "SELECT 1 FROM `tabToDo` t "
+            "WHERE t.reference_type='CRM Lead' "
+            "AND t.reference_name=`tabCRM Lead`.name "
+            "AND t.status='Open' "
+            f"AND t.allocated_to={frappe.db.escape(user)}"
+            ")"
+        )
+
+    return (
+        "`tabCRM Lead`.`name` IN ("
+        "SELECT a.`lead` FROM `tabSR Lead Assignee` a "
+        f"WHERE a.`user`={frappe.db.escape(user)}"
+        ")"
+    )
+
+
+def lead_assignees(lead: str) -> set[str]:
+    if not index_ready():
+        return set(
+            frappe.get_all(
+                "ToDo",
+                filters={"reference_type": LEAD_DT, "reference_name": lead, "status": "Open"},
+                pluck="allocated_to",
+            ) or []
+        )
+
+    return set(frappe.get_all(INDEX_DT, filters={"lead": lead}, pluck="user") or [])
+
+
+# ---------------------------------------------------------------------------
+# Full rebuild (one-time / repair)
+# ---------------------------------------------------------------------------
+
+def rebuild_lead_assignee_index(chunk_size: int = REBUILD_CHUNK_SIZE) -> int:
+    """
+    Rebuild the whole index from ToDo, keyset-paginated over CRM Lead.
+        bench --site <site> execute siya_clinic.api.crm_lead.assignee_index.rebuild_lead_assignee_index
+    """
+    last_name = ""
+    processed = 0
+
+    while True:
+        names = frappe.db.sql_list(
+            """
+            SELECT name FROM `tabCRM Lead`
+            WHERE name > %s
+            ORDER BY name
+            LIMIT %s
+            """,
+            (last_name, int(chunk_size)),
+        )
+        if not names:
+            break
+
+        refresh_lead_assignees(names)
+        frappe.db.commit()
+
+        processed += len(names)
+        last_name = names[-1]
+
+    # rows of deleted leads
+    frappe.db.sql(
+        """
+        DELETE a FROM `tabSR Lead Assignee` a
+        LEFT JOIN `tabCRM Lead` l ON l.name = a.lead
+        WHERE l.name IS NULL
+        """
+    )
+    frappe.db.commit()
+    return processed
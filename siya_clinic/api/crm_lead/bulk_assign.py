@@ -0,0 +1,284 @@
+# siya_clinic/api/crm_lead/bulk_assign.py
+# Bulk CRM Lead reassignment (background job, set-wise writes)
+
+from __future__ import annotations
+
+import json
+
+import frappe
+from frappe.utils import now_datetime
+from frappe.utils.data import cint
+
+from siya_clinic.api.crm_lead.access import get_allowed_pipelines
+from siya_clinic.api.crm_lead.assignee_index import refresh_lead_assignees
+
+LEAD_DT = "CRM Lead"
+
+# assign_crm_lead_owner hands anything above this to the background job
+BULK_THRESHOLD = 50
+CHUNK_SIZE = 500
+
+CACHE_KEY = "siya_lead_reassignment"
+PROGRESS_EVENT = "sr_lead_reassignment_progress"
+
+
+# ---------------------------------------------------------------------------
+# Job status (Redis) + realtime progress
+# ---------------------------------------------------------------------------
+
+def _set_status(job_id: str, status: str, user: str | None = None, **extra) -> frappe._dict:
+    info = frappe._dict(_get_status(job_id))
+    info.update(job=job_id, status=status, updated=str(now_datetime()), **extra)
+    frappe.cache().hset(CACHE_KEY, job_id, info)
+
+    if user:
+        frappe.publish_realtime(PROGRESS_EVENT, info, user=user)
+    return info
+
+
+def _get_status(job_id: str) -> dict:
+    return frappe.cache().hget(CACHE_KEY, job_id) or {}
+
+
+# ---------------------------------------------------------------------------
+# Validation (whole set, one query)
+# ---------------------------------------------------------------------------
+
+def validate_pipelines_for_owner(leads: list[str], new_owner: str) -> None:
+    """Throw if any lead sits in a pipeline new_owner has no User Permission for."""
+    allowed = get_allowed_pipelines(new_owner)
+
+    blocked = frappe.db.sql(
+        """
+        SELECT l.sr_lead_pipeline AS pipeline,
+               IFNULL(p.sr_pipeline_name, l.sr_lead_pipeline) AS title,
+               COUNT(*) AS leads
+        FROM `tabCRM Lead` l
+        LEFT JOIN `tabSR Lead Pipeline` p ON p.name = l.sr_lead_pipeline
+        WHERE l.name IN %(leads)s
+          AND IFNULL(l.sr_lead_pipeline, '') != ''
+          AND l.sr_lead_pipeline NOT IN %(allowed)s
+        GROUP BY l.sr_lead_pipeline, p.sr_pipeline_name
+        """,
+        {"leads": tuple(leads), "allowed": tuple(allowed) or ("",)},
+        as_dict=True,
+    )
+    if blocked:
+        frappe.throw(
+            frappe._(
+                "Selected leads belong to <b>{0}</b> pipeline(s).<br>"
+                "Agent <b>{1}</b> is not allowed for these pipelines."
+            ).format(
+                ", ".join(f"{b.title} ({b.leads})" for b in blocked),
+                new_owner,
+            ),
+            title="Assignment Not Allowed",
+        )
+
+
+# ---------------------------------------------------------------------------
+# Set-wise writes for one chunk
+# ---------------------------------------------------------------------------
+
+def _reassign_chunk(leads: list[str], new_owner: str, assigned_by: str) -> int:
+    """
+    Same end state as the per-lead path in controller.assign_crm_lead_owner
+    (owner, one open ToDo, owner share, Info comment), written with raw SQL.
+
+    Not run, compared to doc.save() + assign_to.add():
+      - CRM Lead validate / before_save / after_save / on_update hooks:
+        guard_restricted_fields (caller is a Team Leader, pipelines are
+        checked set-wise up front), normalize_phoneish_fields (phone fields
+        are untouched), restore_lead_owner_after_unassign and
+        lifecycle.on_update (both no-ops for a reassignment)
+      - Version rows (no "lead_owner changed" entry in the timeline)
+      - ToDo hooks and the assignment notification / email to the new owner
+      - realtime doc / list refresh for open forms
+    The assignee index and the document cache are refreshed explicitly.
+    """
+    leads = frappe.db.sql_list(
+        """
+        SELECT name FROM `tabCRM Lead`
+        WHERE name IN %(leads)s
+          AND IFNULL(lead_owner, '') != %(owner)s
+        """,
+        {"leads": tuple(leads), "owner": new_owner},
+    )
+    if not leads:
+        return 0
+
+    now = now_datetime()
+    params = {"leads": tuple(leads), "owner": new_owner, "now": now, "by": assigned_by}
+
+    # Shares of the previous owner (and any old one of the new owner); shares
+    # given to other users are kept, as in lifecycle._ensure_share.
+    # Before the owner UPDATE, which overwrites lead_owner.
+    frappe.db.sql(
+        """
+        DELETE s FROM `tabDocShare` s
+        JOIN `tabCRM Lead` l ON l.name = s.share_name
+        WHERE s.share_doctype = 'CRM Lead' AND s.share_name IN %(leads)s
+          AND (s.user = l.lead_owner OR s.user = %(owner)s)
+        """,
+        params,
+    )
+
+    # Owner + assignment column
+    frappe.db.sql(
+        """
+        UPDATE `tabCRM Lead`
+        SET lead_owner = %(owner)s, _assign = %(assign)s,
+            modified = %(now)s, modified_by = %(by)s
+        WHERE name IN %(leads)s
+        """,
+        {**params, "assign": json.dumps([new_owner])},
+    )
+
+    # Close existing assignments
+    frappe.db.sql(
+        """
+        UPDATE `tabToDo`
+        SET status = 'Closed', modified = %(now)s, modified_by = %(by)s
+        WHERE reference_type = 'CRM Lead'
+          AND reference_name IN %(leads)s
+          AND status = 'Open'
+        """,
+        params,
+    )
+
+    # One read+write share for the new owner (same model as lifecycle._ensure_share)
+    base = (now, now, assigned_by, assigned_by, 0)
+
+    frappe.db.bulk_insert(
+        "DocShare",
+        fields=[
+            "name", "creation", "modified", "owner", "modified_by", "docstatus",
+            "share_doctype", "share_name", "user", "read", "write", "share", "notify_by_email",
+        ],
+        values=[
+            (frappe.generate_hash(length=10), *base, LEAD_DT, lead, new_owner, 1, 1, 0, 0)
+            for lead in leads
+        ],
+    )
+
+    frappe.db.bulk_insert(
+        "ToDo",
+        fields=[
+            "name", "creation", "modified", "owner", "modified_by", "docstatus",
+            "status", "priority", "allocated_to", "description",
+            "reference_type", "reference_name", "assigned_by",
+        ],
+        values=[
+            (frappe.generate_hash(length=10), *base, "Open", "Medium", new_owner,
+             "Lead Owner", LEAD_DT, lead, assigned_by)
+            for lead in leads
+        ],
+    )
+
+    # Audit trail (one insert for the chunk)
+    content = f"Lead assigned to {new_owner} by {assigned_by}"
+    frappe.db.bulk_insert(
+        "Comment",
+        fields=[
+            "name", "creation", "modified", "owner", "modified_by", "docstatus",
+            "comment_type", "reference_doctype", "reference_name",
+            "comment_email", "content",
+        ],
+        values=[
+            (frappe.generate_hash(length=10), *base, "Info", LEAD_DT, lead, assigned_by, content)
+            for lead in leads
+        ],
+    )
+
+    refresh_lead_assignees(leads)
+    for lead in leads:
+        frappe.clear_document_cache(LEAD_DT, lead)
+    return len(leads)
+
+
+# ---------------------------------------------------------------------------
+# Background job
+# ---------------------------------------------------------------------------
+
+def run_bulk_reassignment(job_id: str, leads: list[str], new_owner: str, assigned_by: str):
+    total = len(leads)
+    done = changed = 0
+    _set_status(job_id, "Running", assigned_by, total=total, done=0, changed=0)
+
+    try:
+        for start in range(0, total, CHUNK_SIZE):
+            chunk = leads[start:start + CHUNK_SIZE]
+            changed += _reassign_chunk(chunk, new_owner, assigned_by)
+            frappe.db.commit()
+
+            done += len(chunk)
+            _set_status(job_id, "Running", assigned_by, done=done, changed=changed)
+
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(frappe.get_traceback(), "Bulk CRM Lead reassignment failed")
+        _set_status(job_id, "Failed", assigned_by, done=done, changed=changed)
+        raise
+
+    _set_status(job_id, "Completed", assigned_by, done=done, changed=changed)
+
+
+# ---------------------------------------------------------------------------
+# Public APIs
+# ---------------------------------------------------------------------------
+
+def enqueue_bulk_reassignment(leads: list[str], new_owner: str) -> frappe._dict:
+    """Validate the whole set up front, then hand the writes to a worker."""
+    leads = list(dict.fromkeys(l for l in leads if l))
+    if not leads:
+        frappe.throw("Please select at least one CRM Lead")
+
+    validate_pipelines_for_owner(leads, new_owner)
+
+    job_id = frappe.generate_hash(length=10)
+    user = frappe.session.user
+
+    frappe.enqueue(
+        "siya_clinic.api.crm_lead.bulk_assign.run_bulk_reassignment",
+        queue="long",
+        timeout=3600,
+        enqueue_after_commit=True,
+        job_id=job_id,
+        leads=leads,
+        new_owner=new_owner,
+        assigned_by=user,
+    )
+
+    return _set_status(job_id, "Queued", user, total=len(leads), done=0, changed=0)
+
+
+@frappe.whitelist()
+def bulk_assign_crm_lead_owner(leads, new_owner):
+    from siya_clinic.api.crm_lead.assign_guard import _is_team_leader
+
+    if not _is_team_leader(frappe.session.user):
+        frappe.throw(
+            "Only Team Leaders can assign CRM Leads.",
+            frappe.PermissionError
+        )
+
+    if isinstance(leads, str):
+        leads = frappe.parse_json(leads)
+
+    if not frappe.db.exists("User", {"name": new_owner, "enabled": 1}):
+        frappe.throw("Invalid or disabled user selected")
+
+    return enqueue_bulk_reassignment(leads, new_owner)
+
+
+@frappe.whitelist()
+def get_bulk_reassignment_status(job: str):
+    from siya_clinic.api.crm_lead.assign_guard import _is_team_leader
+
+    if not _is_team_leader(frappe.session.user):
+        frappe.throw("Not permitted", frappe.PermissionError)
+
+    info = _get_status(job)
+    if info and info.get("status") not in (None, "Queued") and cint(info.get("total")):
+        info["percent"] = round(cint(info.get("done")) * 100 / cint(info.get("total")))
+    return info
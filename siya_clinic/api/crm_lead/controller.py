@@ -4,7 +4,8 @@
 from pydoc import doc
 import frappe
 from siya_clinic.api.crm_lead.utils import clean_spaces
-from frappe.core.doctype.user_permission.user_permission import get_user_permissions
+from siya_clinic.api.crm_lead.assignee_index import refresh_lead_assignees
+from siya_clinic.api.crm_lead.access import get_allowed_pipelines
 
 
 # ---------------------------------------------------------------------------
@@ -50,19 +51,7 @@ def _agent_allowed_for_pipeline(user: str, pipeline: str) -> bool:
     """
     Check whether agent has User Permission for given SR Lead Pipeline
     """
-    perms = get_user_permissions(user) or {}
-    raw = perms.get("SR Lead Pipeline") or []
-
-    allowed = set()
-    for v in raw:
-        if isinstance(v, str):
-            allowed.add(v)
-        elif isinstance(v, dict):
-            allowed.add(v.get("doc") or v.get("value") or v.get("name"))
-
-    allowed.discard(None)
-    allowed.discard("")
-    return pipeline in allowed
+    return pipeline in get_allowed_pipelines(user)
 
 
 # ---------------------------------------------------------------------------
@@ -91,6 +80,7 @@ def _get_pipeline_title(pipeline_id: str) -> str:
 @frappe.whitelist()
 def assign_crm_lead_owner(leads, new_owner):
     from siya_clinic.api.crm_lead.assign_guard import _is_team_leader
+    from siya_clinic.api.crm_lead.bulk_assign import BULK_THRESHOLD, enqueue_bulk_reassignment
 
     if not _is_team_leader(frappe.session.user):
         frappe.throw(
@@ -104,6 +94,10 @@ def assign_crm_lead_owner(leads, new_owner):
     if not frappe.db.exists("User", {"name": new_owner, "enabled": 1}):
         frappe.throw("Invalid or disabled user selected")
 
+    # Large selections → background job with set-wise writes
+    if len(leads) > BULK_THRESHOLD:
+        return enqueue_bulk_reassignment(leads, new_owner)
+
     for lead in leads:
         doc = frappe.get_doc("CRM Lead", lead)
 
@@ -138,6 +132,8 @@ def assign_crm_lead_owner(leads, new_owner):
               AND reference_name=%s
               AND status='Open'
         """, lead)
+        # raw UPDATE skips ToDo hooks → keep the assignee index in step
+        refresh_lead_assignees(lead)
 
         # Assign to new owner
         from frappe.desk.form.assign_to import add
@@ -0,0 +1,79 @@
+# siya_clinic/api/crm_lead/guard_benchmark.py
+# Micro-benchmark: CRM Lead field guard, per-field queries vs one pass
+
+"""
+Runs guard_restricted_fields against an existing lead (no writes) as a
+Team Leader edit, in three modes:
+
+- legacy:          one frappe.db.get_value per guarded field (old _changed)
+- single query:    no doc_before_save, one query for all guarded fields
+- doc_before_save: compared in memory, no query
+
+    bench --site <site> execute siya_clinic.api.crm_lead.guard_benchmark.run --kwargs "{'iterations': 2000}"
+
+Returns guard checks per second for each mode (bench execute prints it);
+an upper bound on the saves per second the guard allows.
+"""
+
+from __future__ import annotations
+
+import time
+
+import frappe
+
+from siya_clinic.api.crm_lead import guards
+
+
+def _legacy_changed_fields(doc, fields):
+    out = set()
+    for f in fields:
+        prev = frappe.db.get_value(doc.doctype, doc.name, f)
+        if (doc.get(f) or "") != (prev or ""):
+            out.add(f)
+    return out
+
+
+def _time(doc, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        guards.guard_restricted_fields(doc)
+    return iterations / (time.perf_counter() - start)
+
+
+def run(iterations: int = 1000, lead: str | None = None, user: str | None = None) -> dict:
+    lead = lead or frappe.db.get_value("CRM Lead", {}, "name", order_by="modified desc")
+    if not lead:
+        frappe.throw("No CRM Lead to benchmark against")
+
+    # a Team Leader editing a non-locked field: every guarded field is compared
+    user = user or frappe.db.get_value("Has Role", {"role": guards.TL, "parenttype": "User"}, "parent")
+    if not user:
+        frappe.throw("No Team Leader user to benchmark with")
+
+    doc = frappe.get_doc("CRM Lead", lead)
+    doc._doc_before_save = frappe.get_doc("CRM Lead", lead)
+
+    prev_user = frappe.session.user
+    frappe.set_user(user)
+    try:
+        current = _time(doc, iterations)
+
+        doc._doc_before_save = None
+        one_query = _time(doc, iterations)
+
+        original = guards._changed_fields
+        guards._changed_fields = _legacy_changed_fields
+        try:
+            legacy = _time(doc, iterations)
+        finally:
+            guards._changed_fields = original
+    finally:
+        frappe.set_user(prev_user)
+
+    return {
+        "iterations": iterations,
+        "unit": "guard checks per second",
+        "legacy_per_field_queries": round(legacy, 1),
+        "single_query": round(one_query, 1),
+        "doc_before_save": round(current, 1),
+    }
@@ -4,6 +4,8 @@
 from __future__ import annotations
 import frappe
 
+from siya_clinic.api.common.role_context import get_role_context
+
 TL = "Team Leader"
 AG = "Agent"
 
@@ -12,12 +14,18 @@ ALWAYS_LOCK = {"sr_lead_pipeline", "sr_lead_platform", "source", "mobile_no", "p
 # Agents can never change this
 AGENT_LOCK  = {"lead_owner"}
 
+# Extra fields per site, e.g. site_config.json:
+#   "sr_crm_lead_always_lock": ["email"], "sr_crm_lead_agent_lock": ["status"]
+# All guarded fields are compared in one pass, so more fields cost no extra queries.
+ALWAYS_LOCK_CONF = "sr_crm_lead_always_lock"
+AGENT_LOCK_CONF = "sr_crm_lead_agent_lock"
+
 PRIVILEGED_USERS = {"Administrator"}
 PRIVILEGED_ROLES = {"System Manager"}
 
 def _roles(user: str) -> set[str]:
     try:
-        return set(frappe.get_roles(user) or [])
+        return set(get_role_context(user).roles)
     except Exception:
         return set()
 
@@ -34,13 +42,28 @@ def _has_role(user: str, role: str) -> bool:
     return role in _roles(user)
 
 
-def _changed(doc, field: str) -> bool:
-    """Did this field actually change? (on insert: treat non-empty as change)"""
+def _guarded_fields() -> tuple[set[str], set[str]]:
+    always = ALWAYS_LOCK | set(frappe.conf.get(ALWAYS_LOCK_CONF) or [])
+    agent = AGENT_LOCK | set(frappe.conf.get(AGENT_LOCK_CONF) or [])
+    return always, agent
+
+
+def _changed_fields(doc, fields: set[str]) -> set[str]:
+    """
+    Which of these fields actually changed? (on insert: treat non-empty as change)
+    Compares against doc_before_save (already loaded by save); falls back to
+    ONE query for all fields when it is not available.
+    """
     if doc.is_new():
-        val = doc.get(field)
-        return val not in (None, "", [])
-    prev = frappe.db.get_value(doc.doctype, doc.name, field)
-    return (doc.get(field) or "") != (prev or "")
+        return {f for f in fields if doc.get(f) not in (None, "", [])}
+
+    before = doc.get_doc_before_save()
+    if before is not None:
+        prev = {f: before.get(f) for f in fields}
+    else:
+        prev = frappe.db.get_value(doc.doctype, doc.name, list(fields), as_dict=True) or {}
+
+    return {f for f in fields if (doc.get(f) or "") != (prev.get(f) or "")}
 
 
 def guard_restricted_fields(doc, method=None):
@@ -62,23 +85,25 @@ def guard_restricted_fields(doc, method=None):
     is_tl    = _has_role(user, TL)
     is_agent = _has_role(user, AG)
 
+    always_lock, agent_lock = _guarded_fields()
+    changed = _changed_fields(doc, always_lock | (agent_lock if is_agent else set()))
+
     blocked: set[str] = set()
 
-    # Three locked fields:
+    # Locked fields:
     # - TL can set on INSERT only
     # - Later edits blocked for TL/Agent
     # - Agents blocked even on insert
-    for f in ALWAYS_LOCK:
-        if _changed(doc, f):
-            if doc.is_new():
-                if not is_tl:
-                    blocked.add(f)
-            else:
+    for f in always_lock & changed:
+        if doc.is_new():
+            if not is_tl:
                 blocked.add(f)
+        else:
+            blocked.add(f)
 
     # Agents cannot change lead_owner
-    if is_agent and _changed(doc, "lead_owner"):
-        blocked.add("lead_owner")
+    if is_agent:
+        blocked |= agent_lock & changed
 
     if blocked:
         frappe.throw(
@@ -2,8 +2,12 @@
 # after_insert automation for CRM Lead (NO auto-sync on update)
 
 from __future__ import annotations
+import json
+
 import frappe
 from frappe.desk.form import assign_to
+from frappe.utils import add_to_date, get_datetime, now_datetime
+from frappe.utils.data import cint
 
 DOCTYPE = "CRM Lead"
 
@@ -102,14 +106,213 @@ def on_update(doc, method: str | None = None) -> None:
 # Utilities (explicit admin use only)
 # -----------------------------
 
+RESYNC_CHUNK_SIZE = 1000
+RESYNC_CACHE_KEY = "siya_lead_resync"
+# a Queued / Running job whose status has not moved for this long is dead
+RESYNC_STALE_MINUTES = 30
+
+
+def _resync_status(job: str, status: str | None = None, **values) -> frappe._dict:
+    """Job state + checkpoint (cursor) in Redis; a restarted job resumes from cursor."""
+    info = frappe._dict(frappe.cache().hget(RESYNC_CACHE_KEY, job) or {})
+    if status:
+        info.update(job=job, status=status, updated=str(now_datetime()), **values)
+        frappe.cache().hset(RESYNC_CACHE_KEY, job, info)
+        frappe.cache().hset(RESYNC_CACHE_KEY, "latest", job)
+    return info
+
+
+def _resync_active(info: dict) -> bool:
+    """Queued or Running, and its status was updated recently."""
+    if info.get("status") not in ("Queued", "Running"):
+        return False
+    updated = get_datetime(info.get("updated"))
+    return updated > add_to_date(now_datetime(), minutes=-RESYNC_STALE_MINUTES)
+
+
+def _scan_chunk(cursor: str, chunk_size: int) -> list[dict]:
+    """
+    Next keyset chunk of leads with their assignment/share counters (one query).
+    Index-backed counts per lead; no documents are loaded.
+    """
+    return frappe.db.sql(
+        """
+        SELECT l.name, IFNULL(l.lead_owner, '') AS owner,
+            (SELECT COUNT(*) FROM `tabToDo` t
+             WHERE t.reference_type = 'CRM Lead' AND t.reference_name = l.name
+               AND t.status = 'Open') AS open_todos,
+            (SELECT COUNT(*) FROM `tabToDo` t
+             WHERE t.reference_type = 'CRM Lead' AND t.reference_name = l.name
+               AND t.status = 'Open' AND t.allocated_to = l.lead_owner) AS owner_todos,
+            (SELECT COUNT(*) FROM `tabDocShare` s
+             WHERE s.share_doctype = 'CRM Lead' AND s.share_name = l.name) AS shares,
+            (SELECT COUNT(*) FROM `tabDocShare` s
+             WHERE s.share_doctype = 'CRM Lead' AND s.share_name = l.name
+               AND s.user = l.lead_owner AND s.`read` = 1 AND s.`write` = 1) AS owner_shares
+        FROM `tabCRM Lead` l
+        WHERE l.name > %s
+        ORDER BY l.name
+        LIMIT %s
+        """,
+        (cursor, chunk_size),
+        as_dict=True,
+    )
+
+
+def _out_of_sync(row) -> bool:
+    """Target state: owner → exactly one open ToDo + one read/write share for owner; else none."""
+    if not row.owner:
+        return bool(row.open_todos or row.shares)
+    return (row.open_todos, row.owner_todos, row.shares, row.owner_shares) != (1, 1, 1, 1)
+
+
+def _repair_leads(rows: list[dict]) -> None:
+    """Set-wise version of _sync_assignment_from_owner_on_insert for many leads."""
+    from siya_clinic.api.crm_lead.assignee_index import refresh_lead_assignees
+
+    names = tuple(r.name for r in rows)
+    owned = [r for r in rows if r.owner]
+    now = now_datetime()
+    user = frappe.session.user
+    base = (now, now, user, user, 0)
+
+    # assign_to.clear → Cancelled
+    frappe.db.sql(
+        """
+        UPDATE `tabToDo`
+        SET status = 'Cancelled', modified = %(now)s, modified_by = %(user)s
+        WHERE reference_type = 'CRM Lead' AND reference_name IN %(names)s AND status = 'Open'
+        """,
+        {"names": names, "now": now, "user": user},
+    )
+    frappe.db.sql(
+        "DELETE FROM `tabDocShare` WHERE share_doctype = 'CRM Lead' AND share_name IN %(names)s",
+        {"names": names},
+    )
+
+    if owned:
+        frappe.db.bulk_insert(
+            "ToDo",
+            fields=[
+                "name", "creation", "modified", "owner", "modified_by", "docstatus",
+                "status", "priority", "allocated_to", "description",
+                "reference_type", "reference_name", "assigned_by",
+            ],
+            values=[
+                (frappe.generate_hash(length=10), *base, "Open", "Medium", r.owner,
+                 "Lead Owner", DOCTYPE, r.name, user)
+                for r in owned
+            ],
+        )
+        frappe.db.bulk_insert(
+            "DocShare",
+            fields=[
+                "name", "creation", "modified", "owner", "modified_by", "docstatus",
+                "share_doctype", "share_name", "user", "read", "write", "share", "notify_by_email",
+            ],
+            values=[
+                (frappe.generate_hash(length=10), *base, DOCTYPE, r.name, r.owner, 1, 1, 0, 0)
+                for r in owned
+            ],
+        )
+
+    frappe.db.bulk_update(
+        DOCTYPE,
+        {r.name: {"_assign": json.dumps([r.owner] if r.owner else [])} for r in rows},
+        update_modified=False,
+    )
+    refresh_lead_assignees(names)
+
+
+def run_resync_leads(job: str, diff_only: bool = True, chunk_size: int = RESYNC_CHUNK_SIZE) -> None:
+    """
+    Background job. Keyset-paginated over CRM Lead, committed and
+    checkpointed per chunk. diff_only repairs only mismatched leads.
+    """
+    info = _resync_status(job)
+    cursor = info.get("cursor") or ""
+    scanned = cint(info.get("scanned"))
+    repaired = cint(info.get("repaired"))
+    chunk_size = cint(chunk_size) or RESYNC_CHUNK_SIZE
+
+    _resync_status(job, "Running", diff_only=cint(diff_only))
+
+    try:
+        while True:
+            rows = _scan_chunk(cursor, chunk_size)
+            if not rows:
+                break
+
+            todo = [r for r in rows if _out_of_sync(r)] if diff_only else rows
+            if todo:
+                _repair_leads(todo)
+
+            scanned += len(rows)
+            repaired += len(todo)
+            cursor = rows[-1].name
+
+            frappe.db.commit()
+            _resync_status(job, "Running", cursor=cursor, scanned=scanned, repaired=repaired)
+
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(frappe.get_traceback(), "CRM Lead resync failed")
+        _resync_status(job, "Failed")
+        raise
+
+    _resync_status(job, "Completed", scanned=scanned, repaired=repaired)
+
+
 @frappe.whitelist()
-def resync_all_leads() -> dict:
+def resync_all_leads(diff_only: int = 1, resume: str | None = None, chunk_size: int = RESYNC_CHUNK_SIZE) -> dict:
     """
     Manual admin-only repair tool.
     Does NOT run automatically.
+
+    Queues a chunked background job. diff_only=1 (default) touches only
+    leads whose owner / assignment / share disagree; diff_only=0 rewrites
+    all. Pass resume=<job> to continue a failed or interrupted (stale,
+    see RESYNC_STALE_MINUTES) run from its last checkpoint. Only one run
+    is active at a time: two workers on the same chunks would write
+    duplicate ToDos / DocShares.
     """
-    names = frappe.get_all(DOCTYPE, pluck="name")
-    for name in names:
-        d = frappe.get_doc(DOCTYPE, name)
-        _sync_assignment_from_owner_on_insert(d)
-    return {"status": "ok", "count": len(names)}
+    frappe.only_for("System Manager")
+
+    if resume:
+        info = _resync_status(resume)
+        if not info:
+            frappe.throw(f"Unknown resync job {resume}")
+        if info.get("status") == "Completed":
+            return info
+        if _resync_active(info):
+            frappe.throw(f"Resync job {resume} is still {info.get('status')}")
+        job = resume
+        diff_only = info.get("diff_only", diff_only)
+    else:
+        latest = frappe.cache().hget(RESYNC_CACHE_KEY, "latest")
+        info = _resync_status(latest) if latest else {}
+        if _resync_active(info):
+            frappe.throw(f"Resync job {latest} is still {info.get('status')}")
+        job = frappe.generate_hash(length=10)
+
+    # before enqueueing: a fast worker's "Running" must not be overwritten
+    info = _resync_status(job, "Queued", diff_only=cint(diff_only))
+    frappe.enqueue(
+        "siya_clinic.api.crm_lead.lifecycle.run_resync_leads",
+        queue="long",
+        timeout=3600 * 4,
+        job_id=f"lead-resync::{job}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        job=job,
+        diff_only=cint(diff_only),
+        chunk_size=cint(chunk_size),
+    )
+    return info
+
+
+@frappe.whitelist()
+def get_resync_status(job: str | None = None) -> dict:
+    frappe.only_for("System Manager")
+    job = job or frappe.cache().hget(RESYNC_CACHE_KEY, "latest")
+    return _resync_status(job) if job else {}
@@ -1,9 +1,7 @@
 import frappe
 import re
-from siya_clinic.api.common.global_duplicates import (
-    validate_global_mobile,
-    validate_global_email,
-)
+from siya_clinic.api.common.global_duplicates import validate_global_duplicates
+from siya_clinic.api.common.phone_index import set_normalized_phone_fields
 
 def normalize_indian_mobile(value):
     if not value:
@@ -16,6 +14,8 @@ def normalize_customer_contact_numbers(doc, method=None):
     if doc.mobile_no:
         doc.mobile_no = normalize_indian_mobile(doc.mobile_no)
 
+    set_normalized_phone_fields(doc)
+
 
 def normalize_customer_email(doc, method=None):
     if doc.email_id:
@@ -32,5 +32,5 @@ def validate_customer_global_duplicates(doc, method=None):
     if getattr(frappe.flags, "in_shopify_api", False):
         return
 
-    validate_global_mobile(doc.mobile_no, "Customer", doc.name)
-    validate_global_email(doc.email_id, "Customer", doc.name)
+    # One set-based pass for both mobile and email
+    validate_global_duplicates(doc.mobile_no, doc.email_id, "Customer", doc.name)
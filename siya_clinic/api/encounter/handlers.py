@@ -12,6 +12,28 @@ import frappe
 from frappe.utils import flt, nowdate
 from erpnext.accounts.party import get_party_account
 
+from siya_clinic.api.common.biller_warehouse import get_role_warehouse
+from siya_clinic.api.common.role_context import get_role_context
+from siya_clinic.api.item.item_attributes import (
+    get_default_warehouse,
+    get_selling_rate,
+    is_stock_item,
+    prefetch_default_warehouses,
+    prefetch_items,
+    prefetch_selling_rates,
+)
+from siya_clinic.api.payment_entry.allocation import allocate_pending_payment_entries
+from siya_clinic.api.sales_invoice.source_encounter import (
+    SI_F_SOURCE_ENCOUNTER,
+    get_invoice_for_encounter,
+)
+from siya_clinic.api.sales_invoice.tax_resolver import (
+    get_company_address,
+    get_company_state,
+    get_customer_state,
+    resolve_sales_taxes,
+)
+
 # Encounter Master variables
 F_ENCOUNTER_TYPE = "sr_encounter_type" # "Followup" / "Order"
 F_ENCOUNTER_PLACE = "sr_encounter_place" # "Online" / "OPD"
@@ -28,13 +50,6 @@ SI_F_SALES_TYPE = "sr_si_sales_type"
 SI_F_ORDER_SOURCE = "sr_si_order_source"
 SI_F_DELIVERY_TYPE = "sr_si_delivery_type"
 
-# Optional back-link on SI (create if you like)
-SI_F_SOURCE_ENCOUNTER = "source_encounter" # Link → Patient Encounter (optional)
-
-# Tax templates (adjust names if yours differ)
-TAX_TEMPLATE_INTRASTATE = "Output GST In-state"
-TAX_TEMPLATE_INTERSTATE = "Output GST Out-state"
-
 # If True also writes to SI POS payments (GL on submit) — keep False if you use PEs
 USE_POS_PAYMENTS_ROW = False
 
@@ -62,18 +77,9 @@ def _get_item_selling_rate(item_code: str, price_list: str = "Standard Selling")
     Fetch actual selling price from Item Price.
     Used for Sales Invoice item rate.
     (NOT encounter rate)
+    Batched: prefetch_selling_rates() for the whole document first.
     """
-    filters = {
-        "item_code": item_code,
-        "price_list": price_list,
-    }
-
-    rate = frappe.db.get_value(
-        "Item Price",
-        filters,
-        "price_list_rate"
-    )
-    return flt(rate or 0)
+    return get_selling_rate(item_code, price_list)
 
 
 def _find_item_rows(doc) -> List[Dict[str, Any]]:
@@ -91,7 +97,7 @@ def _has_any_attachment(doc) -> bool:
 
 
 def _is_stock_item(item_code: str) -> int:
-    return frappe.db.get_value("Item", item_code, "is_stock_item") or 0
+    return is_stock_item(item_code)
 
 
 def _valid_warehouse(wh_name: Optional[str], company: str) -> bool:
@@ -139,20 +145,14 @@ def _resolve_encounter_warehouse(doc) -> str:
     """
     place = (doc.get("sr_encounter_place") or "").strip().lower()
     company = doc.company
-    user = frappe.session.user
-    roles = frappe.get_roles(user)
+    ctx = get_role_context()
 
     def get_company_warehouse(keyword):
-        """Find warehouse by keyword for this company."""
-        wh = frappe.db.get_value(
-            "Warehouse",
-            {"company": company, "warehouse_name": ["like", f"%{keyword}%"]},
-            "name"
-        )
-        return wh
+        """Biller warehouse for this company (SR Biller Warehouse Settings, cached)."""
+        return get_role_warehouse(f"{keyword} Biller", company)
 
     # ---------------- Admin / System Manager ----------------
-    if "Administrator" in roles or "System Manager" in roles:
+    if ctx.has_any("Administrator", "System Manager"):
         if place == "opd":
             wh = get_company_warehouse("OPD")
         else:
@@ -164,7 +164,7 @@ def _resolve_encounter_warehouse(doc) -> str:
 
     # ---------------- OPD Encounter ----------------
     if place == "opd":
-        if "OPD Biller" not in roles:
+        if not ctx.has("OPD Biller"):
             frappe.throw("You are not allowed to submit OPD Encounters.")
 
         wh = get_company_warehouse("OPD")
@@ -174,7 +174,7 @@ def _resolve_encounter_warehouse(doc) -> str:
 
     # ---------------- Online Encounter ----------------
     if place == "online":
-        if "Packaging Biller" not in roles:
+        if not ctx.has("Packaging Biller"):
             frappe.throw("You are not allowed to submit Online Encounters.")
 
         wh = get_company_warehouse("Packaging")
@@ -186,107 +186,37 @@ def _resolve_encounter_warehouse(doc) -> str:
 
 
 def _sanitize_si_warehouses(si, company: str) -> None:
+    codes = [row.item_code for row in si.items]
+    prefetch_items(codes)
+    prefetch_default_warehouses(codes, company)
+
+    valid = {}
+
+    def is_valid(wh):
+        if wh not in valid:
+            valid[wh] = _valid_warehouse(wh, company)
+        return valid[wh]
+
     for row in si.items:
         if not _is_stock_item(row.item_code):
             row.warehouse = None
-        elif not _valid_warehouse(row.warehouse, company):
-            wh = frappe.db.get_value("Item Default", {"parent": row.item_code, "company": company}, "default_warehouse")
-            if not _valid_warehouse(wh, company):
-                wh = DEFAULT_FALLBACK_WAREHOUSE if (DEFAULT_FALLBACK_WAREHOUSE and _valid_warehouse(DEFAULT_FALLBACK_WAREHOUSE, company)) else None
+        elif not is_valid(row.warehouse):
+            wh = get_default_warehouse(row.item_code, company)
+            if not is_valid(wh):
+                wh = DEFAULT_FALLBACK_WAREHOUSE if (DEFAULT_FALLBACK_WAREHOUSE and is_valid(DEFAULT_FALLBACK_WAREHOUSE)) else None
             row.warehouse = wh
 
 
-def _get_primary_address_for(doctype: str, name: str) -> Optional[str]:
-    if doctype == "Customer":
-        addr = frappe.db.get_value("Customer", name, "customer_primary_address")
-        if addr and frappe.db.exists("Address", addr):
-            return addr
-    links = frappe.get_all("Dynamic Link", filters={"parenttype": "Address", "link_doctype": doctype, "link_name": name}, fields=["parent"], order_by="modified desc", limit=20)
-    if not links:
-        return None
-    for dl in links:
-        if frappe.db.get_value("Address", dl.parent, "is_primary_address"):
-            return dl.parent
-    return links[0]["parent"]
-
-
-def _get_address_state(addr_name: Optional[str]) -> Optional[str]:
-    return frappe.db.get_value("Address", addr_name, "state") if addr_name else None
-
-
-def _get_customer_state(customer: str) -> Optional[str]:
-    return _get_address_state(_get_primary_address_for("Customer", customer))
-
-
-def _get_company_state(company: str) -> Optional[str]:
-    return _get_address_state(_get_primary_address_for("Company", company))
-
-
-def _get_company_primary_address(company: str) -> Optional[str]:
-    links = frappe.get_all("Dynamic Link", filters={"parenttype": "Address", "link_doctype": "Company", "link_name": company}, fields=["parent"], limit=100)
-    if not links:
-        return None
-    addr_names = [dl.parent for dl in links if dl.parent]
-    primary = frappe.get_all("Address", filters={"name": ["in", addr_names], "is_primary_address": 1}, fields=["name"], limit=1)
-    if primary:
-        return primary[0]["name"]
-    recent = frappe.get_all("Address", filters={"name": ["in", addr_names]}, fields=["name"], order_by="modified desc", limit=1)
-    return recent[0]["name"] if recent else None
-
-
-def _choose_tax_template_by_state(company: str, customer: str) -> Optional[str]:
-    cust_state = (_get_customer_state(customer) or "").strip().lower()
-    comp_state = (_get_company_state(company) or "").strip().lower()
-    if not cust_state or not comp_state:
-        return None
-    intrastate = cust_state == comp_state
-    prefer_name = TAX_TEMPLATE_INTRASTATE if intrastate else TAX_TEMPLATE_INTERSTATE
-    tmpl = frappe.db.get_value("Sales Taxes and Charges Template", {"company": company, "disabled": 0, "name": prefer_name}, "name")
-    if tmpl:
-        return tmpl
-    keyword = "In-state" if intrastate else "Out-state"
-    tmpl = frappe.db.get_value("Sales Taxes and Charges Template", {"company": company, "disabled": 0, "name": ["like", f"%{keyword}%"]}, "name") \
-        or frappe.db.get_value("Sales Taxes and Charges Template", {"company": company, "disabled": 0, "title": ["like", f"%{keyword}%"]}, "name")
-    return tmpl
-
-
 def _set_tax_template_by_state(si, customer: str) -> None:
-    tmpl = _choose_tax_template_by_state(si.company, customer)
-    if tmpl:
-        si.taxes_and_charges = tmpl
-        si.set("taxes", [])
-
-
-def _apply_company_tax_template(si) -> None:
-    if si.taxes_and_charges:
-        return
-    tmpl = frappe.db.get_value("Sales Taxes and Charges Template", {"company": si.company, "is_default": 1, "disabled": 0}, "name")
-    if not tmpl:
-        tmpl = frappe.db.get_value("Sales Taxes and Charges Template", {"company": si.company, "disabled": 0}, "name")
-    if tmpl:
-        si.taxes_and_charges = tmpl
-        si.set("taxes", [])
-
-
-def _company_safe_tax_rows(si) -> None:
-    fixed = []
-    for t in list(si.get("taxes") or []):
-        acc = getattr(t, "account_head", None)
-        if not acc:
-            continue
-        acc_doc = frappe.db.get_value("Account", acc, ["company", "account_name", "account_number"], as_dict=True)
-        if not acc_doc:
-            continue
-        if acc_doc.company == si.company:
-            fixed.append(t);
-            continue
-        mapped = frappe.db.get_value("Account", {"company": si.company, "account_name": acc_doc.account_name, "is_group": 0}, "name")
-        if not mapped and acc_doc.account_number:
-            mapped = frappe.db.get_value("Account", {"company": si.company, "account_number": acc_doc.account_number, "is_group": 0}, "name")
-        if mapped:
-            t.account_head = mapped
-            fixed.append(t)
-    si.set("taxes", fixed)
+    """GST template + company-safe tax rows from the shared (cached) resolver."""
+    res = resolve_sales_taxes(
+        si.company,
+        get_company_state(si.company),
+        get_customer_state(customer),
+        fallback_to_default=True,
+    )
+    si.taxes_and_charges = res.template
+    si.set("taxes", res.taxes)
 
 
 def _party_account(company: str, party_type: str, party: str) -> Optional[str]:
@@ -301,100 +231,136 @@ def _party_account(company: str, party_type: str, party: str) -> Optional[str]:
         return None
 
 
-def _mop_account(company: str, mop: str) -> Optional[str]:
-    acc = frappe.db.get_value("Mode of Payment Account", {"parent": mop, "company": company}, "default_account")
-    if not acc:
-        acc = frappe.db.get_value("Mode of Payment Account", {"parent": mop, "company": company}, "account")
-    return acc
-
-
-def _create_draft_payment_entry(
-    encounter,
-    customer,
-    mop,
-    amount,
-    intended_si_name,
-    reference_no=None,
-    reference_date=None,
-    order_source=None,
-    encounter_place=None,
-    sales_type=None,
-    delivery_type=None,
-) -> str:
+def _mop_accounts(company: str, mops) -> dict[str, str]:
+    """Mode of Payment -> company default account, one query for all MoPs."""
+    mops = [m for m in set(mops) if m]
+    if not mops:
+        return {}
+    rows = frappe.get_all(
+        "Mode of Payment Account",
+        filters={"parent": ["in", mops], "company": company},
+        fields=["parent", "default_account"],
+    )
+    return {r.parent: r.default_account for r in rows if r.default_account}
+
+
+def _mmp_get(row, key: str):
+    return row.get(key) if isinstance(row, dict) else getattr(row, key, None)
+
+
+def _create_draft_payment_entries(encounter, customer: str, intended_si_name: str, rows) -> dict[str, Any]:
     """
-    Create a draft Payment Entry (ignore_permissions) and return name.
-    Now accepts optional reference_no and reference_date (from multi-payment row).
+    One draft Payment Entry (ignore_permissions) per SR Multi Mode Payment row
+    with a positive amount.
+
+    Party / receivable / MoP accounts, patient name and PE meta are resolved
+    once for the encounter; the child-row back-links and the PEs' party_name
+    are written in one bulk update each. Each PE is inserted under its own savepoint, so one bad row
+    does not roll back the others.
+
+    Returns {"created": [{idx, row, payment_entry}], "failed": [{idx, row, error}]}
     """
-    pe = frappe.new_doc("Payment Entry")
-    pe.update({
-        "payment_type": "Receive",
-        "company": encounter.company,
-        "posting_date": nowdate(),
-        "mode_of_payment": mop,
-        "party_type": "Customer",
-        "party": customer,
-        # set readable party_name so list view shows friendly name
-        "party_name": getattr(encounter, "patient_name", None) or (
-            frappe.db.get_value("Patient", encounter.get("patient"), "patient_name")
-            if encounter.get("patient") else None
-        ),
-        "paid_amount": amount,
-        "received_amount": amount,
-        "reference_no": reference_no,
-        "reference_date": reference_date,
-    })
+    result = {"created": [], "failed": []}
 
-    # HRMS override expects party_account prefilled
-    party_acc = _party_account(encounter.company, "Customer", customer) \
-        or frappe.db.get_value("Company", encounter.company, "default_receivable_account")
-    if party_acc:
-        pe.party_account = party_acc
-        pe.paid_from = party_acc  # for Receive
+    rows = [m for m in rows if flt(_mmp_get(m, "mmp_paid_amount") or 0) > 0]
+    if not rows:
+        return result
+
+    company = encounter.company
+    posting_date = nowdate()
 
-    paid_to_acc = _mop_account(encounter.company, mop)
-    if paid_to_acc:
-        pe.paid_to = paid_to_acc
+    patient_name = getattr(encounter, "patient_name", None) or (
+        frappe.db.get_value("Patient", encounter.get("patient"), "patient_name")
+        if encounter.get("patient") else None
+    ) or encounter.get("patient")
 
+    # HRMS override expects party_account prefilled
+    party_acc = _party_account(company, "Customer", customer) \
+        or frappe.get_cached_value("Company", company, "default_receivable_account")
+    mop_accounts = _mop_accounts(company, [_mmp_get(m, "mmp_mode_of_payment") for m in rows])
+
+    # map Encounter custom fields onto Payment Entry IF those fields exist
+    pe_meta = frappe.get_meta("Payment Entry")
+    encounter_fields = {
+        pe_field: encounter.get(enc_field)
+        for pe_field, enc_field in (
+            ("sr_pe_order_source", F_SOURCE),
+            ("sr_pe_encounter_place", F_ENCOUNTER_PLACE),
+            ("sr_pe_sales_type", F_SALES_TYPE),
+            ("sr_pe_delivery_type", F_DELIVERY_TYPE),
+        )
+        if encounter.get(enc_field) and pe_meta.has_field(pe_field)
+    }
     # store intended SI id so we can auto-link on SI submit
-    if hasattr(pe, "intended_sales_invoice"):
-        pe.intended_sales_invoice = intended_si_name
-    
-    # --- NEW: map Encounter custom fields onto Payment Entry IF those fields exist ---
-    try:
-        pe_meta = frappe.get_meta("Payment Entry")
-        if order_source and pe_meta.has_field("sr_pe_order_source"):
-            pe.sr_pe_order_source = order_source
-        if encounter_place and pe_meta.has_field("sr_pe_encounter_place"):
-            pe.sr_pe_encounter_place = encounter_place
-        if sales_type and pe_meta.has_field("sr_pe_sales_type"):
-            pe.sr_pe_sales_type = sales_type
-        if delivery_type and pe_meta.has_field("sr_pe_delivery_type"):
-            pe.sr_pe_delivery_type = delivery_type
-    except Exception:
-        # non-fatal if meta lookup fails
-        frappe.log("Failed to map encounter meta fields to Payment Entry (non-fatal)")
+    if pe_meta.has_field("intended_sales_invoice"):
+        encounter_fields["intended_sales_invoice"] = intended_si_name
+
+    backlinks = {}
+    party_names = {}
+    for pos, m in enumerate(rows):
+        idx = _mmp_get(m, "idx")
+        row_name = _mmp_get(m, "name")
+        mop = _mmp_get(m, "mmp_mode_of_payment") or None
+        amount = flt(_mmp_get(m, "mmp_paid_amount"))
+        save_point = f"encounter_pe_{pos}"
 
-    pe.set_missing_values()
-    pe.flags.ignore_permissions = True
-    pe.insert(ignore_permissions=True)
-    return pe.name
+        try:
+            frappe.db.savepoint(save_point)
+
+            pe = frappe.new_doc("Payment Entry")
+            pe.update({
+                "payment_type": "Receive",
+                "company": company,
+                "posting_date": posting_date,
+                "mode_of_payment": mop,
+                "party_type": "Customer",
+                "party": customer,
+                "paid_amount": amount,
+                "received_amount": amount,
+                "reference_no": _mmp_get(m, "mmp_reference_no"),
+                "reference_date": _mmp_get(m, "mmp_reference_date"),
+                **encounter_fields,
+            })
+            if party_acc:
+                pe.party_account = party_acc
+                pe.paid_from = party_acc  # for Receive
+            if mop_accounts.get(mop):
+                pe.paid_to = mop_accounts[mop]
+
+            pe.set_missing_values()
+            # readable party_name so list view shows the patient
+            if patient_name:
+                pe.party_name = patient_name
+            pe.flags.ignore_permissions = True
+            pe.insert(ignore_permissions=True)
+
+        except Exception as e:
+            frappe.db.rollback(save_point=save_point)
+            frappe.log_error(frappe.get_traceback(), "Failed creating PE from encounter multi payment row")
+            result["failed"].append({"idx": idx, "row": row_name, "error": str(e)})
+            continue
+
+        result["created"].append({"idx": idx, "row": row_name, "payment_entry": pe.name})
+        # validate -> set_missing_values resets party_name to the Customer's name
+        if patient_name and pe.party_name != patient_name:
+            party_names[pe.name] = {"party_name": patient_name}
+        # record created PE back on the child row (SR Multi Mode Payment)
+        if row_name:
+            backlinks[row_name] = {"mmp_payment_entry": pe.name, "mmp_posting_date": pe.posting_date}
+
+    if backlinks:
+        frappe.db.bulk_update("SR Multi Mode Payment", backlinks, update_modified=False)
+    if party_names:
+        frappe.db.bulk_update("Payment Entry", party_names, update_modified=False)
+
+    return result
 
 
 
 
 # ---------------- Event Handlers ----------------
 def validate_agent_status_change(doc, method):
-    user = frappe.session.user
-    roles = frappe.get_roles(user)
-
-    is_pure_agent = (
-        "Agent" in roles
-        and "System Manager" not in roles
-        and "Administrator" not in roles
-        and "Healthcare Practitioner" not in roles
-    )
-
-    if not is_pure_agent:
+    if not get_role_context().is_pure_agent:
         return
 
     if doc.is_new():
@@ -415,10 +381,8 @@ def validate_agent_followup_online_source(doc, method=None):
     Ensure Encounter Source is provided for Online Follow-up / Order
     encounters created or edited by Agents while in Draft state.
     """
-    roles = frappe.get_roles(frappe.session.user)
-
     # Run only for Agent role
-    if "Agent" not in roles:
+    if not get_role_context().is_agent:
         return
 
     # Apply only on Draft documents
@@ -438,7 +402,7 @@ def validate_agent_followup_online_source(doc, method=None):
 
 
 def validate_encounter_workflow(doc, method):
-    roles = frappe.get_roles(frappe.session.user)
+    roles = get_role_context().roles
 
     db = {}
     if not doc.is_new():
@@ -561,14 +525,12 @@ def set_created_by_agent(doc, method):
 #         doc.sr_encounter_status = "Draft"
 
 def set_default_encounter_status(doc, method):
-    roles = frappe.get_roles(frappe.session.user)
-
     # Only on creation
     if not doc.is_new():
         return
 
     # Agent creates → Draft
-    if "Agent" in roles:
+    if get_role_context().is_agent:
         doc.sr_encounter_status = "Draft"
         return
 
@@ -582,17 +544,7 @@ def enforce_agent_encounter_place(doc, method=None):
     Force Encounter Place = Online ONLY for pure Agent users.
     Admin / Doctor / System Manager are allowed OPD.
     """
-    user = frappe.session.user
-    roles = frappe.get_roles(user)
-
-    is_pure_agent = (
-        "Agent" in roles
-        and "System Manager" not in roles
-        and "Administrator" not in roles
-        and "Healthcare Practitioner" not in roles
-    )
-
-    if is_pure_agent:
+    if get_role_context().is_pure_agent:
         doc.sr_encounter_place = "Online"
 
 
@@ -600,6 +552,7 @@ def before_save_patient_encounter(doc, method):
     """Clean invalid warehouses in Encounter order items; compute amount fallback."""
     rows = _find_item_rows(doc)
     company = doc.company
+    prefetch_items([_row_get(it, "item_code") for it in rows])
     for it in rows:
         item_code = _row_get(it, "item_code")
         if not item_code:
@@ -735,13 +688,8 @@ def _create_billing_drafts_from_encounter(doc):
     # Don’t duplicate
     if getattr(doc, "sales_invoice", None):
         return
-    existing = frappe.get_all(
-        "Sales Invoice",
-        filters={"docstatus": 0, "remarks": ["like", f"%Patient Encounter: {doc.name}%"]},
-        pluck="name",
-        limit=1,
-    )
-    if existing:
+    # SI.source_encounter is unique → one invoice per encounter
+    if get_invoice_for_encounter(doc.name):
         return
 
     # Build SI (DRAFT)
@@ -765,10 +713,9 @@ def _create_billing_drafts_from_encounter(doc):
         if si_meta.has_field("patient_name"):
             si.patient_name = frappe.db.get_value("Patient", doc.patient, "patient_name")
 
-    if si_meta.has_field(SI_F_SOURCE_ENCOUNTER):
-        setattr(si, SI_F_SOURCE_ENCOUNTER, doc.name)
+    setattr(si, SI_F_SOURCE_ENCOUNTER, doc.name)
 
-    addr = _get_company_primary_address(doc.company)
+    addr = get_company_address(doc.company)
     if addr:
         si.company_address = addr
 
@@ -782,6 +729,11 @@ def _create_billing_drafts_from_encounter(doc):
     if hasattr(si, "set_warehouse"):
         si.set_warehouse = safe_wh
 
+    # one query per attribute for all codes (rates are reused by the kit totals below)
+    codes = [_row_get(it, "item_code") for it in item_rows]
+    prefetch_items(codes)
+    prefetch_selling_rates(codes, "Standard Selling")
+
     added = 0
     for it in item_rows:
         item_code = _row_get(it, "item_code")
@@ -878,11 +830,8 @@ def _create_billing_drafts_from_encounter(doc):
 
     # Taxes & totals
     _set_tax_template_by_state(si, customer)
-    _apply_company_tax_template(si)
     si.set_missing_values()
     si.calculate_taxes_and_totals()
-    _company_safe_tax_rows(si)
-    si.calculate_taxes_and_totals()
     _sanitize_si_warehouses(si, doc.company)
 
     # --- NEW: compute advance summary from enc_multi_payments child table ---
@@ -907,71 +856,19 @@ def _create_billing_drafts_from_encounter(doc):
             r.warehouse = None
 
     si.flags.ignore_permissions = True
-    si.insert(ignore_permissions=True)  # KEEP DRAFT
-
-    # --- CREATE DRAFT PAYMENT ENTRY PER enc_multi_payments ROW (one PE per row) ---
-    pe_names = []
-    patient_name = None
     try:
-        patient_name = frappe.db.get_value("Patient", doc.get("patient"), "patient_name") or getattr(doc, "patient_name", None) or getattr(doc, "patient", None)
-    except Exception:
-        patient_name = getattr(doc, "patient_name", None) or getattr(doc, "patient", None)
-
-    for m in multi_rows:
-        try:
-            m_amt = flt(getattr(m, "mmp_paid_amount", 0) or 0)
-            if m_amt <= 0:
-                continue
-            # prefer row-level mop, fallback to None (no doc-level mop)
-            m_mop = getattr(m, "mmp_mode_of_payment", None) or None
-
-            # row-level reference fields (if present)
-            m_ref_no = getattr(m, "mmp_reference_no", None) or (m.get("mmp_reference_no") if isinstance(m, dict) else None)
-            m_ref_date = getattr(m, "mmp_reference_date", None) or (m.get("mmp_reference_date") if isinstance(m, dict) else None)
-
-            pe_name = _create_draft_payment_entry(
-                doc,
-                customer,
-                m_mop,
-                m_amt,
-                si.name,
-                reference_no=m_ref_no,
-                reference_date=m_ref_date,
-                order_source=doc.get(F_SOURCE),
-                encounter_place=doc.get(F_ENCOUNTER_PLACE),
-                sales_type=doc.get(F_SALES_TYPE),
-                delivery_type=doc.get(F_DELIVERY_TYPE),
-            )
-
-            if not pe_name:
-                continue
-
-            # ensure readable party_name on the PE
-            try:
-                if patient_name:
-                    frappe.db.set_value("Payment Entry", pe_name, "party_name", patient_name, update_modified=False)
-            except Exception:
-                # non-fatal
-                pass
-
-            pe_names.append(pe_name)
-
-            # record created PE back on the child row (SR Multi Mode Payment)
-            try:
-                # m.name should be the child row name (frappe child doc)
-                frappe.db.set_value("SR Multi Mode Payment", m.name, {
-                    "mmp_payment_entry": pe_name,
-                    "mmp_posting_date": frappe.db.get_value("Payment Entry", pe_name, "posting_date")
-                }, update_modified=False)
-            except Exception:
-                frappe.log_error(frappe.get_traceback(),
-                                 f"Failed linking PE {pe_name} back to encounter child row {getattr(m,'name', '<no-name>')}")
-        except Exception:
-            frappe.log_error(frappe.get_traceback(), "Failed creating PE from encounter multi payment row")
+        frappe.db.savepoint("encounter_draft_si")
+        si.insert(ignore_permissions=True)  # KEEP DRAFT
+    except frappe.UniqueValidationError:
+        # a concurrent submit of the same encounter won the race: undo the
+        # partial insert and drop the "duplicate value" message it queued
+        frappe.db.rollback(save_point="encounter_draft_si")
+        frappe.clear_last_message()
+        return
 
-    # commit DB changes if any PEs created
-    if pe_names:
-        frappe.db.commit()
+    # --- CREATE DRAFT PAYMENT ENTRY PER enc_multi_payments ROW (one PE per row) ---
+    pe_result = _create_draft_payment_entries(doc, customer, si.name, multi_rows)
+    pe_names = [c["payment_entry"] for c in pe_result["created"]]
 
     # Back-links on Encounter, if fields exist
     if hasattr(doc, "sales_invoice"):
@@ -990,50 +887,18 @@ def _create_billing_drafts_from_encounter(doc):
     else:
         frappe.msgprint(f"Created Draft Sales Invoice <b>{si.name}</b>", alert=True)
 
+    if pe_result["failed"]:
+        frappe.msgprint(
+            "Could not create Payment Entry for payment row(s) "
+            + ", ".join(str(f["idx"] or f["row"]) for f in pe_result["failed"])
+            + ". See Error Log.",
+            indicator="orange",
+            alert=True,
+        )
 
-def link_pending_payment_entries(si, method):
-    """On SI submit, auto-append reference in any Draft PE that intended to pay this SI."""
-    if si.docstatus != 1:
-        return
-
-    pe_names = frappe.get_all(
-        "Payment Entry",
-        filters={
-            "docstatus": 0,
-            "company": si.company,
-            "party_type": "Customer",
-            "party": si.customer,
-            "intended_sales_invoice": si.name,
-        },
-        pluck="name",
-    )
-    if not pe_names:
-        return
-
-    outstanding = flt(si.get("outstanding_amount") or si.get("grand_total") or 0)
-    if outstanding <= 0:
-        return
-
-    for pe_name in pe_names:
-        if outstanding <= 0:
-            break
+    return {"sales_invoice": si.name, "payment_entries": pe_result}
 
-        pe = frappe.get_doc("Payment Entry", pe_name)
-        already_alloc = sum(flt(r.allocated_amount) for r in (pe.get("references") or []))
-        pay_total = flt(pe.get("received_amount") or pe.get("paid_amount") or 0)
-        unallocated = max(pay_total - already_alloc, 0)
-        if unallocated <= 0:
-            continue
 
-        alloc = min(unallocated, outstanding)
-        pe.append("references", {
-            "reference_doctype": "Sales Invoice",
-            "reference_name": si.name,
-            "due_date": si.get("due_date") or si.get("posting_date"),
-            "allocated_amount": alloc,
-        })
-        pe.set_missing_values()
-        pe.flags.ignore_permissions = True
-        pe.save(ignore_permissions=True)
-
-        outstanding -= alloc
+def link_pending_payment_entries(si, method):
+    """On SI submit, auto-append reference in any Draft PE that intended to pay this SI."""
+    allocate_pending_payment_entries(si)
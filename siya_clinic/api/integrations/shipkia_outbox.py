@@ -0,0 +1,383 @@
+# siya_clinic/api/integrations/shipkia_outbox.py
+
+"""
+Shipkia outbox ("SR Shipkia Outbox", one row per Sales Invoice).
+
+send_sales_invoice_to_shipkia builds the payload and only queues it here;
+the POST to the n8n webhook happens on a worker:
+
+    queue_invoice(invoice, payload)   store / re-queue the row, wake the sender
+    queue_invoices({invoice: payload}) same for many invoices, set-wise
+    flush_shipkia_outbox()            claim due rows, POST them concurrently
+                                      over one pooled keep-alive session,
+                                      record the results (also run by the
+                                      scheduler to pick up retries)
+
+Retries: network errors / timeouts, 408, 429, 5xx and 404/410 (n8n workflow
+inactive) back off exponentially until MAX_ATTEMPTS; any other status fails
+the row at once. Every POST carries an Idempotency-Key derived from the
+invoice name, so a retry after a lost response is not a second order; only a
+manual resend of an already sent invoice gets a new key.
+
+site_config overrides:
+    shipkia_max_concurrency   parallel POSTs (default 4)
+    shipkia_timeout           seconds per POST (default 20)
+    shipkia_max_attempts      attempts before a row is Failed (default 6)
+    shipkia_batch_size        rows claimed per send round (default 50)
+
+Local stand-in webhook for trying this out: dev/shipkia_stub.py (repo root)
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import frappe
+import requests
+from frappe.utils import add_to_date, cint, cstr, now_datetime
+from requests.adapters import HTTPAdapter
+
+OUTBOX_DOCTYPE = "SR Shipkia Outbox"
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 20
+DEFAULT_MAX_ATTEMPTS = 6
+
+BACKOFF_BASE = 30          # seconds; 30s, 1m, 2m, 4m, ...
+BACKOFF_MAX = 30 * 60
+DEFAULT_BATCH_SIZE = 50
+FLUSH_BUDGET = 240         # seconds of sending per flush job
+FLUSH_JOB_TIMEOUT = FLUSH_BUDGET + 60   # budget + recording the last round
+STALE_SENDING = 15         # minutes before an abandoned "Sending" row is re-queued
+
+SUCCESS_STATUS = (200, 201, 202)
+RETRY_STATUS = (404, 408, 410, 429)
+
+FLUSH_JOB_ID = "siya_shipkia_outbox_flush"
+
+
+def _conf_int(key: str, default: int) -> int:
+    return cint(frappe.conf.get(key)) or default
+
+
+# =========================================================
+# HTTP (pooled session, one per worker process)
+# =========================================================
+_session: requests.Session | None = None
+
+
+def _get_session(pool_size: int) -> requests.Session:
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        _session.mount("https://", adapter)
+        _session.mount("http://", adapter)
+    return _session
+
+
+def _webhook_headers(s) -> dict[str, str]:
+    headers = {"Content-Type": "application/json"}
+
+    # n8n authentication
+    webhook_token = s.get_password("webhook_header_token", raise_exception=False) or ""
+    if webhook_token:
+        headers[cstr(s.webhook_header_key or "x-api-key")] = webhook_token
+
+    # Shipkia authentication (pass-through)
+    shipkia_token = s.get_password("shipkia_order_token", raise_exception=False) or ""
+    if shipkia_token:
+        headers["shipkia-auth-token"] = f"token {shipkia_token}"
+
+    return headers
+
+
+def _post(session, url, headers, row, timeout) -> dict[str, Any]:
+    """Runs in a pool thread: HTTP only, no frappe / DB access."""
+    try:
+        resp = session.post(
+            url,
+            data=row["payload"],
+            headers={**headers, "Idempotency-Key": row["idempotency_key"]},
+            timeout=timeout,
+        )
+        return {"name": row["name"], "status_code": resp.status_code, "text": resp.text[:2000]}
+    except requests.RequestException as e:
+        return {"name": row["name"], "status_code": None, "text": f"{e.__class__.__name__}: {e}"}
+
+
+# =========================================================
+# Queue
+# =========================================================
+def _idempotency_key(invoice: str, dispatch_no: int) -> str:
+    return f"shipkia-{invoice}" + (f"-{dispatch_no}" if dispatch_no else "")
+
+
+def _enqueue_flush():
+    frappe.enqueue(
+        "siya_clinic.api.integrations.shipkia_outbox.flush_shipkia_outbox",
+        queue="short",
+        timeout=FLUSH_JOB_TIMEOUT,
+        enqueue_after_commit=True,
+        job_id=FLUSH_JOB_ID,
+        deduplicate=True,
+    )
+
+
+def queue_invoices(payloads: dict[str, dict[str, Any]]) -> dict[str, str]:
+    """
+    Queue (or re-queue) many invoices in one insert + one update;
+    returns {invoice: outbox status}. A row still Sending is left alone.
+    """
+    if not payloads:
+        return {}
+
+    existing = {
+        r.name: r
+        for r in frappe.get_all(
+            OUTBOX_DOCTYPE,
+            filters={"name": ["in", list(payloads)]},
+            fields=["name", "status", "dispatch_no"],
+        )
+    }
+
+    now = now_datetime()
+    user = frappe.session.user
+    inserts = []
+    updates = {}
+    out = {}
+
+    for invoice, payload in payloads.items():
+        row = existing.get(invoice)
+
+        if row is None:
+            inserts.append((
+                invoice, now, now, user, user, 0,
+                invoice, "Queued", 0, 0, _idempotency_key(invoice, 0), json.dumps(payload),
+            ))
+        elif row.status == "Sending":
+            out[invoice] = row.status
+            continue
+        else:
+            # Sent → deliberate resend (new key); Failed / Queued → same dispatch
+            dispatch_no = cint(row.dispatch_no) + (1 if row.status == "Sent" else 0)
+            updates[invoice] = {
+                "status": "Queued",
+                "attempts": 0,
+                "next_attempt_at": None,
+                "dispatch_no": dispatch_no,
+                "idempotency_key": _idempotency_key(invoice, dispatch_no),
+                "payload": json.dumps(payload),
+                "error": None,
+            }
+        out[invoice] = "Queued"
+
+    if inserts:
+        frappe.db.bulk_insert(
+            OUTBOX_DOCTYPE,
+            fields=[
+                "name", "creation", "modified", "owner", "modified_by", "docstatus",
+                "sales_invoice", "status", "attempts", "dispatch_no", "idempotency_key", "payload",
+            ],
+            values=inserts,
+            # a concurrent click may have queued one of them first
+            ignore_duplicates=True,
+        )
+    if updates:
+        frappe.db.bulk_update(OUTBOX_DOCTYPE, updates)
+
+    if inserts or updates:
+        _enqueue_flush()
+    return out
+
+
+def queue_invoice(invoice: str, payload: dict[str, Any]) -> str:
+    """Queue (or re-queue) one invoice; returns the outbox status."""
+    return queue_invoices({invoice: payload})[invoice]
+
+
+# =========================================================
+# Sender
+# =========================================================
+def _requeue_stale(max_attempts: int):
+    """
+    Rows left in Sending by a killed worker go back to the queue, or fail
+    when that was their last attempt.
+    """
+    frappe.db.sql(
+        f"""
+        UPDATE `tab{OUTBOX_DOCTYPE}`
+        SET status = IF(attempts >= %(max_attempts)s, 'Failed', 'Queued'),
+            error = IF(attempts >= %(max_attempts)s, 'Sender stopped during the last attempt', error)
+        WHERE status = 'Sending' AND modified < %(before)s
+        """,
+        {
+            "max_attempts": max_attempts,
+            "before": add_to_date(now_datetime(), minutes=-STALE_SENDING),
+        },
+    )
+    frappe.db.commit()
+
+
+def _claim(limit: int) -> list:
+    """Due Queued rows → Sending; SKIP LOCKED lets parallel flushes split the work."""
+    now = now_datetime()
+    names = frappe.db.sql_list(
+        f"""
+        SELECT name FROM `tab{OUTBOX_DOCTYPE}`
+        WHERE status = 'Queued'
+          AND (next_attempt_at IS NULL OR next_attempt_at <= %s)
+        ORDER BY creation
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+        """,
+        (now, limit),
+    )
+    if not names:
+        frappe.db.commit()
+        return []
+
+    frappe.db.sql(
+        f"""
+        UPDATE `tab{OUTBOX_DOCTYPE}`
+        SET status = 'Sending', attempts = attempts + 1, modified = %s
+        WHERE name IN %s
+        """,
+        (now, tuple(names)),
+    )
+    rows = frappe.get_all(
+        OUTBOX_DOCTYPE,
+        filters={"name": ["in", names]},
+        fields=["name", "payload", "idempotency_key", "attempts"],
+    )
+    frappe.db.commit()
+    return rows
+
+
+def _backoff(attempts: int) -> int:
+    return min(BACKOFF_BASE * (2 ** max(attempts - 1, 0)), BACKOFF_MAX)
+
+
+def _record(rows: list, results: list, max_attempts: int) -> dict:
+    attempts = {r.name: cint(r.attempts) for r in rows}
+    now = now_datetime()
+    updates = {}
+    sent = []
+    counts = {"sent": 0, "retry": 0, "failed": 0}
+
+    for res in results:
+        name, code = res["name"], res["status_code"]
+        values = {"response_status": code or 0, "response": res["text"]}
+
+        if code in SUCCESS_STATUS:
+            values.update(status="Sent", sent_at=now, next_attempt_at=None, error=None)
+            sent.append(name)
+            counts["sent"] += 1
+
+        elif (code is None or code >= 500 or code in RETRY_STATUS) and attempts[name] < max_attempts:
+            values.update(
+                status="Queued",
+                next_attempt_at=add_to_date(now, seconds=_backoff(attempts[name])),
+                error=res["text"],
+            )
+            counts["retry"] += 1
+
+        else:
+            values.update(status="Failed", error=res["text"])
+            counts["failed"] += 1
+            frappe.log_error(
+                title="Shipkia Network Error" if code is None else "Shipkia API Error",
+                message=(
+                    f"Sales Invoice: {name}\n"
+                    f"Attempts: {attempts[name]}\n"
+                    f"Status: {code}\n"
+                    f"Response:\n{res['text']}"
+                ),
+            )
+
+        updates[name] = values
+
+    if updates:
+        frappe.db.bulk_update(OUTBOX_DOCTYPE, updates)
+
+    if sent and frappe.db.has_column("Sales Invoice", "sent_to_shipkia"):
+        frappe.db.sql(
+            "UPDATE `tabSales Invoice` SET sent_to_shipkia = 1 WHERE name IN %s",
+            (tuple(sent),),
+        )
+
+    frappe.db.commit()
+    return counts
+
+
+def flush_shipkia_outbox() -> dict:
+    """
+    Worker / scheduler: send every due row, up to shipkia_batch_size rows per
+    round. A round only claims as many rows as can still be sent (worst case,
+    every POST timing out) within FLUSH_BUDGET, so the job ends in time for
+    its queue's timeout; whatever is left goes to the next flush.
+    """
+    s = frappe.get_single("Shipkia Settings")
+    if not s.enable_sync or not s.webhook_url:
+        return {"sent": 0, "retry": 0, "failed": 0}
+
+    concurrency = _conf_int("shipkia_max_concurrency", DEFAULT_CONCURRENCY)
+    timeout = _conf_int("shipkia_timeout", DEFAULT_TIMEOUT)
+    max_attempts = _conf_int("shipkia_max_attempts", DEFAULT_MAX_ATTEMPTS)
+    batch_size = _conf_int("shipkia_batch_size", DEFAULT_BATCH_SIZE)
+
+    session = _get_session(concurrency)
+    headers = _webhook_headers(s)
+    totals = {"sent": 0, "retry": 0, "failed": 0}
+
+    _requeue_stale(max_attempts)
+    deadline = time.monotonic() + FLUSH_BUDGET
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while True:
+            # each wave of `concurrency` POSTs takes at most `timeout` seconds
+            waves = int((deadline - time.monotonic()) // timeout)
+            if waves < 1:
+                break
+
+            rows = _claim(min(batch_size, waves * concurrency))
+            if not rows:
+                break
+
+            results = list(pool.map(
+                lambda row: _post(session, s.webhook_url, headers, row, timeout),
+                rows,
+            ))
+            for k, v in _record(rows, results, max_attempts).items():
+                totals[k] += v
+
+    return totals
+
+
+# =========================================================
+# Status
+# =========================================================
+STATUS_FIELDS = ["status", "attempts", "next_attempt_at", "response_status", "sent_at", "error"]
+
+
+@frappe.whitelist()
+def get_shipkia_outbox_status(invoice_name: str):
+    """Outbox row of one invoice (None if never queued)."""
+    frappe.has_permission("Sales Invoice", "read", invoice_name, throw=True)
+    return frappe.db.get_value(OUTBOX_DOCTYPE, invoice_name, STATUS_FIELDS, as_dict=True)
+
+
+@frappe.whitelist()
+def get_shipkia_outbox_statuses(invoice_names) -> dict[str, Any]:
+    """{invoice: outbox row} for many invoices (bulk dispatch progress)."""
+    frappe.has_permission("Sales Invoice", "read", throw=True)
+    names = frappe.parse_json(invoice_names) if isinstance(invoice_names, str) else invoice_names
+    rows = frappe.get_all(
+        OUTBOX_DOCTYPE,
+        filters={"name": ["in", list(names or [])]},
+        fields=["name", *STATUS_FIELDS],
+    )
+    return {r.pop("name"): r for r in rows}
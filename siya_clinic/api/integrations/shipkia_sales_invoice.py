@@ -1,11 +1,14 @@
 # siya_clinic/api/integrations/shipkia_sales_invoice.py
 from __future__ import annotations
-import json
-from typing import Dict, Any
 
-import requests
+from typing import Any
+
 import frappe
-from frappe.utils import cstr, flt
+from frappe.utils import cint, cstr, flt
+
+from siya_clinic.api.integrations.shipkia_outbox import queue_invoice, queue_invoices
+from siya_clinic.api.item.package_details import get_package_profiles
+
 
 # =========================================================
 # Helpers: Settings
@@ -16,21 +19,11 @@ def _settings():
 
 
 # =========================================================
-# Headers: ERP → n8n Webhook
+# Headers: ERP → Shipkia API (Direct / Future)
 # =========================================================
-def _webhook_headers(s) -> Dict[str, str]:
+def _shipkia_headers(s) -> dict[str, str]:
     headers = {"Content-Type": "application/json"}
 
-    # --------------------------------------------------
-    # n8n authentication
-    # --------------------------------------------------
-    webhook_token = s.get_password("webhook_header_token", raise_exception=False) or ""
-    if webhook_token:
-        headers[cstr(s.webhook_header_key or "x-api-key")] = webhook_token
-
-    # --------------------------------------------------
-    # Shipkia authentication (pass-through)
-    # --------------------------------------------------    
     shipkia_token = s.get_password("shipkia_order_token", raise_exception=False) or ""
     if shipkia_token:
         headers["shipkia-auth-token"] = f"token {shipkia_token}"
@@ -39,46 +32,59 @@ def _webhook_headers(s) -> Dict[str, str]:
 
 
 # =========================================================
-# Headers: ERP → Shipkia API (Direct / Future)
+# Preload Helper (one query per lookup for all invoices)
 # =========================================================
-def _shipkia_headers(s) -> Dict[str, str]:
-    headers = {"Content-Type": "application/json"}
-
-    shipkia_token = s.get_password("shipkia_order_token", raise_exception=False) or ""
-    if shipkia_token:
-        headers["shipkia-auth-token"] = f"token {shipkia_token}"
-
-    return headers
+ADDRESS_FIELDS = ["name", "address_line1", "address_line2", "city", "state", "pincode"]
 
 
-# =========================================================
-# POST to Shipkia
-# =========================================================
-def _post_shipkia(payload: Dict[str, Any]):
-    s = _settings()
-    return requests.post(
-        s.webhook_url,
-        headers=_webhook_headers(s),   # ✅ ERP → n8n
-        json=payload,
-        timeout=60,
+def _load_context(invoices) -> frappe._dict:
+    """
+    Settings, addresses, patient IDs and item package profiles needed to
+    build the payloads of these invoices; shared by single and bulk send.
+    """
+    address_names = {
+        n for si in invoices
+        for n in (si.get("shipping_address_name"), si.get("customer_address")) if n
+    }
+    patients = {cstr(si.get("patient")).strip() for si in invoices} - {""}
+    item_codes = {row.item_code for si in invoices for row in (si.items or []) if row.item_code}
+
+    addresses = {}
+    if address_names:
+        addresses = {
+            a.name: a
+            for a in frappe.get_all("Address", filters={"name": ["in", list(address_names)]}, fields=ADDRESS_FIELDS)
+        }
+
+    patient_ids = {}
+    if patients:
+        patient_ids = dict(frappe.get_all(
+            "Patient",
+            filters={"name": ["in", list(patients)]},
+            fields=["name", "sr_patient_id"],
+            as_list=True,
+        ))
+
+    return frappe._dict(
+        settings=_settings(),
+        addresses=addresses,
+        patient_ids=patient_ids,
+        packages=get_package_profiles(item_codes),
     )
 
 
 # =========================================================
 # Patient ID Helper
 # =========================================================
-def _get_patient_id(si) -> str:
+def _get_patient_id(si, ctx) -> str:
     """
-    Safely fetch sr_patient_id from Patient linked to Sales Invoice
+    sr_patient_id of the Patient linked to Sales Invoice (preloaded)
     """
-    patient_name = cstr(getattr(si, "patient", "")).strip()
+    patient_name = cstr(si.get("patient")).strip()
     if not patient_name:
         return ""
 
-    try:
-        return cstr(frappe.db.get_value("Patient", patient_name, "sr_patient_id") or "")
-    except Exception:
-        return ""
+    return cstr(ctx.patient_ids.get(patient_name) or "")
 
 
 # =========================================================
@@ -116,22 +122,18 @@ def _safe_phone(phone: str) -> str:
 # =========================================================
 # Address Helpers
 # =========================================================
-def _get_shipping_address(si):
-    if si.shipping_address_name:
-        return frappe.get_doc("Address", si.shipping_address_name)
-
-    if si.customer_address:
-        return frappe.get_doc("Address", si.customer_address)
+def _get_shipping_address(si, ctx):
+    for name in (si.shipping_address_name, si.customer_address):
+        if name and name in ctx.addresses:
+            return ctx.addresses[name]
 
     frappe.throw("No Shipping Address found")
 
 
-def _get_billing_address(si):
-    if si.customer_address:
-        return frappe.get_doc("Address", si.customer_address)
-
-    if si.shipping_address_name:
-        return frappe.get_doc("Address", si.shipping_address_name)
+def _get_billing_address(si, ctx):
+    for name in (si.customer_address, si.shipping_address_name):
+        if name and name in ctx.addresses:
+            return ctx.addresses[name]
 
     frappe.throw("No Billing Address found")
 
@@ -139,10 +141,11 @@ def _get_billing_address(si):
 # =========================================================
 # Package Calculation Helper
 # =========================================================
-def _calculate_package(items):
+def _calculate_package(items, packages):
     """
     Calculates dead & volumetric weight
     volumetric = (L * B * H) / 5000
+    packages: {item_code: package profile} (api/item/package_details.get_package_profiles)
 
     If item-level dimensions are missing:
     - Apply safe defaults
@@ -157,15 +160,14 @@ def _calculate_package(items):
         if not row.item_code:
             continue
 
-        try:
-            item = frappe.get_cached_doc("Item", row.item_code)
-        except Exception:
+        profile = packages.get(row.item_code)
+        if not profile:
             continue
 
-        l = flt(getattr(item, "sr_pkg_length", 0))
-        b = flt(getattr(item, "sr_pkg_width", 0))
-        h = flt(getattr(item, "sr_pkg_height", 0))
-        w = flt(getattr(item, "sr_pkg_applied_weight", 0))
+        l = flt(profile.get("length"))
+        b = flt(profile.get("width"))
+        h = flt(profile.get("height"))
+        w = flt(profile.get("applied_weight"))
 
         # Detect missing dimensions at item level
         if l <= 0 or b <= 0 or h <= 0:
@@ -175,7 +177,7 @@ def _calculate_package(items):
         max_b = max(max_b, b)
         max_h = max(max_h, h)
         dead_weight += w * flt(row.qty)
-    
+
     # --------------------------------------------------
     # APPLY SAFE DEFAULTS (ONLY IF REQUIRED)
     # --------------------------------------------------
@@ -202,6 +204,37 @@ def _calculate_package(items):
     }
 
 
+def calculate_packages(items_by_invoice: dict[str, list]) -> dict[str, dict[str, Any]]:
+    """
+    Package dimensions for many invoices at once:
+    {invoice: [rows with item_code, qty]} -> {invoice: package}.
+    All item profiles are loaded in one go.
+    """
+    packages = get_package_profiles(
+        {row.item_code for rows in items_by_invoice.values() for row in rows if row.item_code}
+    )
+    return {inv: _calculate_package(rows, packages) for inv, rows in items_by_invoice.items()}
+
+
+@frappe.whitelist()
+def get_shipkia_packages(invoice_names) -> dict[str, dict[str, Any]]:
+    """{invoice: package dimensions / weights} for the given Sales Invoices."""
+    names = frappe.parse_json(invoice_names) if isinstance(invoice_names, str) else invoice_names
+    names = frappe.get_list("Sales Invoice", filters={"name": ["in", list(names or [])]}, pluck="name")
+    if not names:
+        return {}
+
+    items_by_invoice = {n: [] for n in names}
+    for row in frappe.get_all(
+        "Sales Invoice Item",
+        filters={"parenttype": "Sales Invoice", "parent": ["in", names]},
+        fields=["parent", "item_code", "qty"],
+    ):
+        items_by_invoice[row.parent].append(row)
+
+    return calculate_packages(items_by_invoice)
+
+
 # =========================================================
 # Payment Helpers
 # =========================================================
@@ -255,13 +288,13 @@ def _get_tax_rate(si) -> float:
 # =========================================================
 # Shipkia Tag Helper
 # =========================================================
-def _build_shipkia_tag(si) -> str:
+def _build_shipkia_tag(si, ctx) -> str:
     parts = ["ERP"]
 
     if si.name:
         parts.append(f"SI:{si.name}")
 
-    patient_id = _get_patient_id(si)
+    patient_id = _get_patient_id(si, ctx)
     if patient_id:
         parts.append(f"PAT:{patient_id}")
 
@@ -271,15 +304,17 @@ def _build_shipkia_tag(si) -> str:
 # =========================================================
 # Payload Builder
 # =========================================================
-def _build_payload_from_so(si) -> Dict[str, Any]:
-    s = _settings()
+def _build_payload_from_so(si, ctx=None) -> dict[str, Any]:
+    """si: Sales Invoice doc, or a dict with items / taxes rows (bulk path)."""
+    ctx = ctx or _load_context([si])
+    s = ctx.settings
 
-    shipping = _get_shipping_address(si)
-    billing = _get_billing_address(si)
+    shipping = _get_shipping_address(si, ctx)
+    billing = _get_billing_address(si, ctx)
 
     billing_same_as_delivery = shipping.name == billing.name
 
-    package = _calculate_package(si.items)
+    package = _calculate_package(si.items, ctx.packages)
 
     if package["items_with_missing_dimensions"]:
         frappe.log_error(
@@ -312,7 +347,7 @@ def _build_payload_from_so(si) -> Dict[str, Any]:
             "tax_rate": _get_tax_rate(si),
             "tax_preference": "Inclusive",
         })
- 
+
     delivery_address = ", ".join(filter(None, [
         cstr(shipping.address_line1),
         cstr(shipping.address_line2),
@@ -350,7 +385,7 @@ def _build_payload_from_so(si) -> Dict[str, Any]:
             "billing_state": cstr(billing.state),
             "billing_pincode": cstr(billing.pincode),
         })
-    
+
     payload.update({
         # Payment
         "payment_method": _payment_method(si),
@@ -373,7 +408,7 @@ def _build_payload_from_so(si) -> Dict[str, Any]:
         "prepaid_amount": _get_prepaid_amount(si),
 
         "notes": "",
-        "tag": _build_shipkia_tag(si),
+        "tag": _build_shipkia_tag(si, ctx),
     })
 
     return payload
@@ -385,7 +420,7 @@ def _build_payload_from_so(si) -> Dict[str, Any]:
 @frappe.whitelist()
 def send_sales_invoice_to_shipkia(invoice_name: str):
     """
-    MANUAL send to Shipkia via n8n webhook
+    MANUAL send to Shipkia via n8n webhook (queued in SR Shipkia Outbox)
     """
 
     si = frappe.get_doc("Sales Invoice", invoice_name)
@@ -396,82 +431,148 @@ def send_sales_invoice_to_shipkia(invoice_name: str):
     if si.docstatus != 1:
         frappe.throw("Sales Invoice must be submitted before sending to Shipkia.")
 
-    s = _settings()
-    if not s.enable_sync:
+    ctx = _load_context([si])
+    if not ctx.settings.enable_sync:
         frappe.throw("Shipkia sync is disabled in settings. Please enable it and try again.")
 
-    payload = _build_payload_from_so(si)
-
-    # --------------------------------------------------
-    # Network / webhook call
-    # --------------------------------------------------
-    try:
-        resp = _post_shipkia(payload)
-    except Exception as e:
-        frappe.log_error(
-            title="Shipkia Network Error",
-            message=(
-                f"Sales Invoice: {si.name}\n"
-                f"Error: {e}\n\n"
-                f"Payload:\n{json.dumps(payload, indent=2)}"
-            ),
-        )
-        frappe.throw(
-            "Unable to reach the automation service (n8n). "
-            "Please ensure the workflow is active and the webhook URL is accessible."
-        )
-    
-    # --------------------------------------------------
-    # n8n disabled / webhook not active
-    # --------------------------------------------------
-    if resp.status_code in (404, 410):
-        frappe.log_error(
-            title="Shipkia Webhook Disabled",
-            message=(
-                f"Sales Invoice: {si.name}\n"
-                f"Status: {resp.status_code}\n"
-                f"Response:\n{resp.text}"
-            ),
-        )
-        frappe.throw(
-            "Order sync failed because the automation service (n8n) is currently disabled. "
-            "Please enable the workflow and try again."
-        )
+    payload = _build_payload_from_so(si, ctx)
 
     # --------------------------------------------------
-    # API-level rejection (validation / auth / data issue)
-    # --------------------------------------------------
-    if resp.status_code not in (200, 201, 202):
-        frappe.log_error(
-            title="Shipkia API Error",
-            message=(
-                f"Sales Invoice: {si.name}\n"
-                f"Status: {resp.status_code}\n"
-                f"Response:\n{resp.text}"
-            ),
-        )
-        frappe.throw(
-            "Unable to create order in Shipkia. "
-            "The request was rejected due to validation or authorization issues. "
-            "Please verify invoice data and Shipkia settings, then try again."
-        )
-    
-    # --------------------------------------------------
-    # Mark as sent (ONLY after success)
+    # Hand over to the outbox; the webhook call (with
+    # retries) runs on a worker and sets sent_to_shipkia
     # --------------------------------------------------
-    if frappe.db.has_column("Sales Invoice", "sent_to_shipkia"):
-        frappe.db.set_value(
-            "Sales Invoice",
-            si.name,
-            "sent_to_shipkia",
-            1,
-            update_modified=False,
-        )
+    status = queue_invoice(si.name, payload)
 
-    # --------------------------------------------------
-    # Success response
-    # --------------------------------------------------
     return {
         "success": True,
-        "message": "Sales Invoice sent to Shipkia successfully.",
+        "queued": True,
+        "status": status,
+        "message": "Sales Invoice queued for Shipkia. It will be marked as sent once the order is accepted.",
+    }
+
+
+# ========================================================
+# Public API: Bulk Send Sales Invoices to Shipkia
+# ========================================================
+BULK_MAX_INVOICES = 1000
+
+SI_FIELDS = [
+    "name", "customer_name", "contact_mobile", "shipping_address_name", "customer_address",
+    "patient", "grand_total", "outstanding_amount", "discount_amount", "sent_to_shipkia",
+]
+
+
+def _load_invoices(names) -> list:
+    """Submitted invoices with their item + tax rows, one query each."""
+    invoices = frappe.get_all("Sales Invoice", filters={"name": ["in", names]}, fields=SI_FIELDS)
+    by_name = {si.name: si for si in invoices}
+
+    for si in invoices:
+        si.items = []
+        si.taxes = []
+
+    item_fields = ["parent", "item_code", "item_name", "rate", "qty"]
+    if frappe.get_meta("Sales Invoice Item").has_field("gst_hsn_code"):
+        item_fields.append("gst_hsn_code")
+
+    for row in frappe.get_all(
+        "Sales Invoice Item",
+        filters={"parenttype": "Sales Invoice", "parent": ["in", names]},
+        fields=item_fields,
+        order_by="parent asc, idx asc",
+    ):
+        by_name[row.parent].items.append(row)
+
+    for row in frappe.get_all(
+        "Sales Taxes and Charges",
+        filters={"parenttype": "Sales Invoice", "parent": ["in", names]},
+        fields=["parent", "rate"],
+        order_by="parent asc, idx asc",
+    ):
+        by_name[row.parent].taxes.append(row)
+
+    return [by_name[n] for n in names if n in by_name]
+
+
+def _bulk_invoice_names(invoice_names=None, filters=None, resend=False) -> tuple[list, int]:
+    """
+    Selected names or a list filter, limited to submitted invoices the user
+    can read: (first BULK_MAX_INVOICES names, count of further matches).
+    """
+    names = frappe.parse_json(invoice_names) if isinstance(invoice_names, str) else invoice_names
+    filters = frappe.parse_json(filters) if isinstance(filters, str) else filters
+
+    if names:
+        filters = {"name": ["in", list(names)]}
+    elif not filters:
+        filters = {}
+
+    if isinstance(filters, dict):
+        filters = [["Sales Invoice", k, *(v if isinstance(v, list | tuple) else ["=", v])] for k, v in filters.items()]
+
+    filters = [*filters, ["Sales Invoice", "docstatus", "=", 1]]
+    if not resend:
+        filters.append(["Sales Invoice", "sent_to_shipkia", "=", 0])
+
+    names = frappe.get_list(
+        "Sales Invoice",
+        filters=filters,
+        pluck="name",
+        order_by="posting_date asc, name asc",
+        limit_page_length=BULK_MAX_INVOICES + 1,
+    )
+    if len(names) <= BULK_MAX_INVOICES:
+        return names, 0
+
+    total = frappe.get_list("Sales Invoice", filters=filters, fields=["count(name) as total"])[0].total
+    return names[:BULK_MAX_INVOICES], cint(total) - BULK_MAX_INVOICES
+
+
+@frappe.whitelist()
+def bulk_send_to_shipkia(invoice_names=None, filters=None, resend: int = 0) -> dict[str, Any]:
+    """
+    Queue many submitted invoices for Shipkia in one pass.
+
+    invoice_names: list of Sales Invoice names, or
+    filters:       list-view filters (default: all submitted, not yet sent)
+    resend:        1 → include invoices already sent
+
+    Payloads are built from set-wise preloaded data and handed to the
+    outbox, which posts them in batches of shipkia_batch_size. Returns
+    per-invoice status: Queued / Sending (already in flight) / Error.
+
+    At most BULK_MAX_INVOICES are taken per call; `truncated` / `remaining`
+    tell the caller how many more matched.
+    """
+    frappe.has_permission("Sales Invoice", "read", throw=True)
+
+    names, remaining = _bulk_invoice_names(invoice_names, filters, cint(resend))
+    if not names:
+        return {"queued": 0, "errors": 0, "results": [], "truncated": False, "remaining": 0}
+
+    invoices = _load_invoices(names)
+    ctx = _load_context(invoices)
+    if not ctx.settings.enable_sync:
+        frappe.throw("Shipkia sync is disabled in settings. Please enable it and try again.")
+
+    payloads = {}
+    results = {}
+
+    for si in invoices:
+        try:
+            payloads[si.name] = _build_payload_from_so(si, ctx)
+        except Exception as e:
+            frappe.clear_messages()
+            results[si.name] = {"status": "Error", "message": cstr(e) or e.__class__.__name__}
+
+    for name, status in queue_invoices(payloads).items():
+        results[name] = {"status": status}
+
+    return {
+        "queued": sum(1 for r in results.values() if r["status"] == "Queued"),
+        "errors": sum(1 for r in results.values() if r["status"] == "Error"),
+        "results": [{"invoice": n, **results[n]} for n in names if n in results],
+        "truncated": bool(remaining),
+        "remaining": remaining,
+        "limit": BULK_MAX_INVOICES,
     }
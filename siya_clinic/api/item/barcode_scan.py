@@ -0,0 +1,101 @@
+# siya_clinic/api/item/barcode_scan.py
+
+"""
+Barcode scan resolution for Sales Invoice / Stock Entry
+(public/js/sales_invoice/barcode.js, public/js/stock_entry/barcode.js).
+
+One call resolves Batch.sr_barcode -> batch, item essentials, selling rate
+and available batch qty in the warehouse.
+
+Barcode -> batch/item and (item, price list) -> rate are cached for a few
+seconds, so a counter scanning the same stock repeatedly hits Redis only.
+Available qty is never cached: it changes with every submitted invoice.
+"""
+
+import frappe
+from frappe.utils.data import flt
+
+SCAN_CACHE_TTL = 30  # seconds
+
+DEFAULT_PRICE_LIST = "Standard Selling"
+
+
+def _cache_key(*parts) -> str:
+    return "siya_barcode_scan|" + "|".join(str(p) for p in parts)
+
+
+def _cached(key: str, resolver):
+    cache = frappe.cache()
+    value = cache.get_value(key)
+    if value is None:
+        # {} marks "not found" so misses are cached too
+        value = resolver() or {}
+        cache.set_value(key, value, expires_in_sec=SCAN_CACHE_TTL)
+    return value
+
+
+def _resolve_batch(barcode: str) -> dict | None:
+    row = frappe.db.sql(
+        """
+        SELECT b.name AS batch, b.item AS item_code,
+               i.item_name, i.stock_uom, i.disabled
+        FROM `tabBatch` b
+        INNER JOIN `tabItem` i ON i.name = b.item
+        WHERE b.sr_barcode = %s
+        LIMIT 1
+        """,
+        (barcode,),
+        as_dict=True,
+    )
+    return row[0] if row else None
+
+
+def _resolve_rate(item_code: str, price_list: str) -> dict:
+    rate = frappe.db.get_value(
+        "Item Price",
+        {"item_code": item_code, "price_list": price_list},
+        "price_list_rate",
+        order_by="valid_from desc",
+    )
+    return {"rate": flt(rate)}
+
+
+@frappe.whitelist()
+def scan_barcode(barcode: str, warehouse: str | None = None, price_list: str | None = None) -> dict | None:
+    """
+    Returns {batch, item_code, item_name, stock_uom, rate, available_qty}
+    or None when no Batch carries this barcode.
+    available_qty is None when no warehouse is given.
+    """
+    frappe.has_permission("Batch", "read", throw=True)
+
+    barcode = (barcode or "").strip()
+    if not barcode:
+        return None
+
+    found = _cached(_cache_key("batch", barcode), lambda: _resolve_batch(barcode))
+    if not found:
+        return None
+    if found.get("disabled"):
+        frappe.throw(frappe._("Item {0} is disabled").format(found["item_code"]))
+
+    price_list = price_list or DEFAULT_PRICE_LIST
+    price = _cached(
+        _cache_key("rate", found["item_code"], price_list),
+        lambda: _resolve_rate(found["item_code"], price_list),
+    )
+
+    available_qty = None
+    if warehouse:
+        from erpnext.stock.doctype.batch.batch import get_batch_qty
+
+        available_qty = flt(get_batch_qty(batch_no=found["batch"], warehouse=warehouse))
+
+    return {
+        "batch": found["batch"],
+        "item_code": found["item_code"],
+        "item_name": found["item_name"],
+        "stock_uom": found["stock_uom"],
+        "rate": price.get("rate") or 0,
+        "available_qty": available_qty,
+    }
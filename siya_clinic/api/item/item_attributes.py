@@ -0,0 +1,151 @@
+# siya_clinic/api/item/item_attributes.py
+
+"""
+Batched Item attribute loader for billing paths (Encounter -> Sales Invoice,
+Shopify orders).
+
+prefetch_*() loads one attribute for every item code of a document with a
+single query; the get_*() accessors then read from the memo and only fall
+back to a query for codes that were not prefetched.
+
+    Item            item_name, is_stock_item, stock_uom   (False = no such Item)
+    Item Price      price_list_rate per (price_list, item)
+    Item Default    default_warehouse per (company, item)
+
+Memoized on frappe.local for the current request / job only: Items can be
+auto-created inside an order that is later rolled back (clear_item_memo).
+"""
+
+import frappe
+from frappe.utils import flt
+
+DEFAULT_PRICE_LIST = "Standard Selling"
+
+
+def _memo(name: str) -> dict:
+    memo = getattr(frappe.local, "siya_item_memo", None)
+    if memo is None:
+        memo = frappe.local.siya_item_memo = {}
+    return memo.setdefault(name, {})
+
+
+def clear_item_memo() -> None:
+    if getattr(frappe.local, "siya_item_memo", None):
+        frappe.local.siya_item_memo.clear()
+
+
+def _missing(memo: dict, keys) -> set:
+    return {k for k in keys if k and k not in memo}
+
+
+# ---------------------------------------------------------
+# Item
+# ---------------------------------------------------------
+
+def prefetch_items(item_codes) -> None:
+    """item_name / is_stock_item / stock_uom for many codes in one query."""
+    items = _memo("items")
+    codes = _missing(items, item_codes)
+    if not codes:
+        return
+
+    # Item names compare case-insensitively in the DB, mirror that here
+    found = {
+        row.name.lower(): row
+        for row in frappe.get_all(
+            "Item",
+            filters={"name": ["in", list(codes)]},
+            fields=["name", "item_name", "is_stock_item", "stock_uom"],
+        )
+    }
+    for code in codes:
+        items[code] = found.get(code.lower(), False)
+
+
+def remember_item(doc) -> None:
+    """Record an Item created in this request."""
+    _memo("items")[doc.name] = frappe._dict(
+        name=doc.name,
+        item_name=doc.item_name,
+        is_stock_item=doc.is_stock_item,
+        stock_uom=doc.stock_uom,
+    )
+
+
+def get_item(item_code: str):
+    """Item essentials, False if the Item does not exist."""
+    items = _memo("items")
+    if item_code not in items:
+        prefetch_items([item_code])
+    return items[item_code]
+
+
+def get_item_name(item_code: str):
+    """item_name of an existing Item, False if the Item does not exist."""
+    item = get_item(item_code)
+    return item.item_name if item else False
+
+
+def is_stock_item(item_code: str) -> int:
+    item = get_item(item_code)
+    return (item.is_stock_item or 0) if item else 0
+
+
+# ---------------------------------------------------------
+# Item Price
+# ---------------------------------------------------------
+
+def prefetch_selling_rates(item_codes, price_list: str = DEFAULT_PRICE_LIST) -> None:
+    rates = _memo("rates")
+    codes = {c for c in item_codes if c and (price_list, c) not in rates}
+    if not codes:
+        return
+
+    for code in codes:
+        rates[(price_list, code)] = 0.0
+
+    # newest price wins when an item has several rows in the list
+    rows = frappe.get_all(
+        "Item Price",
+        filters={"price_list": price_list, "item_code": ["in", list(codes)]},
+        fields=["item_code", "price_list_rate"],
+        order_by="modified asc",
+    )
+    for row in rows:
+        rates[(price_list, row.item_code)] = flt(row.price_list_rate)
+
+
+def get_selling_rate(item_code: str, price_list: str = DEFAULT_PRICE_LIST) -> float:
+    rates = _memo("rates")
+    if (price_list, item_code) not in rates:
+        prefetch_selling_rates([item_code], price_list)
+    return rates[(price_list, item_code)]
+
+
+# ---------------------------------------------------------
+# Item Default
+# ---------------------------------------------------------
+
+def prefetch_default_warehouses(item_codes, company: str) -> None:
+    warehouses = _memo("default_warehouses")
+    codes = {c for c in item_codes if c and (company, c) not in warehouses}
+    if not codes:
+        return
+
+    for code in codes:
+        warehouses[(company, code)] = None
+
+    rows = frappe.get_all(
+        "Item Default",
+        filters={"parenttype": "Item", "parent": ["in", list(codes)], "company": company},
+        fields=["parent", "default_warehouse"],
+    )
+    for row in rows:
+        warehouses[(company, row.parent)] = row.default_warehouse
+
+
+def get_default_warehouse(item_code: str, company: str):
+    warehouses = _memo("default_warehouses")
+    if (company, item_code) not in warehouses:
+        prefetch_default_warehouses([item_code], company)
+    return warehouses[(company, item_code)]
@@ -1,7 +1,19 @@
+import pickle
+
 import frappe
 
 DIVISOR = 5000.0
 
+# Compact per-item package profile (Shipkia package calculation), kept in
+# Redis so dispatch never loads full Item docs: item_code -> profile dict
+PROFILE_CACHE_KEY = "siya_item_package_profile"
+PROFILE_FIELDS = {
+    "length": "sr_pkg_length",
+    "width": "sr_pkg_width",
+    "height": "sr_pkg_height",
+    "applied_weight": "sr_pkg_applied_weight",
+}
+
 def _f(v):
     try:
         if v is None:
@@ -29,4 +41,64 @@ def calculate_pkg_weights(doc, method=None):
     applied = max(dead, vol)
 
     doc.sr_pkg_vol_weight = round(vol, 3)
-    doc.sr_pkg_applied_weight = round(applied, 3)
\ No newline at end of file
+    doc.sr_pkg_applied_weight = round(applied, 3)
+
+
+def _profile(row) -> dict:
+    return {key: _f(row.get(field)) for key, field in PROFILE_FIELDS.items()}
+
+
+def _drop_profile_after_commit(item_code: str):
+    # only once the new values are committed: a rolled back save must not
+    # leave them in Redis, and a reader must not re-cache the old ones
+    frappe.db.after_commit.add(lambda: frappe.cache().hdel(PROFILE_CACHE_KEY, item_code))
+
+
+def update_package_profile(doc, method=None):
+    """Item on_update: the next read loads the values calculate_pkg_weights saved."""
+    _drop_profile_after_commit(doc.name)
+
+
+def clear_package_profile(doc, method=None):
+    """Item on_trash."""
+    _drop_profile_after_commit(doc.name)
+
+
+def clear_package_profiles():
+    """After bulk edits that bypass Item hooks (data import, SQL):
+    bench --site <site> execute siya_clinic.api.item.package_details.clear_package_profiles
+    """
+    frappe.cache().delete_value(PROFILE_CACHE_KEY)
+
+
+def get_package_profiles(item_codes) -> dict:
+    """
+    {item_code: {length, width, height, applied_weight}} for many items.
+    One HMGET for all codes; misses are loaded with one query and cached;
+    unknown items are left out.
+    """
+    cache = frappe.cache()
+    codes = list({c for c in item_codes if c})
+    if not codes:
+        return {}
+
+    profiles = {}
+    missing = []
+
+    # raw HMGET on the same hash cache.hset writes (namespaced key, pickled values)
+    for code, raw in zip(codes, cache.hmget(cache.make_key(PROFILE_CACHE_KEY), codes), strict=True):
+        if raw is None:
+            missing.append(code)
+        else:
+            profiles[code] = pickle.loads(raw)
+
+    if missing:
+        for row in frappe.get_all(
+            "Item",
+            filters={"name": ["in", missing]},
+            fields=["name", *PROFILE_FIELDS.values()],
+        ):
+            profiles[row.name] = _profile(row)
+            cache.hset(PROFILE_CACHE_KEY, row.name, profiles[row.name])
+
+    return profiles
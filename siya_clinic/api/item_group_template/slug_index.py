@@ -0,0 +1,134 @@
+# siya_clinic/api/item_group_template/slug_index.py
+
+"""
+Slug index for Item Group Template.
+
+`template_slug` (hidden, indexed) is set on every save. Active templates
+are served from a cached slug -> template map, and their child rows from
+a per-template cache; both are cleared whenever a template changes.
+
+Sites whose DocType predates the field build the map from template_name.
+Templates saved before the field existed are filled once by setup_all
+(setup/backfills.py).
+"""
+
+import frappe
+from frappe.utils.data import flt
+
+DOCTYPE = "Item Group Template"
+CHILD_DOCTYPE = "Item Group Template Item"
+F_SLUG = "template_slug"
+
+SLUG_MAP_CACHE_KEY = "siya_item_group_template_slugs"
+ROWS_CACHE_KEY = "siya_item_group_template_rows"
+
+
+def template_slug(value):
+    """Shopify item code / template name -> comparable slug ("Hair-Kit " -> "hair kit")."""
+    return (value or "").replace("-", " ").lower().strip() or None
+
+
+# ---------------------------------------------------------
+# Hooks
+# ---------------------------------------------------------
+
+def set_template_slug(doc, method=None):
+    if doc.meta.has_field(F_SLUG):
+        doc.set(F_SLUG, template_slug(doc.get("template_name")))
+
+
+def clear_template_cache(doc=None, method=None):
+    frappe.cache().delete_value([SLUG_MAP_CACHE_KEY, ROWS_CACHE_KEY])
+
+
+# ---------------------------------------------------------
+# Lookups
+# ---------------------------------------------------------
+
+def _load_slug_map():
+    if not frappe.db.has_column(DOCTYPE, F_SLUG):
+        rows = frappe.get_all(
+            DOCTYPE, filters={"is_active": 1}, fields=["name", "template_name"], order_by="creation asc"
+        )
+        for row in rows:
+            row[F_SLUG] = template_slug(row.template_name)
+    else:
+        rows = frappe.get_all(
+            DOCTYPE,
+            filters={"is_active": 1, F_SLUG: ["is", "set"]},
+            fields=["name", F_SLUG],
+            order_by="creation asc",
+        )
+
+    slug_map = {}
+    for row in rows:
+        # oldest template wins on a slug clash
+        if row.get(F_SLUG):
+            slug_map.setdefault(row.get(F_SLUG), row.name)
+    return slug_map
+
+
+def get_template_by_slug(value):
+    """Active template whose slug matches value, else None."""
+    slug = template_slug(value)
+    if not slug:
+        return None
+    slug_map = frappe.cache().get_value(SLUG_MAP_CACHE_KEY, generator=_load_slug_map) or {}
+    return slug_map.get(slug)
+
+
+def _load_template_rows(template_names):
+    rows_by_template = {t: [] for t in template_names}
+    for row in frappe.get_all(
+        CHILD_DOCTYPE,
+        filters={"parenttype": DOCTYPE, "parent": ["in", list(template_names)]},
+        fields=["parent", "item_code", "qty", "rate", "item_tax_template"],
+        order_by="parent asc, idx asc",
+    ):
+        rows_by_template[row.parent].append({
+            "item_code": row.item_code,
+            "qty": flt(row.qty),
+            "rate": flt(row.rate),
+            "item_tax_template": row.item_tax_template,
+        })
+    return rows_by_template
+
+
+def prefetch_template_rows(template_names):
+    """Warm the row cache for many templates with one query."""
+    names = {t for t in template_names if t}
+    missing = [t for t in names if frappe.cache().hget(ROWS_CACHE_KEY, t) is None]
+    if not missing:
+        return
+    for template, rows in _load_template_rows(missing).items():
+        frappe.cache().hset(ROWS_CACHE_KEY, template, rows)
+
+
+def get_template_rows(template_name):
+    """Cached child rows: [{item_code, qty, rate, item_tax_template}, ...] (do not mutate)."""
+    return frappe.cache().hget(
+        ROWS_CACHE_KEY,
+        template_name,
+        generator=lambda: _load_template_rows([template_name])[template_name],
+    )
+
+
+# ---------------------------------------------------------
+# Backfill
+# ---------------------------------------------------------
+
+def backfill_template_slugs():
+    """Set template_slug on templates saved before the field existed."""
+    if not frappe.db.has_column(DOCTYPE, F_SLUG):
+        return 0
+
+    changes = {}
+    for row in frappe.get_all(DOCTYPE, fields=["name", "template_name", F_SLUG]):
+        slug = template_slug(row.template_name)
+        if row.get(F_SLUG) != slug:
+            changes[row.name] = {F_SLUG: slug}
+
+    if changes:
+        frappe.db.bulk_update(DOCTYPE, changes, update_modified=False)
+        clear_template_cache()
+    return len(changes)
@@ -0,0 +1,228 @@
+# siya_clinic/api/patient/billing_summary.py
+
+"""
+Per-patient billing summary ("SR Patient Billing Summary").
+
+Sales Invoice / Payment Entry submit + cancel refresh the summary row of
+just the affected patient(s) with two index-backed aggregates, so the
+Patient form reads totals from one row instead of rescanning invoices.
+
+Outstanding is not stored: Journal Entries, Payment Reconciliation and
+unreconciles change it without touching the invoice's patient, so it is
+summed live (Sales Invoice patient index) when the form asks for it.
+
+Patient form:
+    siya_clinic.api.patient.billing_summary.get_patient_billing
+        -> {summary, invoices, payments, has_more_*}
+
+Backfill for existing patients: queued once by setup_all (setup/backfills.py),
+or by hand:
+    bench --site <site> execute siya_clinic.api.patient.billing_summary.rebuild_billing_summaries
+"""
+
+import frappe
+from frappe.utils.data import cint
+
+SUMMARY_DT = "SR Patient Billing Summary"
+
+DEFAULT_PAGE_LENGTH = 20
+MAX_PAGE_LENGTH = 100
+REBUILD_CHUNK_SIZE = 2000
+
+SUMMARY_FIELDS = (
+    "invoice_count", "total_invoiced", "last_invoice_date",
+    "payment_count", "total_paid", "last_payment_date",
+)
+
+
+# ---------------------------------------------------------
+# Payment party (same rule the Payments tab always used)
+# ---------------------------------------------------------
+
+def _payment_party(patient: str, customer: str | None = None) -> tuple[str, str]:
+    if customer is None:
+        customer = frappe.db.get_value("Patient", patient, "customer")
+    return ("Customer", customer) if customer else ("Patient", patient)
+
+
+# ---------------------------------------------------------
+# Refresh
+# ---------------------------------------------------------
+
+def _aggregate(patient: str, customer: str | None) -> dict:
+    inv = frappe.db.sql(
+        """
+        SELECT COUNT(*) AS invoice_count,
+               IFNULL(SUM(grand_total), 0) AS total_invoiced,
+               MAX(posting_date) AS last_invoice_date
+        FROM `tabSales Invoice`
+        WHERE patient = %s AND docstatus = 1
+        """,
+        (patient,),
+        as_dict=True,
+    )[0]
+
+    party_type, party = _payment_party(patient, customer)
+    pay = frappe.db.sql(
+        """
+        SELECT COUNT(*) AS payment_count,
+               IFNULL(SUM(paid_amount), 0) AS total_paid,
+               MAX(posting_date) AS last_payment_date
+        FROM `tabPayment Entry`
+        WHERE party_type = %s AND party = %s AND docstatus = 1
+        """,
+        (party_type, party),
+        as_dict=True,
+    )[0]
+
+    return {**inv, **pay}
+
+
+def refresh_billing_summaries(patients) -> None:
+    """Recompute the summary rows of these patients (insert or update)."""
+    patients = {p for p in (patients or []) if p}
+    if not patients:
+        return
+
+    customers = dict(frappe.get_all(
+        "Patient",
+        filters={"name": ["in", list(patients)]},
+        fields=["name", "customer"],
+        as_list=True,
+    ))
+    existing = set(frappe.get_all(SUMMARY_DT, filters={"name": ["in", list(patients)]}, pluck="name"))
+
+    updates = {}
+    for patient in patients:
+        if patient not in customers:
+            continue
+        values = _aggregate(patient, customers[patient] or "")
+        if patient in existing:
+            updates[patient] = values
+            continue
+
+        try:
+            frappe.db.savepoint("billing_summary_insert")
+            doc = frappe.new_doc(SUMMARY_DT)
+            doc.patient = patient
+            doc.update(values)
+            doc.insert(ignore_permissions=True)
+        except frappe.DuplicateEntryError:
+            # a concurrent submit for the same patient inserted it first
+            frappe.db.rollback(save_point="billing_summary_insert")
+            frappe.clear_last_message()
+            updates[patient] = values
+
+    if updates:
+        frappe.db.bulk_update(SUMMARY_DT, updates)
+
+
+# ---------------------------------------------------------
+# Hooks (Sales Invoice / Payment Entry on_submit + on_cancel)
+# ---------------------------------------------------------
+
+def on_sales_invoice_change(doc, method=None):
+    """Invoice totals of this SI's patient."""
+    if doc.get("patient"):
+        refresh_billing_summaries([doc.patient])
+
+
+def on_payment_entry_change(doc, method=None):
+    """Payments of the party's patient(s)."""
+    patients = set()
+
+    if doc.party_type == "Patient":
+        patients.add(doc.party)
+    elif doc.party_type == "Customer" and doc.party:
+        patients.update(frappe.get_all("Patient", filters={"customer": doc.party}, pluck="name"))
+
+    refresh_billing_summaries(patients)
+
+
+# ---------------------------------------------------------
+# Patient form API
+# ---------------------------------------------------------
+
+def _total_outstanding(patient: str) -> float:
+    return frappe.db.sql(
+        """
+        SELECT IFNULL(SUM(outstanding_amount), 0)
+        FROM `tabSales Invoice`
+        WHERE patient = %s AND docstatus = 1
+        """,
+        (patient,),
+    )[0][0]
+
+
+@frappe.whitelist()
+def get_patient_billing(patient: str, start: int = 0, page_length: int = DEFAULT_PAGE_LENGTH) -> dict:
+    """
+    Totals + one page of recent submitted invoices and payments.
+    Older pages: pass start = previous start + page_length.
+    """
+    frappe.has_permission("Patient", "read", patient, throw=True)
+
+    start = max(cint(start), 0)
+    page_length = min(cint(page_length) or DEFAULT_PAGE_LENGTH, MAX_PAGE_LENGTH)
+
+    summary = frappe.db.get_value(SUMMARY_DT, patient, list(SUMMARY_FIELDS), as_dict=True)
+    if not summary:
+        # no row yet (before the backfill): compute, don't write; rows are
+        # created by the SI / PE hooks and rebuild_billing_summaries
+        summary = frappe._dict(_aggregate(patient, frappe.db.get_value("Patient", patient, "customer") or ""))
+    summary["total_outstanding"] = _total_outstanding(patient)
+
+    invoices = frappe.get_list(
+        "Sales Invoice",
+        filters={"patient": patient, "docstatus": 1},
+        fields=["name", "posting_date", "grand_total", "outstanding_amount"],
+        order_by="posting_date desc, name desc",
+        limit_start=start,
+        limit_page_length=page_length,
+    )
+
+    party_type, party = _payment_party(patient)
+    payments = frappe.get_list(
+        "Payment Entry",
+        filters={"party_type": party_type, "party": party, "docstatus": 1},
+        fields=["name", "posting_date", "paid_amount", "mode_of_payment", "reference_no", "reference_date"],
+        order_by="posting_date desc, name desc",
+        limit_start=start,
+        limit_page_length=page_length,
+    )
+
+    return {
+        "summary": summary,
+        "invoices": invoices,
+        "payments": payments,
+        "has_more_invoices": start + len(invoices) < cint(summary.get("invoice_count")),
+        "has_more_payments": start + len(payments) < cint(summary.get("payment_count")),
+        "next_start": start + page_length,
+    }
+
+
+# ---------------------------------------------------------
+# Backfill
+# ---------------------------------------------------------
+
+def rebuild_billing_summaries(chunk_size: int = REBUILD_CHUNK_SIZE) -> int:
+    """Recompute summaries for all patients; keyset-paginated, committed per chunk."""
+    chunk_size = cint(chunk_size) or REBUILD_CHUNK_SIZE
+    last_name = ""
+    processed = 0
+
+    while True:
+        names = frappe.db.sql_list(
+            "SELECT name FROM `tabPatient` WHERE name > %s ORDER BY name LIMIT %s",
+            (last_name, chunk_size),
+        )
+        if not names:
+            break
+
+        refresh_billing_summaries(names)
+        frappe.db.commit()
+
+        processed += len(names)
+        last_name = names[-1]
+
+    return processed
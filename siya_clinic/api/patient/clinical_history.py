@@ -0,0 +1,132 @@
+# siya_clinic/api/patient/clinical_history.py
+
+"""
+Clinical History dialog data (public/js/common/clinical_history.js).
+
+One call returns a page of the patient's encounters that carry clinical
+notes, with only the fields the dialog renders and their medication rows.
+All three medication tables are "Drug Prescription" rows, so they are
+loaded with a single query for the whole page.
+
+Encounters are read through frappe.get_list, so the user's permissions
+(user permissions, permission query conditions) apply. Pages are cached
+under a per-patient, per-user key for CACHE_TTL seconds and stamped with
+the patient's latest encounter modified time + count, so any encounter
+change shows up on the next open without explicit invalidation.
+"""
+
+import frappe
+from frappe.utils import strip_html
+from frappe.utils.data import cint
+
+ENCOUNTER_DT = "Patient Encounter"
+PRESCRIPTION_DT = "Drug Prescription"
+
+NOTE_FIELDS = ("sr_complaints", "sr_observations", "sr_investigations", "sr_diagnosis", "sr_notes")
+ENCOUNTER_FIELDS = ("name", "encounter_date", "sr_encounter_type", "sr_encounter_place", *NOTE_FIELDS)
+
+MEDICATION_TABLES = ("drug_prescription", "sr_homeopathy_drug_prescription", "sr_allopathy_drug_prescription")
+MEDICATION_FIELDS = ("medication", "drug_code", "drug_name", "dosage", "period", "dosage_form", "sr_drug_instruction")
+
+DEFAULT_PAGE_LENGTH = 20
+MAX_PAGE_LENGTH = 100
+
+CACHE_KEY = "siya_clinical_history"
+CACHE_TTL = 60 * 60
+
+
+def _clean(value) -> str:
+    return strip_html(value or "").replace("&nbsp;", " ").strip()
+
+
+def _has_notes(row) -> bool:
+    return any(_clean(row.get(f)) for f in NOTE_FIELDS)
+
+
+def _history_stamp(patient: str) -> str:
+    """Changes whenever an encounter of this patient is added, edited or deleted."""
+    latest, count = frappe.db.sql(
+        "SELECT MAX(modified), COUNT(*) FROM `tabPatient Encounter` WHERE patient = %s",
+        (patient,),
+    )[0]
+    return f"{latest}|{count}"
+
+
+def _load_medications(encounters: list[str]) -> dict:
+    meta = frappe.get_meta(PRESCRIPTION_DT)
+    fields = [f for f in MEDICATION_FIELDS if meta.has_field(f)]
+
+    rows = frappe.get_all(
+        PRESCRIPTION_DT,
+        filters={
+            "parenttype": ENCOUNTER_DT,
+            "parent": ["in", encounters],
+            "parentfield": ["in", list(MEDICATION_TABLES)],
+        },
+        fields=["parent", "parentfield", *fields],
+        order_by="parent asc, parentfield asc, idx asc",
+    )
+
+    out = {}
+    for r in rows:
+        out.setdefault((r.parent, r.parentfield), []).append({
+            "medication": r.get("medication"),
+            "drug": r.get("drug_name") or r.get("drug_code"),
+            "dosage": r.get("dosage"),
+            "period": r.get("period"),
+            "dosage_form": r.get("dosage_form"),
+            "sr_drug_instruction": r.get("sr_drug_instruction"),
+        })
+    return out
+
+
+def _build_page(patient: str, start: int, page_length: int) -> dict:
+    # any note field non-blank (HTML-only notes are dropped below);
+    # one extra row tells us whether there is an older page
+    rows = frappe.get_list(
+        ENCOUNTER_DT,
+        filters={"patient": patient},
+        or_filters=[[f, "is", "set"] for f in NOTE_FIELDS],
+        fields=list(ENCOUNTER_FIELDS),
+        order_by="encounter_date desc, creation desc",
+        limit_start=start,
+        limit_page_length=page_length + 1,
+    )
+
+    has_more = len(rows) > page_length
+    rows = [r for r in rows[:page_length] if _has_notes(r)]
+
+    meds = _load_medications([r.name for r in rows]) if rows else {}
+    for r in rows:
+        for table in MEDICATION_TABLES:
+            r[table] = meds.get((r.name, table), [])
+
+    return {
+        "encounters": rows,
+        "has_more": has_more,
+        "next_start": start + page_length,
+    }
+
+
+@frappe.whitelist()
+def get_clinical_history(patient: str, start: int = 0, page_length: int = DEFAULT_PAGE_LENGTH) -> dict:
+    """
+    Encounters with clinical notes for patient, newest first.
+    Returns {"encounters": [...], "has_more": bool, "next_start": int}.
+    """
+    frappe.has_permission("Patient", "read", patient, throw=True)
+    frappe.has_permission(ENCOUNTER_DT, "read", throw=True)
+
+    start = max(cint(start), 0)
+    page_length = min(cint(page_length) or DEFAULT_PAGE_LENGTH, MAX_PAGE_LENGTH)
+
+    stamp = _history_stamp(patient)
+    key = f"{CACHE_KEY}|{patient}|{frappe.session.user}|{start}|{page_length}"
+
+    cached = frappe.cache().get_value(key)
+    if cached and cached.get("stamp") == stamp:
+        return cached["data"]
+
+    data = _build_page(patient, start, page_length)
+    frappe.cache().set_value(key, {"stamp": stamp, "data": data}, expires_in_sec=CACHE_TTL)
+    return data
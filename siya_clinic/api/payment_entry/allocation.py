@@ -0,0 +1,162 @@
+# siya_clinic/api/payment_entry/allocation.py
+
+"""
+Set-based allocation of draft Payment Entries to a submitted Sales Invoice.
+
+Draft PEs created from an Encounter carry `intended_sales_invoice`. On SI
+submit they are linked in three steps:
+
+1. one aggregate query: candidate PEs + sum of their existing references
+2. greedy plan in memory (oldest PE first, capped by SI outstanding)
+3. bulk insert of the reference rows + bulk update of PE totals
+
+No Payment Entry is loaded or saved as a document, so the SI submit
+transaction only touches the rows it writes. The draft PEs are fully
+re-validated by ERPNext when they are submitted.
+
+Dry run (no writes):
+    siya_clinic.api.payment_entry.allocation.preview_payment_allocation
+"""
+
+from __future__ import annotations
+
+import frappe
+from frappe.utils import now_datetime
+from frappe.utils.data import flt
+
+PE_DOCTYPE = "Payment Entry"
+REF_DOCTYPE = "Payment Entry Reference"
+
+
+# ---------------------------------------------------------
+# Plan
+# ---------------------------------------------------------
+
+def _candidate_payment_entries(si) -> list[dict]:
+    """Draft PEs intended for this SI with their current reference totals (one query)."""
+    if not frappe.get_meta(PE_DOCTYPE).has_field("intended_sales_invoice"):
+        return []
+
+    return frappe.db.sql(
+        """
+        SELECT pe.name, pe.paid_amount, pe.received_amount, pe.source_exchange_rate,
+               COALESCE(SUM(per.allocated_amount), 0) AS already_allocated,
+               COALESCE(MAX(per.idx), 0) AS last_idx,
+               COALESCE(SUM(per.reference_doctype = 'Sales Invoice'
+                            AND per.reference_name = %(si)s), 0) AS refs_this_si
+        FROM `tabPayment Entry` pe
+        LEFT JOIN `tabPayment Entry Reference` per
+               ON per.parent = pe.name AND per.parenttype = 'Payment Entry'
+        WHERE pe.docstatus = 0
+          AND pe.company = %(company)s
+          AND pe.party_type = 'Customer'
+          AND pe.party = %(customer)s
+          AND pe.intended_sales_invoice = %(si)s
+        GROUP BY pe.name, pe.paid_amount, pe.received_amount, pe.source_exchange_rate
+        ORDER BY MIN(pe.creation) ASC, pe.name ASC
+        """,
+        {"si": si.name, "company": si.company, "customer": si.customer},
+        as_dict=True,
+    )
+
+
+def plan_allocation(si) -> list[dict]:
+    """
+    Greedy allocation plan:
+        [{payment_entry, allocated_amount, total_allocated, unallocated, idx,
+          source_exchange_rate}, ...]
+    PEs already referencing this SI are skipped (re-submit / retry safe).
+    """
+    outstanding = flt(si.get("outstanding_amount") or si.get("grand_total") or 0)
+    if outstanding <= 0:
+        return []
+
+    plan = []
+    for pe in _candidate_payment_entries(si):
+        if outstanding <= 0:
+            break
+        if pe.refs_this_si:
+            continue
+
+        pay_total = flt(pe.received_amount or pe.paid_amount or 0)
+        unallocated = max(pay_total - flt(pe.already_allocated), 0)
+        if unallocated <= 0:
+            continue
+
+        alloc = min(unallocated, outstanding)
+        plan.append({
+            "payment_entry": pe.name,
+            "allocated_amount": alloc,
+            "total_allocated": flt(pe.already_allocated) + alloc,
+            "unallocated": unallocated - alloc,
+            "idx": int(pe.last_idx) + 1,
+            "source_exchange_rate": flt(pe.source_exchange_rate) or 1,
+        })
+        outstanding -= alloc
+
+    return plan
+
+
+# ---------------------------------------------------------
+# Apply
+# ---------------------------------------------------------
+
+def _apply_plan(si, plan: list[dict]) -> None:
+    now = now_datetime()
+    user = frappe.session.user
+    due_date = si.get("due_date") or si.get("posting_date")
+    exchange_rate = flt(si.get("conversion_rate")) or 1
+
+    frappe.db.bulk_insert(
+        REF_DOCTYPE,
+        fields=[
+            "name", "creation", "modified", "owner", "modified_by", "docstatus",
+            "parent", "parenttype", "parentfield", "idx",
+            "reference_doctype", "reference_name", "due_date", "account",
+            "total_amount", "outstanding_amount", "allocated_amount", "exchange_rate",
+        ],
+        values=[
+            (
+                frappe.generate_hash(length=10), now, now, user, user, 0,
+                p["payment_entry"], PE_DOCTYPE, "references", p["idx"],
+                "Sales Invoice", si.name, due_date, si.get("debit_to"),
+                flt(si.get("grand_total")), flt(si.get("outstanding_amount")),
+                p["allocated_amount"], exchange_rate,
+            )
+            for p in plan
+        ],
+    )
+
+    frappe.db.bulk_update(
+        PE_DOCTYPE,
+        {
+            p["payment_entry"]: {
+                "total_allocated_amount": p["total_allocated"],
+                "base_total_allocated_amount": flt(
+                    p["total_allocated"] * p["source_exchange_rate"],
+                    frappe.get_precision(PE_DOCTYPE, "base_total_allocated_amount"),
+                ),
+                "unallocated_amount": p["unallocated"],
+            }
+            for p in plan
+        },
+    )
+
+
+def allocate_pending_payment_entries(si, dry_run: bool = False) -> list[dict]:
+    """Link draft PEs intended for `si`; returns the plan (written unless dry_run)."""
+    if si.docstatus != 1 and not dry_run:
+        return []
+
+    plan = plan_allocation(si)
+    if plan and not dry_run:
+        _apply_plan(si, plan)
+    return plan
+
+
+@frappe.whitelist()
+def preview_payment_allocation(sales_invoice: str):
+    """Dry run: which draft PEs would be linked to this SI, and for how much."""
+    si = frappe.get_doc("Sales Invoice", sales_invoice)
+    si.check_permission("read")
+    return allocate_pending_payment_entries(si, dry_run=True)
@@ -1,44 +1,16 @@
 from __future__ import annotations
 import frappe
 
-# -------------------------------------------------
-# ROLE → KEYWORD MAP (dynamic)
-# -------------------------------------------------
-ROLE_WAREHOUSE_KEYWORDS = {
-    "OPD Biller": "OPD",
-    "Packaging Biller": "Packaging",
-}
-
-# Roles/users who bypass restrictions
-BYPASS_ROLES = {"System Manager"}
-BYPASS_USERS = {"Administrator"}
+from siya_clinic.api.common.biller_warehouse import get_allowed_warehouse
 
 
 def _get_allowed_warehouse(user: str, company: str) -> str | None:
     """
-    Return allowed warehouse dynamically based on role + company.
+    Return allowed warehouse based on role + company
+    (SR Biller Warehouse Settings, cached).
     Admin / System Manager → unrestricted
     """
-
-    roles = set(frappe.get_roles(user))
-
-    # Admin / System Manager → unrestricted
-    if user in BYPASS_USERS or roles & BYPASS_ROLES:
-        return None
-
-    for role, keyword in ROLE_WAREHOUSE_KEYWORDS.items():
-        if role in roles:
-            warehouse = frappe.db.get_value(
-                "Warehouse",
-                {
-                    "company": company,
-                    "warehouse_name": ["like", f"%{keyword}%"],
-                },
-                "name",
-            )
-            return warehouse
-
-    return None
+    return get_allowed_warehouse(user, company)
 
 
 def _has_other_warehouse(doc, allowed_warehouse: str) -> bool:
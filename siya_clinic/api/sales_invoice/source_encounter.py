@@ -0,0 +1,114 @@
+# siya_clinic/api/sales_invoice/source_encounter.py
+
+"""
+Sales Invoice -> Patient Encounter link (Sales Invoice.source_encounter).
+
+The field is unique, so it is the dedup key for the draft invoice created
+on Encounter submit: one indexed lookup instead of a LIKE scan of remarks.
+
+The link records provenance only: it does not block cancelling the
+Encounter (allow_encounter_cancel), as the remarks text never did.
+
+Invoices created before the field existed only carry the link in their
+remarks ("Created from Patient Encounter: <name>"). Backfilled once by
+setup_all (setup/backfills.py), or by hand:
+    bench --site <site> execute siya_clinic.api.sales_invoice.source_encounter.backfill_source_encounter
+"""
+
+import re
+
+import frappe
+from frappe.utils.data import cint
+
+SI_F_SOURCE_ENCOUNTER = "source_encounter"
+
+REMARKS_PREFIX = "Created from Patient Encounter: "
+REMARKS_RE = re.compile(r"Patient Encounter:\s*(\S+)")
+
+BACKFILL_CHUNK_SIZE = 2000
+
+
+def get_invoice_for_encounter(encounter: str) -> str | None:
+    """Sales Invoice already created from this encounter (any docstatus)."""
+    return frappe.db.get_value("Sales Invoice", {SI_F_SOURCE_ENCOUNTER: encounter}, "name")
+
+
+def allow_encounter_cancel(doc, method=None):
+    """Patient Encounter before_cancel: a submitted invoice's source_encounter is no back link."""
+    ignored = list(getattr(doc, "ignore_linked_doctypes", None) or [])
+    if "Sales Invoice" not in ignored:
+        doc.ignore_linked_doctypes = (*ignored, "Sales Invoice")
+
+
+def _candidates() -> dict:
+    """encounter -> invoice parsed from remarks; live invoices win over cancelled, then oldest."""
+    picked = {}
+    last_name = ""
+
+    while True:
+        rows = frappe.db.sql(
+            f"""
+            SELECT name, remarks, docstatus, creation
+            FROM `tabSales Invoice`
+            WHERE name > %s
+              AND `{SI_F_SOURCE_ENCOUNTER}` IS NULL
+              AND remarks LIKE %s
+            ORDER BY name
+            LIMIT %s
+            """,
+            (last_name, REMARKS_PREFIX + "%", BACKFILL_CHUNK_SIZE),
+            as_dict=True,
+        )
+        if not rows:
+            break
+
+        for r in rows:
+            m = REMARKS_RE.search(r.remarks or "")
+            if not m:
+                continue
+            rank = (r.docstatus == 2, r.creation)
+            current = picked.get(m.group(1))
+            if current is None or rank < current[0]:
+                picked[m.group(1)] = (rank, r.name)
+
+        last_name = rows[-1].name
+
+    return {enc: name for enc, (_rank, name) in picked.items()}
+
+
+def backfill_source_encounter(chunk_size: int = BACKFILL_CHUNK_SIZE) -> dict:
+    """
+    Fill source_encounter from remarks for invoices that predate the field.
+    Encounters already linked, missing encounters and extra (duplicate)
+    invoices of the same encounter are left untouched.
+    """
+    chunk_size = cint(chunk_size) or BACKFILL_CHUNK_SIZE
+    picked = _candidates()
+    encounters = list(picked)
+
+    linked = 0
+    skipped = 0
+
+    for i in range(0, len(encounters), chunk_size):
+        chunk = encounters[i:i + chunk_size]
+
+        known = set(frappe.get_all("Patient Encounter", filters={"name": ["in", chunk]}, pluck="name"))
+        claimed = set(frappe.get_all(
+            "Sales Invoice",
+            filters={SI_F_SOURCE_ENCOUNTER: ["in", chunk]},
+            pluck=SI_F_SOURCE_ENCOUNTER,
+        ))
+
+        updates = {
+            picked[enc]: {SI_F_SOURCE_ENCOUNTER: enc}
+            for enc in chunk
+            if enc in known and enc not in claimed
+        }
+        skipped += len(chunk) - len(updates)
+
+        if updates:
+            frappe.db.bulk_update("Sales Invoice", updates, update_modified=False)
+            frappe.db.commit()
+            linked += len(updates)
+
+    return {"linked": linked, "skipped": skipped}
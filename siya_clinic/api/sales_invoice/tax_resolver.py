@@ -0,0 +1,227 @@
+# siya_clinic/api/sales_invoice/tax_resolver.py
+
+"""
+Shared GST tax resolution for Sales Invoices (Encounter + Shopify paths).
+
+resolve_sales_taxes(company, company_state, customer_state) returns the
+Sales Taxes and Charges Template to use plus its tax rows with account
+heads already mapped to the invoice company. Results are cached in-process
+and in Redis keyed on (company, company_state, customer_state); the company
+address/state is cached too. Template and Account changes clear the cache;
+an Address change drops only the entries of the companies it links to (see
+doc_events in hooks.py).
+"""
+
+from __future__ import annotations
+
+import frappe
+
+TEMPLATE_DOCTYPE = "Sales Taxes and Charges Template"
+
+TAX_TEMPLATE_INTRASTATE = "Output GST In-state"
+TAX_TEMPLATE_INTERSTATE = "Output GST Out-state"
+
+TAX_ROW_FIELDS = (
+    "charge_type", "row_id", "account_head", "description",
+    "included_in_print_rate", "cost_center", "rate", "tax_amount",
+)
+
+CACHE_KEY = "siya_tax_resolution"
+
+
+def clear_tax_cache(doc=None, method=None):
+    frappe.cache().delete_value(CACHE_KEY)
+
+
+def clear_company_address_cache(doc, method=None):
+    """Address hook: forget the cached address/state of its linked companies."""
+    before = doc.get_doc_before_save() if method == "on_update" else None
+    companies = {
+        link.link_name
+        for d in (doc, before) if d
+        for link in d.get("links") or []
+        if link.link_doctype == "Company"
+    }
+    if companies:
+        frappe.cache().hdel(CACHE_KEY, [f"company_address|{c}" for c in companies])
+
+
+def _cached(key, resolver):
+    return frappe.cache().hget(CACHE_KEY, key, generator=resolver)
+
+
+def _norm_state(state) -> str:
+    return (state or "").strip().lower()
+
+
+# ---------------------------------------------------------
+# Address / state lookups
+# ---------------------------------------------------------
+
+def _primary_address(link_doctype: str, link_name: str) -> dict | None:
+    """
+    Customer primary address, else the primary linked Address, else the most
+    recently linked one. Single query.
+    """
+    primary_branch = ""
+    if link_doctype == "Customer":
+        primary_branch = """
+            (SELECT a.name, a.state, 0 AS rnk, a.modified AS lm
+             FROM `tabCustomer` c
+             JOIN `tabAddress` a ON a.name = c.customer_primary_address
+             WHERE c.name = %(link_name)s)
+            UNION ALL
+        """
+
+    rows = frappe.db.sql(
+        f"""
+        {primary_branch}
+        (SELECT a.name, a.state, IF(a.is_primary_address = 1, 1, 2) AS rnk, dl.modified AS lm
+         FROM `tabDynamic Link` dl
+         JOIN `tabAddress` a ON a.name = dl.parent
+         WHERE dl.parenttype = 'Address'
+           AND dl.link_doctype = %(link_doctype)s
+           AND dl.link_name = %(link_name)s)
+        ORDER BY rnk ASC, lm DESC
+        LIMIT 1
+        """,
+        {"link_doctype": link_doctype, "link_name": link_name},
+        as_dict=True,
+    )
+    return rows[0] if rows else None
+
+
+def get_company_address(company: str) -> str | None:
+    addr = _cached(f"company_address|{company}", lambda: _primary_address("Company", company) or {})
+    return addr.get("name") if addr else None
+
+
+def get_company_state(company: str) -> str | None:
+    addr = _cached(f"company_address|{company}", lambda: _primary_address("Company", company) or {})
+    return addr.get("state") if addr else None
+
+
+def get_customer_state(customer: str) -> str | None:
+    """Not cached: one query per invoice."""
+    addr = _primary_address("Customer", customer) if customer else None
+    return addr.get("state") if addr else None
+
+
+# ---------------------------------------------------------
+# Template + rows
+# ---------------------------------------------------------
+
+def _pick_template(company: str, intrastate: bool | None, fallback_to_default: bool) -> str | None:
+    """
+    One query over the company's enabled templates, then:
+    exact GST name -> name contains In-state/Out-state -> title contains it
+    -> (fallback) company default -> any enabled template.
+    """
+    templates = frappe.get_all(
+        TEMPLATE_DOCTYPE,
+        filters={"company": company, "disabled": 0},
+        fields=["name", "title", "is_default"],
+        order_by="modified desc",
+    )
+
+    if intrastate is not None:
+        prefer = TAX_TEMPLATE_INTRASTATE if intrastate else TAX_TEMPLATE_INTERSTATE
+        keyword = ("In-state" if intrastate else "Out-state").lower()
+
+        for t in templates:
+            if t.name == prefer:
+                return t.name
+        for t in templates:
+            if keyword in (t.name or "").lower():
+                return t.name
+        for t in templates:
+            if keyword in (t.title or "").lower():
+                return t.name
+
+    if fallback_to_default:
+        for t in templates:
+            if t.is_default:
+                return t.name
+        if templates:
+            return templates[0].name
+
+    return None
+
+
+def _company_tax_rows(template: str, company: str) -> list[dict]:
+    """Template rows with account heads mapped to `company` (unmappable rows dropped)."""
+    rows = frappe.db.sql(
+        f"""
+        SELECT {", ".join(f"t.`{f}`" for f in TAX_ROW_FIELDS)},
+               acc.company AS acc_company, acc.account_name, acc.account_number
+        FROM `tabSales Taxes and Charges` t
+        LEFT JOIN `tabAccount` acc ON acc.name = t.account_head
+        WHERE t.parenttype = %s AND t.parent = %s
+        ORDER BY t.idx ASC
+        """,
+        (TEMPLATE_DOCTYPE, template),
+        as_dict=True,
+    )
+
+    foreign = [r for r in rows if r.account_head and r.acc_company and r.acc_company != company]
+    by_name, by_number = {}, {}
+    if foreign:
+        or_filters = {"account_name": ["in", list({r.account_name for r in foreign})]}
+        numbers = list({r.account_number for r in foreign if r.account_number})
+        if numbers:
+            or_filters["account_number"] = ["in", numbers]
+
+        for acc in frappe.get_all(
+            "Account",
+            filters={"company": company, "is_group": 0},
+            or_filters=or_filters,
+            fields=["name", "account_name", "account_number"],
+        ):
+            by_name.setdefault(acc.account_name, acc.name)
+            if acc.account_number:
+                by_number.setdefault(acc.account_number, acc.name)
+
+    out = []
+    for r in rows:
+        if not r.account_head or not r.acc_company:
+            continue
+        head = r.account_head
+        if r.acc_company != company:
+            head = by_name.get(r.account_name) or (by_number.get(r.account_number) if r.account_number else None)
+            if not head:
+                continue
+        row = {f: r.get(f) for f in TAX_ROW_FIELDS}
+        row["account_head"] = head
+        out.append(row)
+    return out
+
+
+def _resolve(company, company_state, customer_state, fallback_to_default):
+    intrastate = None
+    if company_state and customer_state:
+        intrastate = company_state == customer_state
+
+    template = _pick_template(company, intrastate, fallback_to_default)
+    return {
+        "template": template,
+        "taxes": _company_tax_rows(template, company) if template else [],
+    }
+
+
+def resolve_sales_taxes(
+    company: str,
+    company_state: str | None,
+    customer_state: str | None,
+    fallback_to_default: bool = False,
+) -> frappe._dict:
+    """
+    Template + pre-mapped tax rows for (company, company_state, customer_state).
+    Returns {"template": name | None, "taxes": [row dict, ...]}; rows are fresh
+    copies, safe to modify.
+    """
+    comp = _norm_state(company_state)
+    cust = _norm_state(customer_state)
+    key = f"taxes|{company}|{comp}|{cust}|{int(bool(fallback_to_default))}"
+
+    res = _cached(key, lambda: _resolve(company, comp, cust, fallback_to_default))
+    return frappe._dict(template=res["template"], taxes=[dict(t) for t in res["taxes"]])
@@ -1,7 +1,24 @@
 import frappe
-from frappe.utils import nowdate
+from frappe.utils import add_to_date, now_datetime, nowdate
 from frappe.utils.data import flt
 
+from siya_clinic.api.item.item_attributes import (
+    clear_item_memo,
+    get_item_name,
+    prefetch_items,
+    remember_item,
+)
+from siya_clinic.api.item_group_template.slug_index import (
+    get_template_by_slug,
+    get_template_rows,
+    prefetch_template_rows,
+)
+from siya_clinic.api.sales_invoice.tax_resolver import (
+    get_company_state,
+    get_customer_state,
+    resolve_sales_taxes,
+)
+
 """
 POST /api/method/siya_clinic.api.shopify.create_shopify_order
 
@@ -18,6 +35,14 @@ Optional payload flags/fields:
 - company_state: "Haryana"        # if no Company address linked
 - selling_price_list / price_list_currency / plc_conversion_rate
 - autocreate_item: 1              # create a simple Service Item if item_code missing/not found
+
+POST /api/method/siya_clinic.api.shopify.create_shopify_orders_batch
+    {"orders": [<payload>, ...]}  -> per-order results, one savepoint per order
+
+POST /api/method/siya_clinic.api.shopify.enqueue_shopify_order
+    same payload (shopify_order_id required) -> stored in "SR Shopify Order Queue",
+    acknowledged immediately and processed on a worker; redeliveries are no-ops
+GET  /api/method/siya_clinic.api.shopify.get_shopify_order_status?shopify_order_id=...
 """
 
 # ------------------------------
@@ -40,7 +65,54 @@ def _name_parts(full):
     return first, last
 
 
+# ------------------------------
+# Resolution cache
+# ------------------------------
+# Company / account / cost center / price list resolutions are memoized per
+# request and shared across workers through Redis. Any change to Company,
+# Account, Cost Center, Mode of Payment, Price List, Global Defaults or
+# Selling Settings clears the whole map (see doc_events in hooks.py).
+RESOLUTION_CACHE_KEY = "siya_shopify_resolution"
+
+
+def _cached(key, resolver):
+    return frappe.cache().hget(RESOLUTION_CACHE_KEY, key, generator=resolver)
+
+
+def clear_resolution_cache(doc=None, method=None):
+    frappe.cache().delete_value(RESOLUTION_CACHE_KEY)
+
+
 def _resolve_company(val):
+    return _cached(f"company|{val or ''}", lambda: _lookup_company(val))
+
+
+def _resolve_income_account(company, acc_from_payload=None):
+    return _cached(
+        f"income_account|{company}|{acc_from_payload or ''}",
+        lambda: _lookup_income_account(company, acc_from_payload),
+    )
+
+
+def _resolve_paid_to_account(company, mode_of_payment=None, paid_to=None):
+    return _cached(
+        f"paid_to|{company}|{mode_of_payment or ''}|{paid_to or ''}",
+        lambda: _lookup_paid_to_account(company, mode_of_payment, paid_to),
+    )
+
+
+def _resolve_cost_center(company, cc_from_payload=None):
+    return _cached(
+        f"cost_center|{company}|{cc_from_payload or ''}",
+        lambda: _lookup_cost_center(company, cc_from_payload),
+    )
+
+
+def _get_receivable_account(company):
+    return _cached(f"receivable|{company}", lambda: _lookup_receivable_account(company))
+
+
+def _lookup_company(val):
     # 1) If nothing passed, use default or the only company
     if not val:
         default = frappe.db.get_single_value("Global Defaults", "default_company")
@@ -79,7 +151,7 @@ def _resolve_company(val):
     frappe.throw(f"Company '{val}' not found (neither as name nor abbreviation).")
 
 
-def _resolve_income_account(company, acc_from_payload=None):
+def _lookup_income_account(company, acc_from_payload=None):
     # prefer payload if valid for the company
     if _valid_income_account(acc_from_payload, company):
         return acc_from_payload
@@ -94,7 +166,7 @@ def _resolve_income_account(company, acc_from_payload=None):
     frappe.throw(f"No Income account found for company '{company}'. Set a default or pass 'income_account'.")
 
 
-def _resolve_paid_to_account(company, mode_of_payment=None, paid_to=None):
+def _lookup_paid_to_account(company, mode_of_payment=None, paid_to=None):
     # explicit account passed?
     if paid_to and frappe.db.exists("Account", {"name": paid_to, "company": company, "is_group": 0}):
         return paid_to
@@ -119,7 +191,7 @@ def _resolve_paid_to_account(company, mode_of_payment=None, paid_to=None):
     frappe.throw(f"No Cash/Bank account found for company '{company}'. Map a Mode of Payment account or pass 'paid_to'.")
 
 
-def _resolve_cost_center(company, cc_from_payload=None):
+def _lookup_cost_center(company, cc_from_payload=None):
     # prefer payload if valid
     if _valid_cost_center(cc_from_payload, company):
         return cc_from_payload
@@ -141,7 +213,7 @@ def _resolve_cost_center(company, cc_from_payload=None):
     )
 
 
-def _get_receivable_account(company):
+def _lookup_receivable_account(company):
     # 1️⃣ Company default
     acc = frappe.get_value("Company", company, "default_receivable_account")
     if acc:
@@ -177,33 +249,20 @@ def _get_receivable_account(company):
 def _get_item_group_template_from_item(item_code):
     """
     Match Shopify item_code with Item Group Template.template_name
-    using slug/normalized comparison.
+    through the cached slug index.
     """
-    code_norm = item_code.replace("-", " ").lower().strip()
-
-    templates = frappe.get_all(
-        "Item Group Template",
-        filters={"is_active": 1},
-        fields=["name", "template_name"]
-    )
-
-    for tpl in templates:
-        if tpl.template_name and tpl.template_name.lower().strip() == code_norm:
-            return tpl.name
-
-    return None
+    return get_template_by_slug(item_code)
 
 
 def _expand_item_group_template(template_name, parent_qty):
-    tpl = frappe.get_doc("Item Group Template", template_name)
     rows = []
 
-    for r in tpl.items:
+    for r in get_template_rows(template_name):
         rows.append({
-            "item_code": r.item_code,
-            "qty": flt(r.qty) * parent_qty,
-            "rate": flt(r.rate),
-            "item_tax_template": r.item_tax_template
+            "item_code": r["item_code"],
+            "qty": flt(r["qty"]) * parent_qty,
+            "rate": flt(r["rate"]),
+            "item_tax_template": r["item_tax_template"]
         })
 
     return rows
@@ -241,30 +300,39 @@ def _valid_income_account(name, company):
     return bool(frappe.db.exists("Account", {"name": name, "company": company, "is_group": 0, "root_type": "Income"}))
 
 
+def _find_selling_price_list(spl):
+    """Existing price list for the payload value, else the selling default (None if nothing exists)."""
+    if spl and frappe.db.exists("Price List", spl):
+        return spl
+
+    default_pl = frappe.db.get_single_value("Selling Settings", "selling_price_list")
+    if default_pl and frappe.db.exists("Price List", default_pl):
+        return default_pl
+    if frappe.db.exists("Price List", "Standard Selling"):
+        return "Standard Selling"
+    return None
+
+
 def _resolve_price_list(payload, currency):
     """Return (selling_price_list, price_list_currency, plc_conversion_rate) with safe defaults."""
-    spl = payload.get("selling_price_list")
-    if spl and not frappe.db.exists("Price List", spl):
-        spl = None
+    requested = payload.get("selling_price_list")
+    spl = _cached(f"price_list|{requested or ''}", lambda: _find_selling_price_list(requested))
 
     if not spl:
-        default_pl = frappe.db.get_single_value("Selling Settings", "selling_price_list")
-        if default_pl and frappe.db.exists("Price List", default_pl):
-            spl = default_pl
-        elif frappe.db.exists("Price List", "Standard Selling"):
-            spl = "Standard Selling"
-        else:
-            # create a minimal selling price list in the company currency
-            pl = frappe.get_doc({
-                "doctype": "Price List",
-                "price_list_name": "API Selling (INR)" if currency == "INR" else f"API Selling ({currency})",
-                "enabled": 1,
-                "selling": 1,
-                "currency": currency
-            }).insert(ignore_permissions=True)
-            spl = pl.name
-
-    plc = payload.get("price_list_currency") or frappe.db.get_value("Price List", spl, "currency") or currency
+        # create a minimal selling price list in the company currency
+        # (not cached: the insert may still be rolled back with the order)
+        pl = frappe.get_doc({
+            "doctype": "Price List",
+            "price_list_name": "API Selling (INR)" if currency == "INR" else f"API Selling ({currency})",
+            "enabled": 1,
+            "selling": 1,
+            "currency": currency
+        }).insert(ignore_permissions=True)
+        spl = pl.name
+
+    plc = payload.get("price_list_currency") \
+        or _cached(f"price_list_currency|{spl}", lambda: frappe.db.get_value("Price List", spl, "currency")) \
+        or currency
     rate = payload.get("plc_conversion_rate") or (1 if plc == currency else None)
     return spl, plc, rate
 
@@ -290,16 +358,24 @@ def _resolve_hsn_code(it, payload):
     return code
 
 
-def _ensure_item(it, company):
-    """Return a valid item_code; create a simple Service Item if missing and autocreate_item=1."""
+def _item_code_candidates(it):
     code = (it.get("item_code") or it.get("item_name") or "").strip()
+    return code, code.upper().replace(" ", "-")[:140]
+
+
+def _ensure_item(it, company, payload=None):
+    """Return a valid item_code; create a simple Service Item if missing and autocreate_item=1."""
+    code, norm = _item_code_candidates(it)
     if not code:
         frappe.throw("Each item needs item_code or item_name.")
-    norm = code.upper().replace(" ", "-")[:140]
-    if frappe.db.exists("Item", code) or frappe.db.exists("Item", norm):
-        return code if frappe.db.exists("Item", code) else norm
+    if get_item_name(code) is not False:
+        return code
+    if get_item_name(norm) is not False:
+        return norm
 
-    hsn = _resolve_hsn_code(it, frappe.local.form_dict if hasattr(frappe.local, "form_dict") else None)
+    if payload is None:
+        payload = frappe.local.form_dict if hasattr(frappe.local, "form_dict") else None
+    hsn = _resolve_hsn_code(it, payload)
 
     # create minimal Service item
     doc = frappe.get_doc({
@@ -313,6 +389,7 @@ def _ensure_item(it, company):
         "is_sales_item": 1,
         "disabled": 0
     }).insert(ignore_permissions=True)
+    remember_item(doc)
     return doc.name
 
 
@@ -582,7 +659,7 @@ def _create_or_update_contact(payload, customer, patient):
 # ------------------------------
 def _create_sales_invoice(payload, customer, patient):
     company = _resolve_company(payload.get("company"))
-    company_currency = frappe.db.get_value("Company", company, "default_currency") or "INR"
+    company_currency = frappe.get_cached_value("Company", company, "default_currency") or "INR"
     posting_date = payload.get("posting_date") or nowdate()
     currency = payload.get("currency") or company_currency
     due_date = payload.get("due_date") or posting_date
@@ -592,43 +669,15 @@ def _create_sales_invoice(payload, customer, patient):
         frappe.throw("Items missing")
 
     # ---- Company/Customer state to decide GST template ----
-    company_state = payload.get("company_state")
-    if not company_state:
-        dl = frappe.get_all(
-            "Dynamic Link",
-            filters={"link_doctype": "Company", "link_name": company, "parenttype": "Address"},
-            fields=["parent"], limit=1
-        )
-        if dl:
-            company_state = frappe.db.get_value("Address", dl[0].parent, "state")
-
-    customer_state = payload.get("state")
-    if not customer_state:
-        dl2 = frappe.get_all(
-            "Dynamic Link",
-            filters={"link_doctype": "Customer", "link_name": customer, "parenttype": "Address"},
-            fields=["parent"], limit=1
-        )
-        if dl2:
-            customer_state = frappe.db.get_value("Address", dl2[0].parent, "state")
+    company_state = payload.get("company_state") or get_company_state(company)
+    customer_state = payload.get("state") or get_customer_state(customer)
 
     taxes = payload.get("taxes")
+    tax_template = None
     if not taxes:
         if company_state and customer_state:
-            template_name = (
-                "Output GST In-state"
-                if company_state.strip().lower() == customer_state.strip().lower()
-                else "Output GST Out-state"
-            )
-            taxes = frappe.get_all(
-                "Sales Taxes and Charges",
-                filters={"parent": template_name},
-                fields=[
-                    "charge_type", "account_head", "rate",
-                    "description", "included_in_print_rate"
-                ],
-                order_by="idx asc",
-            )
+            resolved = resolve_sales_taxes(company, company_state, customer_state)
+            tax_template, taxes = resolved.template, resolved.taxes
         else:
             taxes = []
 
@@ -666,6 +715,13 @@ def _create_sales_invoice(payload, customer, patient):
     autocreate = payload.get("autocreate_item") in (1, "1", True, "true", "True")
     has_disc_amount_field = frappe.get_meta("Sales Invoice Item").has_field("discount_amount")
 
+    # resolved once per order, not per line
+    income_account = _resolve_income_account(company)
+    cost_center = _resolve_cost_center(company)
+
+    # no-op for codes already loaded by the batch endpoint
+    _prefetch_order_items(items)
+
     si_items = []
     applied_template = None
     kit_discount_applied = False
@@ -673,7 +729,7 @@ def _create_sales_invoice(payload, customer, patient):
     for it in items:
         code = it.get("item_code") or it.get("item_name")
         if autocreate:
-            code = _ensure_item(it, company)
+            code = _ensure_item(it, company, payload)
         elif not code:
             frappe.throw("Each item needs item_code or item_name.")
 
@@ -702,7 +758,7 @@ def _create_sales_invoice(payload, customer, patient):
 
                 si_items.append({
                     "item_code": kit["item_code"],
-                    "item_name": frappe.db.get_value("Item", kit["item_code"], "item_name"),
+                    "item_name": get_item_name(kit["item_code"]) or None,
                     "qty": kit["qty"],
                     "uom": "Nos",
 
@@ -713,8 +769,8 @@ def _create_sales_invoice(payload, customer, patient):
                     "allow_zero_valuation_rate": 1,
                     "is_free_item": 0,
 
-                    "income_account": _resolve_income_account(company),
-                    "cost_center": _resolve_cost_center(company),
+                    "income_account": income_account,
+                    "cost_center": cost_center,
                     "item_tax_template": kit["item_tax_template"],
                 })
             continue
@@ -735,8 +791,8 @@ def _create_sales_invoice(payload, customer, patient):
                 "uom": it.get("uom") or "Nos",
                 "price_list_rate": gross_rate,
                 "discount_percentage": disc_pct,
-                "income_account": _resolve_income_account(company),
-                "cost_center": _resolve_cost_center(company),
+                "income_account": income_account,
+                "cost_center": cost_center,
                 "gst_hsn_code": it.get("gst_hsn_code"),
             }
 
@@ -755,6 +811,7 @@ def _create_sales_invoice(payload, customer, patient):
         "debit_to": _get_receivable_account(company),
         "items": si_items,
         "taxes": taxes,
+        "taxes_and_charges": tax_template,
         "ignore_pricing_rule": 1,
         "selling_price_list": selling_price_list,
         "price_list_currency": price_list_currency,
@@ -852,7 +909,7 @@ def _create_payment_entry(payload, customer, sales_invoice):
         frappe.throw(f"No receivable account found for company '{company}'. Set one on Company/Customer or pass 'debit_to' in SI.")
 
     # currencies
-    company_currency = frappe.db.get_value("Company", company, "default_currency") or "INR"
+    company_currency = frappe.get_cached_value("Company", company, "default_currency") or "INR"
     from_curr = frappe.db.get_value("Account", party_account, "account_currency") or company_currency
 
     paid_to_acc = _resolve_paid_to_account(company, mode_of_payment, payload.get("paid_to"))
@@ -898,6 +955,80 @@ def _create_payment_entry(payload, customer, sales_invoice):
         pe.submit()
     return pe.name
 
+# ------------------------------
+# Order pipeline
+# ------------------------------
+
+MAX_BATCH_ORDERS = 200
+
+QUEUE_DOCTYPE = "SR Shopify Order Queue"
+
+# a "Processing" row untouched this long belongs to a dead worker
+# (short queue jobs are killed after 5 minutes)
+STALE_PROCESSING_MINUTES = 10
+
+
+def _process_order(payload):
+    """Customer -> Patient -> Address -> Contact -> Sales Invoice -> Payment Entry (no commit)."""
+    customer = _get_or_create_customer(payload)
+    patient = _get_or_create_patient(payload, customer)
+    address = _create_or_update_address(payload, customer, patient)
+    contact = _create_or_update_contact(payload, customer, patient)
+    si = _create_sales_invoice(payload, customer, patient)
+    pe = _create_payment_entry(payload, customer, si)
+
+    return {
+        "customer": customer,
+        "patient": patient,
+        "address": address,
+        "contact": contact,
+        "sales_invoice": si,
+        "payment_entry": pe
+    }
+
+
+def _get_batch_json():
+    """Accept {"orders": [...]} or a bare JSON list."""
+    data = frappe.request.get_json(silent=True) if getattr(frappe, "request", None) else None
+    if data is None:
+        data = frappe.local.form_dict.get("orders")
+    if isinstance(data, dict):
+        data = data.get("orders")
+    if isinstance(data, str):
+        data = frappe.parse_json(data)
+    return [frappe._dict(o) for o in (data or [])]
+
+
+def _prefetch_batch_lookups(orders):
+    """
+    Resolve lookups shared across the batch once: companies, accounts,
+    templates and items. Failures are ignored here and surface per order.
+    """
+    for payload in orders:
+        try:
+            company = _resolve_company(payload.get("company"))
+            _resolve_income_account(company)
+            _resolve_cost_center(company)
+            _get_receivable_account(company)
+        except Exception:
+            frappe.clear_messages()
+
+    _prefetch_order_items([it for payload in orders for it in (payload.get("items") or [])])
+
+
+def _prefetch_order_items(items):
+    """Line codes, their kit templates and kit component items in one query each."""
+    codes = set()
+    for it in items:
+        codes.update(c for c in _item_code_candidates(it) if c)
+
+    templates = {_get_item_group_template_from_item(c) for c in codes} - {None}
+    prefetch_template_rows(templates)
+
+    kit_codes = {r["item_code"] for t in templates for r in get_template_rows(t)}
+    prefetch_items(codes | kit_codes)
+
+
 # ------------------------------
 # Public API
 # ------------------------------
@@ -917,21 +1048,7 @@ def create_shopify_order():
     try:
         frappe.db.savepoint("start_create_shopify_order")
 
-        customer = _get_or_create_customer(payload)
-        patient = _get_or_create_patient(payload, customer)
-        address = _create_or_update_address(payload, customer, patient)
-        contact = _create_or_update_contact(payload, customer, patient)
-        si = _create_sales_invoice(payload, customer, patient)
-        pe = _create_payment_entry(payload, customer, si)
-
-        res = {
-            "customer": customer,
-            "patient": patient,
-            "address": address,
-            "contact": contact,
-            "sales_invoice": si,
-            "payment_entry": pe
-        }
+        res = _process_order(payload)
 
         frappe.db.commit()
 
@@ -944,3 +1061,199 @@ def create_shopify_order():
         frappe.throw("Failed to create Shopify order. See Error Log.")
 
     return res
+
+
+@frappe.whitelist(allow_guest=False, methods=["POST"])
+def create_shopify_orders_batch():
+    """
+    Batch variant of create_shopify_order.
+
+    Body: {"orders": [<create_shopify_order payload>, ...]} (or a bare list).
+    Each order runs under its own savepoint, so a failing order is rolled
+    back alone. The batch is committed once at the end.
+    Returns one result per order, in input order.
+    """
+    frappe.flags.in_shopify_api = True
+
+    orders = _get_batch_json()
+    if not orders:
+        frappe.throw("orders missing")
+    if len(orders) > MAX_BATCH_ORDERS:
+        frappe.throw(f"At most {MAX_BATCH_ORDERS} orders per batch.")
+
+    _prefetch_batch_lookups(orders)
+
+    results = []
+    for idx, payload in enumerate(orders):
+        save_point = f"shopify_batch_{idx}"
+        entry = {"index": idx, "shopify_order_id": payload.get("shopify_order_id")}
+
+        try:
+            frappe.db.savepoint(save_point)
+            entry.update(_process_order(payload))
+            entry["status"] = "success"
+
+        except Exception as e:
+            frappe.db.rollback(save_point=save_point)
+            # items auto-created by this order are gone again
+            clear_item_memo()
+            frappe.log_error(
+                title="create_shopify_orders_batch: order failed",
+                message=frappe.get_traceback()
+            )
+            frappe.clear_messages()
+            entry.update({"status": "failed", "error": str(e) or e.__class__.__name__})
+
+        results.append(entry)
+
+    frappe.db.commit()
+
+    succeeded = sum(1 for r in results if r["status"] == "success")
+    return {
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results,
+    }
+
+
+# ------------------------------
+# Async ingestion (staging queue)
+# ------------------------------
+
+def _queue_status(name):
+    row = frappe.db.get_value(
+        QUEUE_DOCTYPE,
+        name,
+        ["name", "status", "attempts", "sales_invoice", "result", "error", "modified"],
+        as_dict=True,
+    )
+    if not row:
+        return None
+
+    row.shopify_order_id = row.pop("name")
+    row.result = frappe.parse_json(row.result) if row.result else None
+    # tracebacks are for managers only
+    if "System Manager" not in frappe.get_roles():
+        row.error = "See Error Log" if row.error else None
+    return row
+
+
+def _stale_processing_before():
+    return add_to_date(now_datetime(), minutes=-STALE_PROCESSING_MINUTES)
+
+
+def _requeue_staged_order(name):
+    frappe.db.set_value(QUEUE_DOCTYPE, name, {"status": "Queued", "error": None})
+    _enqueue_staged_order(name)
+
+
+def _enqueue_staged_order(name):
+    frappe.enqueue(
+        "siya_clinic.api.shopify.process_staged_order",
+        queue="short",
+        enqueue_after_commit=True,
+        name=name,
+    )
+
+
+def requeue_stale_staged_orders():
+    """Scheduler: orders left in Processing by a dead worker are queued again."""
+    names = frappe.get_all(
+        QUEUE_DOCTYPE,
+        filters={"status": "Processing", "modified": ["<", _stale_processing_before()]},
+        pluck="name",
+    )
+    for name in names:
+        _requeue_staged_order(name)
+    if names:
+        frappe.db.commit()
+
+
+@frappe.whitelist(allow_guest=False, methods=["POST"])
+def enqueue_shopify_order():
+    """
+    Store the raw payload keyed by shopify_order_id and acknowledge at once.
+    The order is built by process_staged_order on a worker. A redelivery of
+    a known order id is a no-op (a Failed order, or one stuck in Processing
+    for STALE_PROCESSING_MINUTES, is queued again).
+    """
+    payload = _get_json()
+    order_id = str(payload.get("shopify_order_id") or "").strip()
+    if not order_id:
+        frappe.throw("shopify_order_id is required")
+
+    existing, modified = frappe.db.get_value(QUEUE_DOCTYPE, order_id, ["status", "modified"]) or (None, None)
+
+    if not existing:
+        try:
+            frappe.get_doc({
+                "doctype": QUEUE_DOCTYPE,
+                "shopify_order_id": order_id,
+                "status": "Queued",
+                "payload": frappe.as_json(payload),
+            }).insert(ignore_permissions=True)
+        except frappe.DuplicateEntryError:
+            # concurrent delivery of the same order won the insert
+            frappe.db.rollback()
+            return {"shopify_order_id": order_id, "status": "Queued", "duplicate": True}
+
+        _enqueue_staged_order(order_id)
+        frappe.db.commit()
+        return {"shopify_order_id": order_id, "status": "Queued", "duplicate": False}
+
+    # Failed, or Processing on a worker that died → process the redelivery
+    if existing == "Failed" or (existing == "Processing" and modified < _stale_processing_before()):
+        _requeue_staged_order(order_id)
+        frappe.db.commit()
+        return {"shopify_order_id": order_id, "status": "Queued", "duplicate": True}
+
+    return {"shopify_order_id": order_id, "status": existing, "duplicate": True}
+
+
+def process_staged_order(name):
+    """Worker: build the documents for one staged order exactly once."""
+    # row lock: a second worker for the same order waits, then sees the status
+    status = frappe.db.get_value(QUEUE_DOCTYPE, name, "status", for_update=True)
+    if status != "Queued":
+        return
+
+    frappe.db.set_value(QUEUE_DOCTYPE, name, {
+        "status": "Processing",
+        "attempts": (frappe.db.get_value(QUEUE_DOCTYPE, name, "attempts") or 0) + 1,
+    })
+    frappe.db.commit()
+
+    frappe.flags.in_shopify_api = True
+    payload = frappe._dict(frappe.parse_json(frappe.db.get_value(QUEUE_DOCTYPE, name, "payload")) or {})
+
+    try:
+        frappe.db.savepoint("process_staged_order")
+        res = _process_order(payload)
+        frappe.db.set_value(QUEUE_DOCTYPE, name, {
+            "status": "Processed",
+            "sales_invoice": res.get("sales_invoice"),
+            "result": frappe.as_json(res),
+            "error": None,
+        })
+        frappe.db.commit()
+
+    except Exception:
+        frappe.db.rollback(save_point="process_staged_order")
+        frappe.clear_messages()
+        frappe.db.set_value(QUEUE_DOCTYPE, name, {
+            "status": "Failed",
+            "error": frappe.get_traceback(),
+        })
+        frappe.db.commit()
+        frappe.log_error(
+            title="process_staged_order failed",
+            message=frappe.get_traceback()
+        )
+
+
+@frappe.whitelist(allow_guest=False)
+def get_shopify_order_status(shopify_order_id):
+    """Queue status for a Shopify order id (None if never received)."""
+    frappe.has_permission(QUEUE_DOCTYPE, "read", throw=True)
+    return _queue_status(str(shopify_order_id or "").strip())
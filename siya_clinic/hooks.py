@@ -31,6 +31,7 @@ web_include_css = "/assets/siya_clinic/css/theme_overrides.css"
 
 doctype_list_js = {
     "CRM Lead": "public/js/crm_lead/list/assignment_actions.js",
+    "Sales Invoice": "public/js/sales_invoice/list/shipkia_actions.js",
 }
 
 permission_query_conditions = {
@@ -101,6 +102,9 @@ doc_events = {
             "siya_clinic.api.address.customer_links.validate_state",
             "siya_clinic.api.address.customer_links.ensure_address_has_customer_link",
         ],
+        # Cached company address / state for GST resolution
+        "on_update": "siya_clinic.api.sales_invoice.tax_resolver.clear_company_address_cache",
+        "on_trash": "siya_clinic.api.sales_invoice.tax_resolver.clear_company_address_cache",
     },
     "CRM Lead": {
         "validate": [
@@ -154,9 +158,14 @@ doc_events = {
         "on_submit": [
             "siya_clinic.api.encounter.handlers.create_billing_on_submit",
         ],
+        "before_cancel": [
+            "siya_clinic.api.sales_invoice.source_encounter.allow_encounter_cancel",
+        ],
     },
     "Item": {
         "validate": "siya_clinic.api.item.package_details.calculate_pkg_weights",
+        "on_update": "siya_clinic.api.item.package_details.update_package_profile",
+        "on_trash": "siya_clinic.api.item.package_details.clear_package_profile",
     },
     "Sales Invoice": {
         "before_insert": [
@@ -170,6 +179,10 @@ doc_events = {
         ],
         "on_submit": [
             "siya_clinic.api.encounter.handlers.link_pending_payment_entries",
+            "siya_clinic.api.patient.billing_summary.on_sales_invoice_change",
+        ],
+        "on_cancel": [
+            "siya_clinic.api.patient.billing_summary.on_sales_invoice_change",
         ],
         "before_cancel": [
             "siya_clinic.api.sales_invoice.guard.validate_sales_invoice_warehouse",
@@ -182,11 +195,90 @@ doc_events = {
         "before_insert": [
             "siya_clinic.api.payment_entry.creator.set_created_by_agent",
         ],
+        "on_submit": [
+            "siya_clinic.api.patient.billing_summary.on_payment_entry_change",
+        ],
+        "on_cancel": [
+            "siya_clinic.api.patient.billing_summary.on_payment_entry_change",
+        ],
     },
     "ToDo": {
         "on_trash": [
             "siya_clinic.api.crm_lead.assign_guard.todo_on_trash",
         ],
+        # CRM Lead -> open assignee index (PQC); on_update also runs on insert
+        "on_update": [
+            "siya_clinic.api.crm_lead.assignee_index.sync_from_todo",
+        ],
+        "after_delete": [
+            "siya_clinic.api.crm_lead.assignee_index.sync_from_todo",
+        ],
+    },
+    # Cached allowed SR Lead Pipelines per user (CRM Lead access)
+    "User Permission": {
+        "on_update": "siya_clinic.api.crm_lead.access.clear_allowed_pipelines_cache",
+        "on_trash": "siya_clinic.api.crm_lead.access.clear_allowed_pipelines_cache",
+    },
+    "User": {
+        "on_update": [
+            "siya_clinic.api.crm_lead.access.clear_allowed_pipelines_cache",
+            "siya_clinic.api.common.role_context.clear_role_context",
+            "siya_clinic.api.common.biller_warehouse.clear_biller_warehouse_cache",
+        ],
+        "on_trash": "siya_clinic.api.crm_lead.access.clear_allowed_pipelines_cache",
+    },
+    # Cached biller role -> warehouse (Sales Invoice guard / Encounter billing)
+    "Warehouse": {
+        "on_update": "siya_clinic.api.common.biller_warehouse.clear_biller_warehouse_cache",
+        "on_trash": "siya_clinic.api.common.biller_warehouse.clear_biller_warehouse_cache",
+    },
+    "SR Biller Warehouse Settings": {
+        "on_update": "siya_clinic.api.common.biller_warehouse.clear_biller_warehouse_cache",
+    },
+    "Item Group Template": {
+        "validate": "siya_clinic.api.item_group_template.slug_index.set_template_slug",
+        "on_update": "siya_clinic.api.item_group_template.slug_index.clear_template_cache",
+        "on_trash": "siya_clinic.api.item_group_template.slug_index.clear_template_cache",
+    },
+    # Shopify resolution cache (company / accounts / cost center / price list)
+    "Company": {
+        "on_update": "siya_clinic.api.shopify.clear_resolution_cache",
+        "on_trash": "siya_clinic.api.shopify.clear_resolution_cache",
+    },
+    "Account": {
+        "on_update": [
+            "siya_clinic.api.shopify.clear_resolution_cache",
+            "siya_clinic.api.sales_invoice.tax_resolver.clear_tax_cache",
+        ],
+        "on_trash": [
+            "siya_clinic.api.shopify.clear_resolution_cache",
+            "siya_clinic.api.sales_invoice.tax_resolver.clear_tax_cache",
+        ],
+    },
+    "Cost Center": {
+        "on_update": "siya_clinic.api.shopify.clear_resolution_cache",
+        "on_trash": "siya_clinic.api.shopify.clear_resolution_cache",
+    },
+    "Mode of Payment": {
+        "on_update": "siya_clinic.api.shopify.clear_resolution_cache",
+        "on_trash": "siya_clinic.api.shopify.clear_resolution_cache",
+    },
+    "Price List": {
+        "on_update": "siya_clinic.api.shopify.clear_resolution_cache",
+        "on_trash": "siya_clinic.api.shopify.clear_resolution_cache",
+    },
+    "Global Defaults": {
+        "on_update": "siya_clinic.api.shopify.clear_resolution_cache",
+        "on_trash": "siya_clinic.api.shopify.clear_resolution_cache",
+    },
+    "Selling Settings": {
+        "on_update": "siya_clinic.api.shopify.clear_resolution_cache",
+        "on_trash": "siya_clinic.api.shopify.clear_resolution_cache",
+    },
+    # GST template resolution cache
+    "Sales Taxes and Charges Template": {
+        "on_update": "siya_clinic.api.sales_invoice.tax_resolver.clear_tax_cache",
+        "on_trash": "siya_clinic.api.sales_invoice.tax_resolver.clear_tax_cache",
     },
     # "File": {
     #     "after_insert": [
@@ -201,8 +293,7 @@ doc_events = {
 doctype_js = {
     "Patient": [
         "public/js/patient/followup_marker.js",
-        "public/js/patient/patient_invoices.js",
-        "public/js/patient/patient_payments.js",
+        "public/js/patient/patient_billing.js",
         "public/js/patient/patient_regional.js",
         "public/js/patient/pex_launcher.js",
         "public/js/common/clinical_history.js",
@@ -257,6 +348,16 @@ override_whitelisted_methods = {
     "frappe.desk.form.assign_to.clear": "siya_clinic.api.crm_lead.assign_guard.clear",
 }
 
+scheduler_events = {
+    # Shipkia outbox retries, Shopify orders orphaned by a dead worker
+    "cron": {
+        "*/5 * * * *": [
+            "siya_clinic.api.integrations.shipkia_outbox.flush_shipkia_outbox",
+            "siya_clinic.api.shopify.requeue_stale_staged_orders",
+        ],
+    },
+}
+
 fixtures = [
     {"dt": "Custom Field", "filters": [["module", "=", "Siya Clinic"]]},
     {"dt": "Property Setter", "filters": [["module", "=", "Siya Clinic"]]},
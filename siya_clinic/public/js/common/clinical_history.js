@@ -190,28 +190,18 @@ async function _fetch_patient(patient_name) {
   return patient;
 }
 
-async function _fetch_encounters(patient_name) {
-  const { message: rows = [] } = await frappe.call({
-    method: "frappe.client.get_list",
-    args: {
-      doctype: "Patient Encounter",
-      filters: { patient: patient_name },
-      fields: ["name", "encounter_date"],
-      order_by: "encounter_date desc, creation desc",
-      limit_page_length: 100
-    }
+// One call per page: encounters with notes + medication rows (server-side)
+async function _fetch_encounters(patient_name, start = 0) {
+  const { message: page = {} } = await frappe.call({
+    method: "siya_clinic.api.patient.clinical_history.get_clinical_history",
+    args: { patient: patient_name, start }
   });
 
-  const full = await Promise.all(
-    rows.map(r =>
-      frappe.call({
-        method: "frappe.client.get",
-        args: { doctype: "Patient Encounter", name: r.name }
-      }).then(res => res.message)
-    )
-  );
-
-  return full.filter(_has_notes);
+  return {
+    rows: (page.encounters || []).filter(_has_notes),
+    has_more: !!page.has_more,
+    next_start: page.next_start || 0
+  };
 }
 
 // =====================================================
@@ -241,22 +231,23 @@ async function openClinicalHistoryDialog({ patient_name }) {
     d.$body.html("<div class='text-muted' style='padding:16px;'>Loading clinical history...</div>");
     d.show();
 
-    const [patient, rows] = await Promise.all([
+    const [patient, page] = await Promise.all([
       _fetch_patient(patient_name),
       _fetch_encounters(patient_name)
     ]);
 
     const header = _build_header(patient);
-    const blocks = rows.length
-      ? _build_blocks(rows)
-      : "<p class='muted' style='padding:0 16px;'>No encounters with Clinical Notes found.</p>";
+    const blocks = page.rows.length
+      ? _build_blocks(page.rows)
+      : (page.has_more ? "" : "<p class='muted' style='padding:0 16px;'>No encounters with Clinical Notes found.</p>");
 
     const inner = `
       ${_css_block()}
       <div class="history-wrap">
         ${header}
-        ${blocks}
+        <div class="history-blocks">${blocks}</div>
         <div class="dialog-actions">
+          <button class="btn btn-default" data-action="load-older">Load Older</button>
           <button class="btn btn-primary" data-action="print-history">Print</button>
           <button class="btn btn-default" data-action="close">Close</button>
         </div>
@@ -264,9 +255,23 @@ async function openClinicalHistoryDialog({ patient_name }) {
 
     d.$body.html(inner);
 
+    // "Load older" → next page appended below
+    let next_start = page.next_start;
+    const $older = d.$body.find('[data-action="load-older"]');
+    $older.toggle(page.has_more);
+
+    $older.on("click", async () => {
+      $older.prop("disabled", true);
+      const more = await _fetch_encounters(patient_name, next_start);
+      d.$body.find(".history-blocks").append(_build_blocks(more.rows));
+      next_start = more.next_start;
+      $older.prop("disabled", false).toggle(more.has_more);
+    });
+
     d.$body.find('[data-action="print-history"]').on("click", () => {
       const w = window.open("", "_blank");
-      w.document.write(`<html><body>${inner}</body></html>`);
+      const printable = `${_css_block()}<div class="history-wrap">${d.$body.find(".history-wrap").html()}</div>`;
+      w.document.write(`<html><body>${printable}</body></html>`);
       w.document.close();
       setTimeout(() => { w.focus(); w.print(); }, 150);
     });
@@ -35,6 +35,35 @@ frappe.listview_settings['CRM Lead'] = {
 
     if (!can_manage) return;
 
+    // ------------------------------------------------------------
+    // 📦 Bulk reassignment progress (background job)
+    // ------------------------------------------------------------
+    const track_bulk_reassignment = (job) => {
+      frappe.show_alert({
+        message: __('Reassigning {0} leads in the background', [job.total]),
+        indicator: 'blue'
+      });
+
+      const handler = (data) => {
+        if (!data || data.job !== job.job) return;
+
+        frappe.show_progress(__('Assign Lead'), data.done || 0, data.total || job.total, __('Reassigning leads'));
+
+        if (data.status === 'Completed' || data.status === 'Failed') {
+          frappe.realtime.off('sr_lead_reassignment_progress', handler);
+          frappe.hide_progress();
+          if (data.status === 'Completed') {
+            frappe.msgprint(__('{0} leads assigned successfully', [data.changed]));
+          } else {
+            frappe.msgprint(__('Lead reassignment failed. See Error Log.'));
+          }
+          listview.refresh();
+        }
+      };
+
+      frappe.realtime.on('sr_lead_reassignment_progress', handler);
+    };
+
     // ------------------------------------------------------------
     // ✅ ASSIGN CRM LEAD (CUSTOM)
     // ------------------------------------------------------------
@@ -61,7 +90,12 @@ frappe.listview_settings['CRM Lead'] = {
             new_owner: values.new_owner
           },
           freeze: true,
-          callback() {
+          callback(r) {
+            const res = r.message || {};
+            if (res.status === 'Queued') {
+              track_bulk_reassignment(res);
+              return;
+            }
             frappe.msgprint(__('Lead assigned successfully'));
             listview.refresh();
           }
@@ -0,0 +1,86 @@
+/**
+ * Load Sales Invoices + Payment Entries into Patient → Invoices / Payments tabs
+ * Child Tables: sr_sales_invoice_list (SR Patient Invoice View)
+ *               sr_payment_entry_list (SR Patient Payment View)
+ *
+ * One call: totals come from SR Patient Billing Summary (maintained server-side,
+ * outstanding summed live), plus the latest page of invoices and payments.
+ */
+
+function sr_fill_billing_tables(frm, data, append) {
+	if (!append) {
+		frm.clear_table("sr_sales_invoice_list");
+		frm.clear_table("sr_payment_entry_list");
+	}
+
+	(data.invoices || []).forEach((inv) => {
+		let row = frm.add_child("sr_sales_invoice_list");
+
+		row.sr_invoice_no   = inv.name;
+		row.sr_posting_date = inv.posting_date;
+		row.sr_grand_total  = inv.grand_total;
+		row.sr_outstanding  = inv.outstanding_amount;
+	});
+
+	(data.payments || []).forEach((pay) => {
+		let row = frm.add_child("sr_payment_entry_list");
+
+		row.sr_payment_entry = pay.name;
+		row.sr_posting_date = pay.posting_date;
+		row.sr_paid_amount = pay.paid_amount;
+		row.sr_mode_of_payment = pay.mode_of_payment;
+		row.sr_reference_no = pay.reference_no;
+		row.sr_reference_date = pay.reference_date;
+	});
+
+	frm.refresh_field("sr_sales_invoice_list");
+	frm.refresh_field("sr_payment_entry_list");
+}
+
+function sr_load_billing(frm, start) {
+	const was_dirty = frm.is_dirty();
+
+	frappe.call({
+		method: "siya_clinic.api.patient.billing_summary.get_patient_billing",
+		args: { patient: frm.doc.name, start: start || 0 },
+		callback(r) {
+			const data = r.message || {};
+			const s = data.summary || {};
+
+			sr_fill_billing_tables(frm, data, !!start);
+
+			// view-only tables → do not mark the Patient as unsaved
+			if (!was_dirty) {
+				frm.doc.__unsaved = 0;
+				frm.page.clear_indicator();
+			}
+
+			if (!start) {
+				frm.dashboard.clear_headline();
+				frm.dashboard.set_headline(
+					__("Invoiced: {0} &nbsp;|&nbsp; Outstanding: {1} &nbsp;|&nbsp; Paid: {2}", [
+						format_currency(s.total_invoiced || 0),
+						format_currency(s.total_outstanding || 0),
+						format_currency(s.total_paid || 0),
+					])
+				);
+			}
+
+			frm.remove_custom_button(__("Load Older Billing"));
+			if (data.has_more_invoices || data.has_more_payments) {
+				frm.add_custom_button(__("Load Older Billing"), () =>
+					sr_load_billing(frm, data.next_start)
+				);
+			}
+		}
+	});
+}
+
+frappe.ui.form.on("Patient", {
+	refresh(frm) {
+		// Do not run for new patient
+		if (frm.is_new()) return;
+
+		sr_load_billing(frm, 0);
+	}
+});
@@ -17,7 +17,7 @@ frappe.ui.form.on('Sales Invoice', {
   },
 
   // ==================================================
-  // BARCODE SCAN (YOUR ORIGINAL LOGIC – UNTOUCHED)
+  // BARCODE SCAN (single server call)
   // ==================================================
   scan_barcode(frm) {
     if (!frm.doc.scan_barcode) return;
@@ -33,96 +33,50 @@ frappe.ui.form.on('Sales Invoice', {
     const code = frm.doc.scan_barcode.trim();
     const price_list = frm.doc.selling_price_list || "Standard Selling";
 
-    // 🔍 Find batch using barcode
+    // 🔍 Batch + item + stock + price in one call
     frappe.call({
-      method: "frappe.client.get_list",
+      method: "siya_clinic.api.item.barcode_scan.scan_barcode",
       args: {
-        doctype: "Batch",
-        filters: { sr_barcode: code },
-        fields: ["name", "item"],
-        limit_page_length: 1
+        barcode: code,
+        warehouse: frm.doc.set_warehouse,
+        price_list: price_list
       },
       callback(r) {
-        if (!r.message || !r.message.length) {
+        const scan = r.message;
+
+        if (!scan) {
           frappe.msgprint(`❌ No Batch found for barcode: ${code}`);
           frm.set_value("scan_barcode", "");
           return;
         }
 
-        const batch = r.message[0];
-
-        // 🔍 Fetch Item
-        frappe.call({
-          method: "frappe.client.get",
-          args: {
-            doctype: "Item",
-            name: batch.item
-          },
-          callback(itemRes) {
-            const item = itemRes.message;
-
-            // 🚫 Batch stock check
-            frappe.call({
-              method: "erpnext.stock.get_item_details.get_batch_qty",
-              args: {
-                item_code: item.name,
-                warehouse: frm.doc.set_warehouse,
-                batch_no: batch.name
-              },
-              callback(stockRes) {
-                const available_qty = stockRes.message || 0;
-
-                if (available_qty < 1) {
-                  frappe.msgprint("❌ No stock available for this batch");
-                  frm.set_value("scan_barcode", "");
-                  return;
-                }
-
-                // 💰 Fetch selling price
-                frappe.call({
-                  method: "frappe.client.get_list",
-                  args: {
-                    doctype: "Item Price",
-                    filters: {
-                      item_code: item.name,
-                      price_list: price_list
-                    },
-                    fields: ["price_list_rate"],
-                    order_by: "valid_from desc",
-                    limit_page_length: 1
-                  },
-                  callback(priceRes) {
-                    let rate = 0;
-                    if (priceRes.message && priceRes.message.length) {
-                      rate = priceRes.message[0].price_list_rate || 0;
-                    }
-
-                    // 🔁 Existing row (same item + batch)
-                    let existing = (frm.doc.items || []).find(row =>
-                      row.item_code === item.name &&
-                      row.batch_no === batch.name
-                    );
-
-                    if (existing) {
-                      existing.qty += 1;
-                    } else {
-                      let row = frm.add_child("items");
-                      row.item_code = item.name;
-                      row.item_name = item.item_name;
-                      row.batch_no = batch.name;
-                      row.warehouse = frm.doc.set_warehouse;
-                      row.qty = 1;
-                      row.rate = rate;
-                    }
-
-                    frm.refresh_field("items");
-                    frm.set_value("scan_barcode", "");
-                  }
-                });
-              }
-            });
-          }
-        });
+        // 🚫 Batch stock check (available_qty is null when no warehouse was sent)
+        if (scan.available_qty != null && scan.available_qty < 1) {
+          frappe.msgprint("❌ No stock available for this batch");
+          frm.set_value("scan_barcode", "");
+          return;
+        }
+
+        // 🔁 Existing row (same item + batch)
+        let existing = (frm.doc.items || []).find(row =>
+          row.item_code === scan.item_code &&
+          row.batch_no === scan.batch
+        );
+
+        if (existing) {
+          existing.qty += 1;
+        } else {
+          let row = frm.add_child("items");
+          row.item_code = scan.item_code;
+          row.item_name = scan.item_name;
+          row.batch_no = scan.batch;
+          row.warehouse = frm.doc.set_warehouse;
+          row.qty = 1;
+          row.rate = scan.rate || 0;
+        }
+
+        frm.refresh_field("items");
+        frm.set_value("scan_barcode", "");
       }
     });
   }
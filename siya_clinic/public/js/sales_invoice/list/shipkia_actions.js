@@ -0,0 +1,125 @@
+// --------------------------------------------------
+// Bulk send Sales Invoices to Shipkia (list view)
+// Keeps ERPNext's own Sales Invoice list settings.
+// --------------------------------------------------
+
+(() => {
+  const sr_si_list = (frappe.listview_settings['Sales Invoice'] = frappe.listview_settings['Sales Invoice'] || {});
+  const sr_si_list_onload = sr_si_list.onload;
+
+  sr_si_list.onload = function (listview) {
+    if (sr_si_list_onload) sr_si_list_onload(listview);
+
+    const POLL_INTERVAL = 5000;
+    const MAX_POLLS = 120;
+
+    // Outbox delivery progress of the queued invoices, refreshed until none is pending
+    const track_delivery = (dialog, names) => {
+      let polls = 0;
+
+      const poll = () => {
+        if (!dialog.display) return;
+
+        frappe.call({
+          method: 'siya_clinic.api.integrations.shipkia_outbox.get_shipkia_outbox_statuses',
+          args: { invoice_names: names },
+          callback(r) {
+            const rows = r.message || {};
+            const counts = { Queued: 0, Sending: 0, Sent: 0, Failed: 0 };
+            const failed = [];
+
+            Object.entries(rows).forEach(([invoice, row]) => {
+              counts[row.status] = (counts[row.status] || 0) + 1;
+              if (row.status === 'Failed') failed.push(invoice);
+            });
+
+            let html = __('Delivery: {0} sent, {1} pending, {2} failed', [
+              counts.Sent, counts.Queued + counts.Sending, counts.Failed,
+            ]);
+            if (failed.length) {
+              html += '<br>' + __('Failed: {0}', [
+                failed.slice(0, 20).map(n => frappe.utils.escape_html(n)).join(', ')
+                + (failed.length > 20 ? ' …' : ''),
+              ]);
+            }
+            dialog.$body.find('.sr-shipkia-delivery').html(html);
+
+            if (counts.Queued + counts.Sending && ++polls < MAX_POLLS) {
+              setTimeout(poll, POLL_INTERVAL);
+            } else {
+              listview.refresh();
+            }
+          }
+        });
+      };
+
+      poll();
+    };
+
+    const show_results = (res) => {
+      const errors = (res.results || []).filter(r => r.status === 'Error');
+      const queued = (res.results || []).filter(r => r.status !== 'Error').map(r => r.invoice);
+
+      let html = `<p>${__('{0} invoice(s) queued for Shipkia.', [res.queued || 0])}</p>`;
+      if (res.truncated) {
+        html += `<p class="text-warning">${__(
+          'Only the first {0} matching invoices were taken; {1} more match. Run it again once these have been sent.',
+          [res.limit, res.remaining]
+        )}</p>`;
+      }
+      if (queued.length) {
+        html += `<p class="sr-shipkia-delivery text-muted">${__('Delivery: checking…')}</p>`;
+      }
+      if (errors.length) {
+        html += `<p>${__('{0} invoice(s) could not be queued:', [errors.length])}</p><ul>`;
+        errors.forEach(r => {
+          html += `<li><b>${frappe.utils.escape_html(r.invoice)}</b>: ${frappe.utils.escape_html(r.message || '')}</li>`;
+        });
+        html += '</ul>';
+      }
+
+      const dialog = frappe.msgprint({
+        title: __('Send to Shipkia'),
+        message: html,
+        indicator: errors.length || res.truncated ? 'orange' : 'green',
+      });
+      listview.refresh();
+
+      if (queued.length) track_delivery(dialog, queued);
+    };
+
+    const send = (args) => {
+      frappe.call({
+        method: 'siya_clinic.api.integrations.shipkia_sales_invoice.bulk_send_to_shipkia',
+        args: args,
+        freeze: true,
+        freeze_message: __('Queueing invoices for Shipkia...'),
+        callback(r) {
+          if (!r.exc) show_results(r.message || {});
+        }
+      });
+    };
+
+    // ✅ Selected invoices
+    listview.page.add_actions_menu_item(__('Send to Shipkia'), () => {
+      const selected = listview.get_checked_items();
+      if (!selected.length) {
+        frappe.msgprint(__('Please select at least one Sales Invoice'));
+        return;
+      }
+
+      frappe.confirm(
+        __('Send {0} Sales Invoice(s) to Shipkia? Invoices already sent are skipped.', [selected.length]),
+        () => send({ invoice_names: selected.map(d => d.name) })
+      );
+    });
+
+    // ✅ Everything matching the current filters
+    listview.page.add_menu_item(__('Send Filtered to Shipkia'), () => {
+      frappe.confirm(
+        __('Send all submitted, not yet sent Sales Invoices matching the current filters to Shipkia?'),
+        () => send({ filters: listview.get_filters_for_args() })
+      );
+    });
+  };
+})();
@@ -2,11 +2,45 @@
 // Send Sales Invoice to Shipkia
 // --------------------------------------------------
 
+const SR_SHIPKIA_STATUS_COLORS = { Queued: "blue", Sending: "orange", Sent: "green", Failed: "red" };
+
+// Outbox delivery state (queued / retrying / sent / failed) as a dashboard indicator
+function sr_show_shipkia_status(frm) {
+    const invoice = frm.doc.name;
+
+    frappe.call({
+        method: "siya_clinic.api.integrations.shipkia_outbox.get_shipkia_outbox_status",
+        args: { invoice_name: invoice },
+        callback(r) {
+            const row = r.message;
+            // never queued, or the form moved on to another invoice meanwhile
+            if (!row || frm.doc.name !== invoice) return;
+
+            let label = __("Shipkia: {0}", [__(row.status)]);
+            if (row.status === "Queued" && row.attempts) {
+                label += " " + __("(attempt {0} failed, retry at {1})", [
+                    row.attempts,
+                    frappe.datetime.str_to_user(row.next_attempt_at),
+                ]);
+            }
+            frm.dashboard.add_indicator(label, SR_SHIPKIA_STATUS_COLORS[row.status] || "gray");
+
+            if (row.error && row.status !== "Sent") {
+                frm.dashboard.set_headline_alert(
+                    `<div class="text-muted small">${__("Last Shipkia error")}: ${frappe.utils.escape_html(row.error.slice(0, 300))}</div>`
+                );
+            }
+        }
+    });
+}
+
 frappe.ui.form.on("Sales Invoice", {
     refresh(frm) {
 
         if (frm.doc.docstatus === 1) {
 
+            sr_show_shipkia_status(frm);
+
             // Show only if not sent OR allow resend
             if (!frm.doc.sent_to_shipkia) {
 
@@ -22,10 +56,10 @@ frappe.ui.form.on("Sales Invoice", {
                                         invoice_name: frm.doc.name
                                     },
                                     freeze: true,
-                                    freeze_message: __("Sending to Shipkia..."),
+                                    freeze_message: __("Queueing for Shipkia..."),
                                     callback(r) {
                                         if (!r.exc) {
-                                            frappe.msgprint(r.message);
+                                            frappe.show_alert({ message: r.message.message, indicator: "blue" });
                                             frm.reload_doc();
                                         }
                                     }
@@ -53,7 +87,8 @@ frappe.ui.form.on("Sales Invoice", {
                                     freeze: true,
                                     callback(r) {
                                         if (!r.exc) {
-                                            frappe.msgprint("Resent successfully");
+                                            frappe.show_alert({ message: __("Queued for resend"), indicator: "blue" });
+                                            frm.reload_doc();
                                         }
                                     }
                                 });
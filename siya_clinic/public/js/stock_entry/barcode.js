@@ -5,76 +5,41 @@ frappe.ui.form.on('Stock Entry', {
     let code = frm.doc.scan_barcode.trim();
     let price_list = "Standard Selling";
 
-    // 🔎 Find batch by barcode
+    // 🔎 Batch + item + price in one call
     frappe.call({
-      method: "frappe.client.get_list",
+      method: "siya_clinic.api.item.barcode_scan.scan_barcode",
       args: {
-        doctype: "Batch",
-        filters: { sr_barcode: code },
-        fields: ["name", "item"],
-        limit_page_length: 1
+        barcode: code,
+        price_list: price_list
       },
       callback(r) {
-        if (!(r.message && r.message.length)) {
+        let scan = r.message;
+
+        if (!scan) {
           frappe.msgprint("❌ No Batch found for barcode: " + code);
           frm.set_value("scan_barcode", "");
           return;
         }
 
-        let batch = r.message[0];
-
-        // 🔎 Fetch item details
-        frappe.call({
-          method: "frappe.client.get",
-          args: {
-            doctype: "Item",
-            name: batch.item
-          },
-          callback(res) {
-            let item = res.message;
-
-            // 🔎 Fetch selling price
-            frappe.call({
-              method: "frappe.client.get_list",
-              args: {
-                doctype: "Item Price",
-                filters: {
-                  item_code: item.name,
-                  price_list: price_list
-                },
-                fields: ["price_list_rate"],
-                order_by: "valid_from desc",
-                limit_page_length: 1
-              },
-              callback(priceRes) {
-                let rate = 0;
-                if (priceRes.message && priceRes.message.length) {
-                  rate = priceRes.message[0].price_list_rate || 0;
-                }
-
-                // 🔁 If item+batch already exists → increase qty
-                let existing = frm.doc.items.find(row =>
-                  row.item_code === item.name &&
-                  row.batch_no === batch.name
-                );
-
-                if (existing) {
-                  existing.qty += 1;
-                } else {
-                  let row = frm.add_child("items");
-                  row.item_code = item.name;
-                  row.item_name = item.item_name;
-                  row.batch_no = batch.name;
-                  row.qty = 1;
-                  row.basic_rate = rate;
-                }
+        // 🔁 If item+batch already exists → increase qty
+        let existing = (frm.doc.items || []).find(row =>
+          row.item_code === scan.item_code &&
+          row.batch_no === scan.batch
+        );
+
+        if (existing) {
+          existing.qty += 1;
+        } else {
+          let row = frm.add_child("items");
+          row.item_code = scan.item_code;
+          row.item_name = scan.item_name;
+          row.batch_no = scan.batch;
+          row.qty = 1;
+          row.basic_rate = scan.rate || 0;
+        }
 
-                frm.refresh_field("items");
-                frm.set_value("scan_barcode", "");
-              }
-            });
-          }
-        });
+        frm.refresh_field("items");
+        frm.set_value("scan_barcode", "");
       }
     });
   }
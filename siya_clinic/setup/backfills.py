@@ -0,0 +1,59 @@
+# siya_clinic/setup/backfills.py
+import logging
+
+import frappe
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------------------------------------
+# One-time data backfills for indexes this app maintains.
+#
+# Not patches: patches run before after_migrate, i.e. before
+# setup_all has created the custom fields / DocTypes they fill.
+# Queued from setup_all instead, once per site; each one marks
+# itself done (site default) only after it completed, so a failed
+# run is queued again on the next migrate.
+# ------------------------------------------------------------
+BACKFILLS = {
+    "normalized_mobiles": "siya_clinic.api.common.phone_index.backfill_normalized_mobiles",
+    "lead_assignee_index": "siya_clinic.api.crm_lead.assignee_index.rebuild_lead_assignee_index",
+    "billing_summaries": "siya_clinic.api.patient.billing_summary.rebuild_billing_summaries",
+    "source_encounter": "siya_clinic.api.sales_invoice.source_encounter.backfill_source_encounter",
+    "template_slugs": "siya_clinic.api.item_group_template.slug_index.backfill_template_slugs",
+}
+
+BACKFILL_TIMEOUT = 4 * 60 * 60
+
+
+def _flag(key: str) -> str:
+    return f"siya_backfill_{key}"
+
+
+def is_done(key: str) -> bool:
+    """True once the backfill `key` has completed on this site."""
+    return bool(frappe.db.get_default(_flag(key)))
+
+
+def apply():
+    """Queue every backfill that has not completed yet."""
+    for key in BACKFILLS:
+        if is_done(key):
+            continue
+
+        logger.info(f"Queueing backfill: {key}")
+        frappe.enqueue(
+            "siya_clinic.setup.backfills.run",
+            queue="long",
+            timeout=BACKFILL_TIMEOUT,
+            job_id=_flag(key),
+            deduplicate=True,
+            enqueue_after_commit=True,
+            key=key,
+        )
+
+
+def run(key: str):
+    """Worker: run one backfill and mark it done."""
+    frappe.get_attr(BACKFILLS[key])()
+    frappe.db.set_default(_flag(key), 1)
+    frappe.db.commit()
@@ -0,0 +1,51 @@
+import logging
+
+import frappe
+
+from .utils import create_cf_with_module
+
+logger = logging.getLogger(__name__)
+
+DT = "Batch"
+
+
+def apply():
+    """Apply Batch customizations safely."""
+    if not frappe.db.exists("DocType", DT):
+        logger.warning("Batch DocType not found — skipping customization")
+        return
+
+    logger.info("Applying Batch customizations")
+
+    _make_batch_fields()
+
+    frappe.clear_cache()
+    frappe.db.commit()
+
+    logger.info("Batch customization completed")
+
+
+# =========================================================
+# Custom Fields
+# =========================================================
+
+def _make_batch_fields():
+    """
+    Adds the scan barcode used by Sales Invoice / Stock Entry scanning.
+    Indexed: every scan looks a batch up by this value.
+    Safe to run multiple times.
+    """
+
+    create_cf_with_module({
+        DT: [
+            {
+                "fieldname": "sr_barcode",
+                "label": "Barcode",
+                "fieldtype": "Data",
+                "insert_after": "batch_id",
+                "search_index": 1,
+                "in_standard_filter": 1,
+                "no_copy": 1,
+            }
+        ]
+    })
@@ -2,7 +2,7 @@
 import frappe
 import logging
 
-from .utils import upsert_property_setter
+from .utils import create_cf_with_module, upsert_property_setter
 
 # Set up logger for the module
 logger = logging.getLogger(__name__)
@@ -13,6 +13,9 @@ def apply():
     # Log the start of the contact setup process
     logger.info("Applying Contact setup")
     
+    # Add the Contact custom fields
+    _make_contact_fields()
+
     # Apply the contact UI customizations
     _apply_contact_ui_customizations()
 
@@ -23,6 +26,33 @@ def apply():
     # Log the completion of the contact setup
     logger.info("Contact setup completed")
 
+def _make_contact_fields():
+    """Add hidden, indexed phone copies used by the global duplicate engine."""
+    create_cf_with_module({
+        "Contact": [
+            {
+                "fieldname": "sr_normalized_mobile",
+                "label": "Normalized Mobile",
+                "fieldtype": "Data",
+                "insert_after": "mobile_no",
+                "hidden": 1,
+                "read_only": 1,
+                "no_copy": 1,
+                "search_index": 1,
+            },
+            {
+                "fieldname": "sr_normalized_phone",
+                "label": "Normalized Phone",
+                "fieldtype": "Data",
+                "insert_after": "phone",
+                "hidden": 1,
+                "read_only": 1,
+                "no_copy": 1,
+                "search_index": 1,
+            },
+        ]
+    })
+
 def _apply_contact_ui_customizations():
     """Apply UI customizations for the Address DocType."""
     # Setting default value for "is_primary_address" field in "Address"
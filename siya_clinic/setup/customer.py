@@ -51,7 +51,18 @@ def _make_customer_fields():
                 "insert_after": "sr_customer_id",
                 "read_only": 1,
                 "in_list_view": 1,
-            }
+            },
+            # Duplicate engine index (kept by normalize hooks)
+            {
+                "fieldname": "sr_normalized_mobile",
+                "label": "Normalized Mobile",
+                "fieldtype": "Data",
+                "insert_after": "mobile_no",
+                "hidden": 1,
+                "read_only": 1,
+                "no_copy": 1,
+                "search_index": 1,
+            },
         ]
     })
 
@@ -38,6 +38,7 @@ def apply():
     create_lead_platform_doctype()
     create_lead_source_doctype()
     create_lead_disposition_doctype()
+    create_lead_assignee_index_doctype()
     
     _seed_lead_platforms_data()
     _seed_lead_sources_data()
@@ -69,6 +70,7 @@ def apply():
     create_patient_invoice_view_doctype()
     
     create_patient_payment_view_doctype()
+    create_patient_billing_summary_doctype()
 
     create_practitioner_pathy_doctype()
     _seed_practitioner_pathies_data()
@@ -103,8 +105,14 @@ def apply():
     create_item_group_template_item_doctype()
     create_item_group_template_doctype() 
 
+    # Data Quality
+    create_duplicate_audit_doctype()
+
     # Integration / Shipping Settings
+    create_shopify_order_queue_doctype()
     create_shipkia_settings()
+    create_shipkia_outbox_doctype()
+    create_biller_warehouse_settings()
     
     # Disable Quick Entry for Item
     disable_item_quick_entry()
@@ -460,6 +468,60 @@ def create_lead_disposition_doctype():
         frappe.db.commit()
 
 
+def create_lead_assignee_index_doctype():
+    """Create SR Lead Assignee (lead -> open assignee index used by the CRM Lead PQC)."""
+
+    doctype = "SR Lead Assignee"
+
+    if not frappe.db.exists("DocType", doctype):
+
+        logger.info(f"Creating DocType: {doctype}")
+
+        doc = frappe.get_doc({
+            "doctype": "DocType",
+            "name": doctype,
+            "module": MODULE_DEF_NAME,
+            "custom": 1,
+            "autoname": "hash",
+            "in_create": 1,
+            "read_only": 1,
+            "track_changes": 0,
+            "fields": [
+                {
+                    "fieldname": "lead",
+                    "label": "Lead",
+                    "fieldtype": "Link",
+                    "options": "CRM Lead",
+                    "search_index": 1,
+                    "in_list_view": 1,
+                    "in_standard_filter": 1,
+                },
+                {
+                    "fieldname": "user",
+                    "label": "User",
+                    "fieldtype": "Link",
+                    "options": "User",
+                    "search_index": 1,
+                    "in_list_view": 1,
+                    "in_standard_filter": 1,
+                },
+            ],
+            "permissions": [
+                {
+                    "role": "System Manager",
+                    "read": 1,
+                    "report": 1,
+                }
+            ],
+        })
+
+        doc.insert(ignore_permissions=True)
+        frappe.db.commit()
+
+    # covering index for "lead IN (SELECT lead ... WHERE user = ?)"
+    frappe.db.add_index(doctype, ["user", "lead"], index_name="user_lead")
+
+
 def _seed_lead_platforms_data():
     """Insert default SR Lead Platforms"""
 
@@ -1330,6 +1392,69 @@ def create_patient_payment_view_doctype():
         frappe.db.commit()
 
 
+def create_patient_billing_summary_doctype():
+    """Create SR Patient Billing Summary (one row per Patient, maintained by SI/PE hooks)."""
+
+    doctype = "SR Patient Billing Summary"
+
+    if not frappe.db.exists("DocType", doctype):
+        logger.info(f"Creating DocType: {doctype}")
+
+        doc = frappe.get_doc({
+            "doctype": "DocType",
+            "name": doctype,
+            "module": MODULE_DEF_NAME,
+            "custom": 1,
+            "autoname": "field:patient",
+            "in_create": 1,
+            "read_only": 1,
+            "field_order": [
+                "patient",
+                "invoice_count",
+                "total_invoiced",
+                "last_invoice_date",
+                "payment_count",
+                "total_paid",
+                "last_payment_date",
+            ],
+            "fields": [
+                {
+                    "fieldname": "patient",
+                    "label": "Patient",
+                    "fieldtype": "Link",
+                    "options": "Patient",
+                    "unique": 1,
+                    "in_list_view": 1,
+                },
+                {"fieldname": "invoice_count", "label": "Invoices", "fieldtype": "Int", "in_list_view": 1},
+                {"fieldname": "total_invoiced", "label": "Total Invoiced", "fieldtype": "Currency", "in_list_view": 1},
+                {"fieldname": "last_invoice_date", "label": "Last Invoice Date", "fieldtype": "Date"},
+                {"fieldname": "payment_count", "label": "Payments", "fieldtype": "Int"},
+                {"fieldname": "total_paid", "label": "Total Paid", "fieldtype": "Currency", "in_list_view": 1},
+                {"fieldname": "last_payment_date", "label": "Last Payment Date", "fieldtype": "Date"},
+            ],
+            "permissions": [
+                {
+                    "role": "System Manager",
+                    "read": 1,
+                    "report": 1,
+                },
+                {
+                    "role": "Healthcare Administrator",
+                    "read": 1,
+                    "report": 1,
+                },
+            ],
+        })
+
+        doc.insert(ignore_permissions=True)
+        frappe.db.commit()
+
+    # recent-documents / aggregate lookups by patient
+    if frappe.db.has_column("Sales Invoice", "patient"):
+        frappe.db.add_index("Sales Invoice", ["patient", "posting_date"], index_name="sr_patient_posting_date")
+
+
 def create_followup_id_doctype():
     """Create SR Followup ID Master (0–9)."""
 
@@ -2652,6 +2777,16 @@ def create_item_group_template_doctype():
                     "fieldtype": "Data",
                     "reqd": 1
                 },
+                # Shopify item code match key (slug_index.set_template_slug)
+                {
+                    "fieldname": "template_slug",
+                    "label": "Template Slug",
+                    "fieldtype": "Data",
+                    "hidden": 1,
+                    "read_only": 1,
+                    "no_copy": 1,
+                    "search_index": 1
+                },
                 {
                     "fieldname": "description",
                     "label": "Description",
@@ -2693,6 +2828,104 @@ def create_item_group_template_doctype():
         frappe.db.commit()
 
 
+def create_shopify_order_queue_doctype():
+    """Create SR Shopify Order Queue (staging for async Shopify ingestion, named by order id)."""
+
+    doctype = "SR Shopify Order Queue"
+
+    if not frappe.db.exists("DocType", doctype):
+
+        logger.info(f"Creating DocType: {doctype}")
+
+        doc = frappe.get_doc({
+            "doctype": "DocType",
+            "name": doctype,
+            "module": MODULE_DEF_NAME,
+            "custom": 1,
+            "autoname": "field:shopify_order_id",
+            "allow_rename": 0,
+            "track_changes": 0,
+            "sort_field": "modified",
+            "sort_order": "DESC",
+            "fields": [
+                {
+                    "fieldname": "shopify_order_id",
+                    "label": "Shopify Order ID",
+                    "fieldtype": "Data",
+                    "reqd": 1,
+                    "unique": 1,
+                    "in_list_view": 1,
+                    "in_standard_filter": 1,
+                },
+                {
+                    "fieldname": "status",
+                    "label": "Status",
+                    "fieldtype": "Select",
+                    "options": "Queued\nProcessing\nProcessed\nFailed",
+                    "default": "Queued",
+                    "search_index": 1,
+                    "in_list_view": 1,
+                    "in_standard_filter": 1,
+                },
+                {
+                    "fieldname": "attempts",
+                    "label": "Attempts",
+                    "fieldtype": "Int",
+                    "read_only": 1,
+                    "in_list_view": 1,
+                },
+                {
+                    "fieldname": "sales_invoice",
+                    "label": "Sales Invoice",
+                    "fieldtype": "Link",
+                    "options": "Sales Invoice",
+                    "read_only": 1,
+                    "in_list_view": 1,
+                },
+                {
+                    "fieldname": "section_payload",
+                    "label": "Payload",
+                    "fieldtype": "Section Break",
+                    "collapsible": 1,
+                },
+                {
+                    "fieldname": "payload",
+                    "label": "Payload",
+                    "fieldtype": "Code",
+                    "options": "JSON",
+                    "read_only": 1,
+                },
+                {
+                    "fieldname": "result",
+                    "label": "Result",
+                    "fieldtype": "Code",
+                    "options": "JSON",
+                    "read_only": 1,
+                },
+                {
+                    "fieldname": "error",
+                    "label": "Error",
+                    "fieldtype": "Long Text",
+                    "read_only": 1,
+                },
+            ],
+            "permissions": [
+                {
+                    "role": "System Manager",
+                    "read": 1,
+                    "write": 1,
+                    "create": 1,
+                    "delete": 1,
+                    "report": 1,
+                    "export": 1,
+                }
+            ],
+        })
+
+        doc.insert(ignore_permissions=True)
+        frappe.db.commit()
+
+
 def create_shipkia_settings():
     """Create Shipkia Settings (Single DocType) if not exists."""
 
@@ -2815,6 +3048,293 @@ def create_shipkia_settings():
         frappe.logger().info("✅ Shipkia Settings DocType created successfully.")
 
 
+def create_shipkia_outbox_doctype():
+    """Create SR Shipkia Outbox (background dispatch of Sales Invoices to Shipkia, named by invoice)."""
+
+    doctype = "SR Shipkia Outbox"
+
+    if not frappe.db.exists("DocType", doctype):
+
+        logger.info(f"Creating DocType: {doctype}")
+
+        doc = frappe.get_doc({
+            "doctype": "DocType",
+            "name": doctype,
+            "module": MODULE_DEF_NAME,
+            "custom": 1,
+            "autoname": "field:sales_invoice",
+            "allow_rename": 0,
+            "track_changes": 0,
+            "sort_field": "modified",
+            "sort_order": "DESC",
+            "fields": [
+                {
+                    "fieldname": "sales_invoice",
+                    "label": "Sales Invoice",
+                    "fieldtype": "Link",
+                    "options": "Sales Invoice",
+                    "reqd": 1,
+                    "unique": 1,
+                    "in_list_view": 1,
+                    "in_standard_filter": 1,
+                },
+                {
+                    "fieldname": "status",
+                    "label": "Status",
+                    "fieldtype": "Select",
+                    "options": "Queued\nSending\nSent\nFailed",
+                    "default": "Queued",
+                    "search_index": 1,
+                    "in_list_view": 1,
+                    "in_standard_filter": 1,
+                },
+                {
+                    "fieldname": "attempts",
+                    "label": "Attempts",
+                    "fieldtype": "Int",
+                    "read_only": 1,
+                    "in_list_view": 1,
+                },
+                {
+                    "fieldname": "next_attempt_at",
+                    "label": "Next Attempt At",
+                    "fieldtype": "Datetime",
+                    "read_only": 1,
+                    "search_index": 1,
+                },
+                {
+                    "fieldname": "idempotency_key",
+                    "label": "Idempotency Key",
+                    "fieldtype": "Data",
+                    "read_only": 1,
+                },
+                {
+                    "fieldname": "dispatch_no",
+                    "label": "Dispatch No",
+                    "fieldtype": "Int",
+                    "read_only": 1,
+                    "description": "Incremented on a manual resend of an invoice already sent.",
+                },
+                {
+                    "fieldname": "response_status",
+                    "label": "Response Status",
+                    "fieldtype": "Int",
+                    "read_only": 1,
+                },
+                {
+                    "fieldname": "sent_at",
+                    "label": "Sent At",
+                    "fieldtype": "Datetime",
+                    "read_only": 1,
+                },
+                {
+                    "fieldname": "section_payload",
+                    "label": "Payload",
+                    "fieldtype": "Section Break",
+                    "collapsible": 1,
+                },
+                {
+                    "fieldname": "payload",
+                    "label": "Payload",
+                    "fieldtype": "Code",
+                    "options": "JSON",
+                    "read_only": 1,
+                },
+                {
+                    "fieldname": "response",
+                    "label": "Response",
+                    "fieldtype": "Long Text",
+                    "read_only": 1,
+                },
+                {
+                    "fieldname": "error",
+                    "label": "Error",
+                    "fieldtype": "Long Text",
+                    "read_only": 1,
+                },
+            ],
+            "permissions": [
+                {
+                    "role": "System Manager",
+                    "read": 1,
+                    "write": 1,
+                    "create": 1,
+                    "delete": 1,
+                    "report": 1,
+                    "export": 1,
+                },
+                {
+                    "role": "Accounts User",
+                    "read": 1,
+                    "report": 1,
+                },
+            ],
+        })
+
+        doc.insert(ignore_permissions=True)
+        frappe.db.commit()
+
+
+def create_biller_warehouse_settings():
+    """Create SR Biller Warehouse (child) + SR Biller Warehouse Settings (Single)."""
+
+    child = "SR Biller Warehouse"
+
+    if not frappe.db.exists("DocType", child):
+
+        logger.info(f"Creating DocType: {child}")
+
+        frappe.get_doc({
+            "doctype": "DocType",
+            "name": child,
+            "module": MODULE_DEF_NAME,
+            "custom": 1,
+            "istable": 1,
+            "editable_grid": 1,
+            "field_order": ["role", "company", "warehouse"],
+            "fields": [
+                {
+                    "fieldname": "role",
+                    "label": "Role",
+                    "fieldtype": "Link",
+                    "options": "Role",
+                    "reqd": 1,
+                    "in_list_view": 1,
+                },
+                {
+                    "fieldname": "company",
+                    "label": "Company",
+                    "fieldtype": "Link",
+                    "options": "Company",
+                    "reqd": 1,
+                    "in_list_view": 1,
+                },
+                {
+                    "fieldname": "warehouse",
+                    "label": "Warehouse",
+                    "fieldtype": "Link",
+                    "options": "Warehouse",
+                    "reqd": 1,
+                    "in_list_view": 1,
+                },
+            ],
+        }).insert(ignore_permissions=True)
+
+    doctype = "SR Biller Warehouse Settings"
+
+    if not frappe.db.exists("DocType", doctype):
+
+        logger.info(f"Creating DocType: {doctype}")
+
+        frappe.get_doc({
+            "doctype": "DocType",
+            "name": doctype,
+            "module": MODULE_DEF_NAME,
+            "issingle": 1,
+            "custom": 1,
+            "track_changes": 1,
+            "field_order": ["biller_warehouses"],
+            "fields": [
+                {
+                    "fieldname": "biller_warehouses",
+                    "label": "Biller Warehouses",
+                    "fieldtype": "Table",
+                    "options": child,
+                    "description": "Warehouse each biller role may bill from, per company. "
+                                   "Roles without a row fall back to the warehouse name keyword.",
+                },
+            ],
+            "permissions": [
+                {
+                    "role": "System Manager",
+                    "read": 1,
+                    "write": 1,
+                    "create": 1,
+                    "delete": 0,
+                }
+            ],
+        }).insert(ignore_permissions=True)
+
+    frappe.db.commit()
+
+
+def create_duplicate_audit_doctype():
+    """Create SR Duplicate Audit (report table for the bulk duplicate audit job)."""
+
+    doctype = "SR Duplicate Audit"
+
+    if not frappe.db.exists("DocType", doctype):
+
+        logger.info(f"Creating DocType: {doctype}")
+
+        doc = frappe.get_doc({
+            "doctype": "DocType",
+            "name": doctype,
+            "module": MODULE_DEF_NAME,
+            "custom": 1,
+            "autoname": "hash",
+            "in_create": 1,
+            "read_only": 1,
+            "sort_field": "record_count",
+            "sort_order": "DESC",
+            "fields": [
+                {
+                    "fieldname": "audit_run",
+                    "label": "Audit Run",
+                    "fieldtype": "Data",
+                    "search_index": 1,
+                    "in_standard_filter": 1,
+                },
+                {
+                    "fieldname": "match_type",
+                    "label": "Match Type",
+                    "fieldtype": "Select",
+                    "options": "Mobile\nEmail",
+                    "in_list_view": 1,
+                    "in_standard_filter": 1,
+                },
+                {
+                    "fieldname": "match_value",
+                    "label": "Value",
+                    "fieldtype": "Data",
+                    "search_index": 1,
+                    "in_list_view": 1,
+                    "in_standard_filter": 1,
+                },
+                {
+                    "fieldname": "record_count",
+                    "label": "Records",
+                    "fieldtype": "Int",
+                    "in_list_view": 1,
+                },
+                {
+                    "fieldname": "max_per_doctype",
+                    "label": "Max Per DocType",
+                    "fieldtype": "Int",
+                    "description": "Highest count within one DocType (2+ means same-type duplicates)",
+                    "in_list_view": 1,
+                },
+                {
+                    "fieldname": "records",
+                    "label": "Records (JSON)",
+                    "fieldtype": "Long Text",
+                },
+            ],
+            "permissions": [
+                {
+                    "role": "System Manager",
+                    "read": 1,
+                    "delete": 1,
+                    "report": 1,
+                    "export": 1,
+                }
+            ],
+        })
+
+        doc.insert(ignore_permissions=True)
+        frappe.db.commit()
+
+
 def disable_item_quick_entry():
     """Disable Quick Entry for Item DocType."""
     if frappe.db.exists("DocType", "Item"):
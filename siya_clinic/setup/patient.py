@@ -109,6 +109,18 @@ def _make_patient_fields():
                 "allow_in_quick_entry": 1,
             },
 
+            # ---------------- Duplicate Engine Index ----------------
+            {
+                "fieldname": "sr_normalized_mobile",
+                "label": "Normalized Mobile",
+                "fieldtype": "Data",
+                "insert_after": "mobile",
+                "hidden": 1,
+                "read_only": 1,
+                "no_copy": 1,
+                "search_index": 1,
+            },
+
             # ---------------- Invoices ----------------
             {
                 "fieldname": "sr_invoices_tab",
@@ -6,11 +6,12 @@ from . import (
     masters,
     patient, customer, contact,
     crm_lead, practitioner, patient_appointment,
-    encounter, drug_prescription, item, item_price,
+    encounter, drug_prescription, item, item_price, batch,
     sales_invoice, payment_entry, purchase_order,
     # user,
     company,
     print_formats,
+    backfills,
 )
 
 logger = logging.getLogger(__name__)
@@ -103,6 +104,12 @@ def setup_all():
         logger.info("Applying Item Price setup")
         item_price.apply()
 
+        # -------------------------------------------------
+        # Batch fields/customizations
+        # -------------------------------------------------
+        logger.info("Applying Batch setup")
+        batch.apply()
+
         # -------------------------------------------------
         # Sales Invoice fields/customizations
         # -------------------------------------------------
@@ -139,6 +146,12 @@ def setup_all():
         logger.info("Applying Print Format setup")
         print_formats.apply()
 
+        # -------------------------------------------------
+        # One-time data backfills (queued, run once per site)
+        # -------------------------------------------------
+        logger.info("Queueing pending backfills")
+        backfills.apply()
+
         # -------------------------------------------------
         # Clear cache & commit
         # -------------------------------------------------
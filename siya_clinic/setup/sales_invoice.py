@@ -154,6 +154,20 @@ def _make_invoice_fields():
                 "insert_after": "sr_si_delivery_type",
             },
 
+            # -------------------------------------------------
+            # Source Encounter (unique → draft invoice dedup key)
+            # -------------------------------------------------
+            {
+                "fieldname": "source_encounter",
+                "label": "Source Encounter",
+                "fieldtype": "Link",
+                "options": "Patient Encounter",
+                "read_only": 1,
+                "no_copy": 1,
+                "unique": 1,
+                "insert_after": "sent_to_shipkia",
+            },
+
             # -------------------------------------------------
             # Audit Field
             # -------------------------------------------------